@@ -0,0 +1,73 @@
+# * ------------------------------------------------------------
+# The Diceinator - dice advisor
+#
+# How many dice should each side roll this round?  The answers for
+# every army count up to TABLE_SIZE are worked out on a PC by
+# host/make_advisor.py and stored in /data/advisor.bin; the device
+# reads one 8 byte record per question and computes nothing.
+#
+# File: header "<4sBBH" (MAGIC, VERSION, table size, record size),
+# then one record per (att, def), att 1 - size, def 1 - size, row by
+# row.  Record "<BB3H":
+#   att     best attack dice: by win chance | by round losses << 4
+#   def     best defend dice: by win chance | by round losses << 4
+#   win     attacker's battle win chance, as a fraction of 65535, if
+#           this round is rolled with 1, 2 or 3 attack dice (0 = can't)
+# Win chances assume the defender's best by win chance this round and
+# both sides rolling all the dice they can after it.
+# * ------------------------------------------------------------
+
+import struct
+from collections import namedtuple
+
+MAGIC = b"DADV"
+VERSION = 1
+HEADER = "<4sBBH"
+HEADER_SIZE = struct.calcsize(HEADER)
+RECORD = "<BB3H"
+RECORD_SIZE = struct.calcsize(RECORD)
+
+ADVISOR_PATH = "/data/advisor.bin"
+
+Advice = namedtuple("Advice", ("att_dice", "att_dice_by_loss",
+                               "def_dice", "def_dice_by_loss", "win"))
+
+
+class Advisor:
+    """Best dice counts, looked up in the packed advisor table.
+        :param path: The table file
+    """
+
+    def __init__(self, path=ADVISOR_PATH):
+        self.size = 0
+        self._buf = bytearray(RECORD_SIZE)
+        try:
+            self._file = open(path, "rb")
+        except OSError:
+            print('No advisor table at %s' % path)
+            self._file = None
+            return
+        magic, version, size, record_size = struct.unpack(HEADER, self._file.read(HEADER_SIZE))
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            print('%s is not a version %d advisor table' % (path, VERSION))
+            self._file.close()
+            self._file = None
+            return
+        self.size = size
+
+    def advise(self, att, defend):
+        """Advice for ``att`` armies attacking ``defend``, or None
+        when either side has no armies or there is no table.
+        Beyond the table both sides should roll every die they can.
+        """
+        if att < 1 or defend < 1 or self._file is None:
+            return None
+        if att > self.size or defend > self.size:
+            att_dice = 3 if att > 2 else att
+            def_dice = 2 if defend > 1 else 1
+            return Advice(att_dice, att_dice, def_dice, def_dice, None)
+        self._file.seek(HEADER_SIZE + ((att - 1) * self.size + defend - 1) * RECORD_SIZE)
+        self._file.readinto(self._buf)
+        a, d, w1, w2, w3 = struct.unpack(RECORD, self._buf)
+        return Advice(a & 15, a >> 4, d & 15, d >> 4,
+                      (w1 / 65535, w2 / 65535, w3 / 65535))
@@ -0,0 +1,126 @@
+# * ------------------------------------------------------------
+# The Diceinator - asset manager
+#
+# Every bitmap, palette and font is loaded once, by path, and the
+# same objects are handed to everything that draws with them.  Each
+# asset remembers what it costs in RAM: measured with gc.mem_free()
+# on the device, estimated from its size elsewhere.
+#
+# Images can be kept in RAM (a displayio.Bitmap, fast to draw) or
+# left on disk (an OnDiskBitmap, next to no RAM, but every refresh
+# that touches it reads flash).
+# * ------------------------------------------------------------
+
+import gc
+import displayio
+import adafruit_imageload
+from adafruit_bitmap_font import bitmap_font
+
+PALETTE_ENTRY = 12      # Bytes per displayio palette colour (rgb888, rgb565, luma, ...)
+
+
+def _mem_free():
+    if hasattr(gc, "mem_free"):
+        gc.collect()
+        return gc.mem_free()
+    return None
+
+
+def bitmap_bytes(width, height, colors):
+    """RAM for a displayio.Bitmap: rows of 32 bit words, 1 - 16 bits a pixel."""
+    bits = 1
+    while (1 << bits) < colors:
+        bits *= 2
+    return ((width * bits + 31) // 32) * 4 * height
+
+
+class Asset:
+    def __init__(self, kind, path, value, on_disk=False):
+        self.kind = kind
+        self.path = path
+        self.value = value
+        self.on_disk = on_disk
+        self.estimate = 0       # Bytes, from the asset's size
+        self.measured = None    # Bytes, gc.mem_free() before - after
+        self.users = 1          # Times it has been asked for
+
+
+class Assets:
+    """Loads each asset once; later requests get the same objects."""
+
+    def __init__(self):
+        self.items = {}
+
+    def sheet(self, path, on_disk=False):
+        """(bitmap, pixel_shader) for an indexed BMP.
+            :param on_disk: OnDiskBitmap and ColorConverter instead of a
+                Bitmap and Palette in RAM
+        """
+        asset = self._cached(path)
+        if asset is None:
+            free = _mem_free()
+            if on_disk:
+                # The file stays open for as long as the bitmap is drawn
+                image = displayio.OnDiskBitmap(open(path, "rb"))
+                asset = Asset("image", path, (image, displayio.ColorConverter()), True)
+                asset.estimate = 0
+            else:
+                bitmap, palette = adafruit_imageload.load(path, bitmap=displayio.Bitmap,
+                                                          palette=displayio.Palette)
+                asset = Asset("sheet", path, (bitmap, palette))
+                asset.estimate = (bitmap_bytes(bitmap.width, bitmap.height, len(palette))
+                                  + PALETTE_ENTRY * len(palette))
+            self._add(asset, free)
+        return asset.value
+
+    def image(self, path, on_disk=True):
+        """(bitmap, pixel_shader) for a picture, by default left on disk."""
+        return self.sheet(path, on_disk)
+
+    def font(self, path):
+        """A bitmap font; its glyphs load as they are needed."""
+        asset = self._cached(path)
+        if asset is None:
+            free = _mem_free()
+            asset = Asset("font", path, bitmap_font.load_font(path))
+            self._add(asset, free)
+        return asset.value
+
+    def _cached(self, path):
+        asset = self.items.get(path)
+        if asset is not None:
+            asset.users += 1
+        return asset
+
+    def _add(self, asset, free):
+        after = _mem_free()
+        if free is not None:
+            asset.measured = free - after
+        self.items[asset.path] = asset
+
+    def cost(self, asset):
+        """Best figure for an asset's RAM: measured, else estimated."""
+        if asset.kind == "font":
+            # Fonts grow as glyphs load, so add up what is there now
+            return _font_bytes(asset.value)
+        return asset.measured if asset.measured is not None else asset.estimate
+
+    def report(self):
+        total = 0
+        for path in sorted(self.items):
+            asset = self.items[path]
+            cost = self.cost(asset)
+            total += cost
+            print('%-26s %-5s %-4s %7d bytes, %d users' % (
+                path, asset.kind, "disk" if asset.on_disk else "RAM", cost, asset.users))
+        print('%-37s %7d bytes' % ("Total", total))
+
+
+def _font_bytes(font):
+    # Glyph bitmaps plus a rough per-glyph overhead for the Glyph tuple
+    glyphs = getattr(font, "_glyphs", {})
+    total = 0
+    for glyph in glyphs.values():
+        if glyph is not None:
+            total += bitmap_bytes(glyph.bitmap.width, glyph.bitmap.height, 2) + 64
+    return total
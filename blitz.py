@@ -0,0 +1,40 @@
+# * ------------------------------------------------------------
+# The Diceinator - blitz
+#
+# Fight a whole battle with real random rounds, back to back, with
+# no sound or animation.  Dice counts follow the armies each round:
+# the attacker rolls min(3, att) and the defender min(2, def).
+# * ------------------------------------------------------------
+
+from dice_rng import DicePool
+from resolver import RoundResolver
+
+_round = None   # Made on first use, unless a resolver is passed in
+
+
+def blitz(att, defend, stop_at=0, resolver=None, on_round=None):
+    """Fight rounds until a side is wiped out or att drops to ``stop_at``.
+        :param att: Attacking armies
+        :param defend: Defending armies
+        :param stop_at: Stop once the attacker is down to this many armies
+        :param resolver: RoundResolver to roll with, e.g. one on the session's dice
+        :param on_round: Called as on_round(resolver, att dice, def dice)
+            after each round, e.g. to journal it
+        :return: (attackers left, defenders left, rounds fought)
+    """
+    global _round
+    if resolver is None:
+        if _round is None:
+            _round = RoundResolver(DicePool(log=False))
+        resolver = _round
+    rounds = 0
+    while att > stop_at and att > 0 and defend > 0:
+        att_dice = att if att < 3 else 3
+        def_dice = defend if defend < 2 else 2
+        resolver.roll_and_resolve(att_dice, def_dice)
+        if on_round is not None:
+            on_round(resolver, att_dice, def_dice)
+        att -= resolver.att_loss
+        defend -= resolver.def_loss
+        rounds += 1
+    return att, defend, rounds
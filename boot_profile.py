@@ -0,0 +1,49 @@
+# * ------------------------------------------------------------
+# The Diceinator - boot profiler
+#
+# Marks the end of each startup stage with the time since code.py
+# started and the free heap, and prints it, so time-to-first-touch
+# can be tracked as the startup changes.  "boot" on the serial
+# console prints the table again.
+# * ------------------------------------------------------------
+
+import gc
+import time
+
+
+class BootProfiler:
+    def __init__(self):
+        self.start = time.monotonic()
+        self.stages = []        # (name, seconds since start, free bytes or None)
+        self.stage("start")
+
+    def stage(self, name):
+        """End of stage ``name``; returns seconds since start."""
+        t = time.monotonic() - self.start
+        free = None
+        if hasattr(gc, "mem_free"):
+            gc.collect()
+            free = gc.mem_free()
+        self.stages.append((name, t, free))
+        print(self._line(name, t, free))
+        return t
+
+    def mark_once(self, name):
+        """Like stage(), but only the first time ``name`` comes up."""
+        for stage in self.stages:
+            if stage[0] == name:
+                return
+        self.stage(name)
+
+    @staticmethod
+    def _line(name, t, free):
+        if free is None:
+            return 'Boot %-12s %7.3f s' % (name, t)
+        return 'Boot %-12s %7.3f s %7d bytes free' % (name, t, free)
+
+    def report(self):
+        last = 0
+        print('Boot started %.3f s after power on' % self.start)
+        for name, t, free in self.stages:
+            print('%s  (+%.3f)' % (self._line(name, t, free), t - last))
+            last = t
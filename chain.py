@@ -0,0 +1,127 @@
+# * ------------------------------------------------------------
+# The Diceinator - attack chain planner
+#
+# A turn is often a chain: take A, move in, attack B from A, and so
+# on.  The planner carries the spread of possible attacker stacks
+# from battle to battle.  Each battle is looked up per starting stack
+# with risk_odds.battle(), so its memo cache is shared by every step,
+# every chain and the odds shown on the Battle view.  The stacks
+# after each step are memoized too, keyed by the chain so far, so a
+# chain that grows by one territory only works out the new battle.
+#
+# Armies follow risk_odds: the attacker's stack is the armies that
+# attack.  After taking a territory, ``leave`` armies stay in it and
+# the rest attack the next one.
+# * ------------------------------------------------------------
+
+from array import array
+from risk_odds import battle_steps
+
+PRUNE = 1e-7    # Stacks less likely than this are not followed
+
+STEP_CACHE_SIZE = 24    # Chain prefixes kept, least recently used goes first
+_steps = {}
+_steps_order = []
+
+
+class ChainPlan:
+    """Outcome of attacking a row of territories in turn.
+        reach[i]: chance of taking territory i and every one before it
+        survivors[i]: expected attackers that take territory i, if it falls
+        win: chance of taking them all
+    """
+
+    def __init__(self, att, defenders, leave, reach, survivors):
+        self.att = att
+        self.defenders = defenders
+        self.leave = leave
+        self.reach = reach
+        self.survivors = survivors
+        self.win = reach[-1] if reach else 1.0
+
+
+def plan_steps(att, defenders, leave=1):
+    """Generator form of plan(); yields None while working, then the ChainPlan.
+        :param att: Attacking armies for the first battle
+        :param defenders: Defending armies of each territory, in order
+        :param leave: Armies left in each territory taken, one number
+            for all or one per territory
+    """
+    if isinstance(leave, int):
+        leave = [leave] * len(defenders)
+    defenders = tuple(defenders)
+    leave = tuple(leave)
+    if att < 1:
+        raise ValueError("need at least 1 attacker")
+    if len(leave) != len(defenders):
+        raise ValueError("need one leave per defender")
+    for n in defenders + leave:
+        if n < 0:
+            raise ValueError("defenders and leave can't be negative")
+    # Pick up from the longest chain prefix already worked out
+    start = len(defenders)
+    while start and (att, defenders[:start], leave[:start]) not in _steps:
+        start -= 1
+    if start:
+        stacks, reach, survivors = _step_get((att, defenders[:start], leave[:start]))
+        reach = list(reach)
+        survivors = list(survivors)
+    else:
+        stacks = array("f", [0] * (att + 1))
+        stacks[att] = 1.0
+        reach = []
+        survivors = []
+    for step in range(start, len(defenders)):
+        defend = defenders[step]
+        taken = array("f", [0] * (att + 1))    # Attackers left after the win
+        for a in range(1, att + 1):
+            p = stacks[a]
+            if p < PRUNE:
+                continue
+            for odds in battle_steps(a, defend):
+                yield None
+            left = odds.att_left
+            for k in range(1, a + 1):
+                taken[k] += p * left[k]
+        total = 0
+        expected = 0
+        for k in range(1, att + 1):
+            total += taken[k]
+            expected += k * taken[k]
+        reach.append(total)
+        survivors.append(expected / total if total else 0)
+        # Whoever is not left behind attacks the next territory
+        stacks = array("f", [0] * (att + 1))
+        for k in range(leave[step] + 1, att + 1):
+            stacks[k - leave[step]] = taken[k]
+        _step_put((att, defenders[:step + 1], leave[:step + 1]),
+                  (stacks, tuple(reach), tuple(survivors)))
+    yield ChainPlan(att, defenders, leave, reach, survivors)
+
+
+def plan(att, defenders, leave=1):
+    """Plan an attack chain in one go, see plan_steps()."""
+    for result in plan_steps(att, defenders, leave):
+        pass
+    return result
+
+
+def _step_get(key):
+    if _steps_order[-1] != key:
+        _steps_order.remove(key)
+        _steps_order.append(key)
+    return _steps[key]
+
+
+def _step_put(key, value):
+    if key in _steps:
+        return
+    if len(_steps_order) >= STEP_CACHE_SIZE:
+        del _steps[_steps_order.pop(0)]
+    _steps[key] = value
+    _steps_order.append(key)
+
+
+def clear_cache():
+    _steps.clear()
+    del _steps_order[:]
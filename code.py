@@ -7,7 +7,7 @@
 #
 # Van Sherry
 # * ------------------------------------------------------------
-# ToDo: Auto set backlight?
+# Backlight follows the room light and dims when idle, see power.py
 # * ------------------------------------------------------------
 # "THE BEERWARE LICENSE" (Revision 42):
 # I wrote this code. As long as you retain this
@@ -16,32 +16,97 @@
 # buy me a beer in return.
 # * ------------------------------------------------------------
 
-import time
+from boot_profile import BootProfiler
+boot = BootProfiler()       # Time and free memory after each startup stage
+
 import board
-import random
 import neopixel
 import displayio
-import adafruit_imageload
 import adafruit_touchscreen
 from adafruit_button import Button
 from adafruit_pyportal import PyPortal
-from adafruit_bitmap_font import bitmap_font
 from adafruit_display_text.label import Label
+from tasks import Scheduler
+from blitz import blitz
+from risk_odds import TABLE_SIZE, battle_steps, win_probability
+from ui import ALL_VIEWS, ButtonSpec, HitIndex, make_button
+from touch_input import HOLD, PRESS, RELEASE, TouchInput
+from view_manager import ViewManager
+from frame_clock import FrameClock
+from console import Console
+from counter import Counter
+from resolver import ATT_WIN, RoundResolver, allocation_check
+from dice_rng import DicePool
+import journal
+from luck import CHI2_LIMIT, MATCHUPS, LuckStats
+from advisor import Advisor
+from chain import plan_steps
+from sound import Sound, Voice
+from assets import Assets
+from probe import Probe
+from power import PowerGovernor
+import telemetry as telemetry_link
+from replay import RECORDING_NAME, Recorder, Replayer, SessionStart
+boot.stage("imports")
 
 # ------------- Globals ---------------------#
 att_wins = 0
 def_wins = 0
 att_num_die = 3
 def_num_die = 2
+att_armies = 3      # Armies attacking (not counting the one left behind)
+def_armies = 2      # Armies defending
+MAX_ARMIES = 200
+blitz_stop_at = 0   # Blitz stops when the attacker is down to this many
 red_dice_position = [1, 3, 5]
 wht_dice_position = [2, 4]
+scheduler = Scheduler()     # Runs the roll animation alongside the touch loop
+roll_task = None
+odds_task = None
+touch_swallowed = False     # Ignore the rest of a touch that skipped a roll
+SHAKE_TIME = 2.3            # Seconds of shaking dice
+shake_frames = FrameClock(10)   # Shake animation at 10 frames per second
+console = Console()         # Commands typed on the USB serial port
+dice = DicePool()           # Every real roll and blitz, replayable from its seed
+shake_dice = DicePool(size=32, log=False)   # Throwaway faces for the shake
+round_dice = RoundResolver(dice)    # Faces and result of the round being shown
+luck = LuckStats()          # Running fairness counts over every round
+advisor = Advisor()         # Best dice counts, from the packed table
+views_built = False         # Def, Battle and Luck views, built after the first screen
+assets = Assets()           # Every bitmap, palette and font, loaded once and shared
+probe = Probe()             # Call times of the hot paths, once "probe on" wraps them
+PROBE_AT_BOOT = False       # Wrap them from the start, to time startup too
+recorder = None             # Touch events going to the recording, while "record" is on
+replay = None               # Recorded events coming back in, instead of the touchscreen
+
+# Whether the dice sheets stay on disk: saves their RAM, but each refresh over them reads flash
+DICE_ON_DISK = False
 
 # ------------- Sound Effects -------------- #
 soundBeep = '/sounds/beep.wav'
 soundRoll = '/sounds/roll_dice.wav'
+beep_sound = Sound(soundBeep)   # Decoded into RAM after boot, see load_sounds
+roll_sound = Sound(soundRoll)
 
 # ------------- Display setup -------------- #
 pyportal = PyPortal()
+# Sounds play without waiting, on the AudioOut and speaker switch PyPortal owns
+voice = Voice(getattr(pyportal, "audio", None), getattr(pyportal, "_speaker_enable", None))
+
+# Every round goes in the journal, on the SD card if there is one
+rolls = journal.Journal(journal.find_journal(), capacity=128)
+rolls.add_session(dice.seed)
+
+# And to a collector on the network, if secrets.py names one
+try:
+    from secrets import secrets
+except ImportError:
+    secrets = {}
+telemetry = None
+esp = getattr(pyportal, "_esp", None)
+if telemetry_link.adafruit_esp32spi is not None and esp is not None and "telemetry_host" in secrets:
+    telemetry = telemetry_link.Telemetry(esp, rolls, secrets, idle=lambda: roll_task is None)
+
 display = board.DISPLAY
 display.rotation = 0    # or - display.rotation = 270
 
@@ -54,22 +119,18 @@ ts = adafruit_touchscreen.Touchscreen(board.TOUCH_XL, board.TOUCH_XR,
                                       x_resistance=300, # Reading from my Pyportal, your mileage may vary
                                       calibration=((5200, 59000), (5800, 57000)),
                                       size=(screen_width, screen_height))
+# Sampled at a steady rate and turned into press/hold/release events
+touch_input = TouchInput(ts)
 
 # ------------- Display Groups ------------- #
 main = displayio.Group(max_size=15)        # Main display group
-att_view = displayio.Group(max_size=5)     # Group for attack select objects
-def_view = displayio.Group(max_size=5)     # Group for defend select objects
-roll_view = displayio.Group(max_size=10)   # Group for roll view objects
+att_view = displayio.Group(max_size=8)     # Group for attack select objects
+def_view = displayio.Group(max_size=8)     # Group for defend select objects
+roll_view = displayio.Group(max_size=12)   # Group for roll view objects
+stats_view = displayio.Group(max_size=8)   # Group for the luck stats
 
-# Load the red dice sheet (bitmap)
-red_dice_sheet, palette = adafruit_imageload.load("/images/dice_red.bmp",
-                                                bitmap=displayio.Bitmap,
-                                                palette=displayio.Palette)
-
-# Load the white dice sheet (bitmap)
-wht_dice_sheet, palette = adafruit_imageload.load("/images/dice_white.bmp",
-                                                bitmap=displayio.Bitmap,
-                                                palette=displayio.Palette)
+# Load the red dice sheet (bitmap), with its own palette
+red_dice_sheet, red_palette = assets.sheet("/images/dice_red.bmp", DICE_ON_DISK)
 
 # ------------- neopixel setup ------------- #
 pixel = neopixel.NeoPixel(board.NEOPIXEL, 1, brightness=1)
@@ -80,57 +141,78 @@ LITE_RED = 0x400000
 GREEN = 0x00ff00
 BLUE = 0x0000ff
 BLACK = 0x000000
+BG_GREEN = 0x20C040
+
+boot.stage("hardware")
 
 # ------------- Setup for Images ------------- #
 # Display an image until the loop starts
 pyportal.set_background('/images/risk_board1.bmp')
 bg_group = displayio.Group(max_size=1)
 main.append(bg_group)
+boot.stage("splash")
 
 # ------------- Font stuff ------------------- #
-# Set the font and preload glyphs
-font16 = bitmap_font.load_font("/fonts/Arial-16.bdf")
-font16.load_glyphs(b'abcdefghjiklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890- ()')
+# Set the font; glyphs load as labels need them, the rest after the first screen
+font16 = assets.font("/fonts/Arial-16.bdf")
+GLYPHS = b'abcdefghjiklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890- ()'
+boot.stage("font")
+
+# ------------- Buttons ---------------------- #
+# Every button on every view: where it is, what it looks like and
+# which action it runs.  Views: 1 = Att Sel, 2 = Def Sel, 3 = Battle, 4 = Luck
+ATT_VIEW = 1
+DEF_VIEW = 2
+ROLL_VIEW = 3
+STATS_VIEW = 4
 
-# ------------- Button groups ---------------- #
-buttons = []
-att_buttons = []
-def_buttons = []
-roll_buttons = []
-
-# ---------- Main view -----------------------------------------------------------------#
 TABS_HEIGHT = 40
 TABS_WIDTH = 104    # Leaves space between buttons
 # TABS_WIDTH = int(screen_width/3)
 
-# Main User Interface Buttons, three across top of screen
-button_att_view = Button(x=2, y=10,
-                      width=TABS_WIDTH, height=TABS_HEIGHT,
-                      label="Att Sel", label_font=font16, label_color=0xFFFFFF,
-                      fill_color=0xFF0000, outline_color=0x000000,
-                      selected_fill=0x3a3a3a, selected_outline=0x2e2e2e,
-                      style = Button.ROUNDRECT, selected_label=0x828282)
-buttons.append(button_att_view)  # adding this button to the buttons group
-
-button_def_view = Button(x=TABS_WIDTH + 4, y=10,
-                      width=TABS_WIDTH+1, height=TABS_HEIGHT,
-                      label="Def Sel", label_font=font16, label_color=0x000000,
-                      fill_color=0xFFFFFF, outline_color=0x000000,
-                      selected_fill=0x3a3a3a, selected_outline=0x2e2e2e,
-                      style = Button.ROUNDRECT, selected_label=0x828282)
-buttons.append(button_def_view)  # adding this button to the buttons group
-
-button_roll_view = Button(x=TABS_WIDTH*2 + 7, y=10,
-                      width=TABS_WIDTH, height=TABS_HEIGHT,
-                      label="Battle !", label_font=font16, label_color=0xFFFFFF,
-                      fill_color=0x1030F0, outline_color=0x000000,
-                      selected_fill=0x3a3a3a, selected_outline=0x2e2e2e,
-                      style = Button.ROUNDRECT, selected_label=0x828282)
-buttons.append(button_roll_view)  # adding this button to the buttons group
+TAB_STYLE = {"style": Button.ROUNDRECT, "selected_fill": 0x3a3a3a,
+             "selected_outline": 0x2e2e2e, "selected_label": 0x828282}
+ROUND_STYLE = {"style": Button.ROUNDRECT}
+
+UI_BUTTONS = (
+    # Main User Interface Buttons, three across top of screen
+    ButtonSpec(ALL_VIEWS, "tab_att", "view", ATT_VIEW, 2, 10, TABS_WIDTH, TABS_HEIGHT,
+               "Att Sel", 0xFFFFFF, 0xFF0000, TAB_STYLE),
+    ButtonSpec(ALL_VIEWS, "tab_def", "view", DEF_VIEW, TABS_WIDTH + 4, 10, TABS_WIDTH + 1, TABS_HEIGHT,
+               "Def Sel", 0x000000, 0xFFFFFF, TAB_STYLE),
+    ButtonSpec(ALL_VIEWS, "tab_roll", "view", ROLL_VIEW, TABS_WIDTH*2 + 7, 10, TABS_WIDTH, TABS_HEIGHT,
+               "Battle !", 0xFFFFFF, 0x1030F0, TAB_STYLE),
+    # Number of attack dice, and attacking armies
+    ButtonSpec(ATT_VIEW, "att_die1", "att_dice", 1, 60, 110, 40, 60, "D1", 0x000000, 0x10C050, None),
+    ButtonSpec(ATT_VIEW, "att_die2", "att_dice", 2, 140, 110, 40, 60, "D2", 0x000000, 0x10C050, None),
+    ButtonSpec(ATT_VIEW, "att_die3", "att_dice", 3, 220, 110, 40, 60, "D3", 0x000000, 0x10C050, None),
+    ButtonSpec(ATT_VIEW, "att_less", "att_armies", -1, 20, 185, 50, 40, "-", 0x000000, 0x10C050, None),
+    ButtonSpec(ATT_VIEW, "att_more", "att_armies", 1, 250, 185, 50, 40, "+", 0x000000, 0x10C050, None),
+    # Number of defend dice, and defending armies
+    ButtonSpec(DEF_VIEW, "def_die1", "def_dice", 1, 100, 110, 40, 60, "D1", 0x000000, 0x10C050, None),
+    ButtonSpec(DEF_VIEW, "def_die2", "def_dice", 2, 180, 110, 40, 60, "D2", 0x000000, 0x10C050, None),
+    ButtonSpec(DEF_VIEW, "def_less", "def_armies", -1, 20, 185, 50, 40, "-", 0x000000, 0x10C050, None),
+    ButtonSpec(DEF_VIEW, "def_more", "def_armies", 1, 250, 185, 50, 40, "+", 0x000000, 0x10C050, None),
+    # Roll the dice, or fight the whole battle at once
+    ButtonSpec(ROLL_VIEW, "roll", "roll", None, 255, 80, 50, 100, "Roll", 0x000000, 0x10A0F0, ROUND_STYLE),
+    ButtonSpec(ROLL_VIEW, "blitz", "blitz", None, 250, 186, 60, 44, "Blitz", 0x000000, 0xF0A010, ROUND_STYLE),
+    # Luck stats, small, above the Roll button
+    ButtonSpec(ROLL_VIEW, "luck", "view", STATS_VIEW, 255, 50, 50, 26, "Luck", 0x000000, 0xC0C0C0, ROUND_STYLE),
+)
+
+hit_index = HitIndex(UI_BUTTONS, STATS_VIEW)
+buttons = {}    # By name, each made with the first view that shows it
+
+# Make the buttons of one view and add them to its Group
+def add_buttons(view, group):
+    for spec in UI_BUTTONS:
+        if spec.view == view:
+            b = make_button(spec, font16)
+            buttons[spec.name] = b
+            group.append(b.group)
 
 # Add all of the main buttons to the main Group
-for b in buttons:
-    main.append(b.group)
+add_buttons(ALL_VIEWS, main)
 
 # ---------- Attack select view --------------------------------------------------------#
 att_label = Label(font16, text="Choose number of attackers", color=0xFF0000, max_glyphs=50)
@@ -138,38 +220,16 @@ att_label.x = 30
 att_label.y = 80
 att_view.append(att_label)
 
-att_win_label = Label(font16, text="Attacker wins:% d" % att_wins, color=0xFF0000, max_glyphs=50)
-att_win_label.x = 50
-att_win_label.y = 130
-roll_view.append(att_win_label)
-
-# Make a button to change numer of attackers to 1
-button_att_die1 = Button(x=60, y=110,
-                     width=40, height=60,
-                     label="D1", label_font=font16, label_color=0x000000,
-                     fill_color=0x10C050, outline_color=0x000000)
-att_buttons.append(button_att_die1)  # adding this button to the buttons group
-
-# Make a button to change numer of attackers to 2
-button_att_die2 = Button(x=140, y=110,
-                      width=40, height=60,
-                      label="D2", label_font=font16, label_color=0x000000,
-                      fill_color=0x10C050, outline_color=0x000000)
-att_buttons.append(button_att_die2)  # adding this button to the buttons group
-
-# Make a button to change numer of attackers to 3
-button_att_die3 = Button(x=220, y=110,
-                      width=40, height=60,
-                      label="D3", label_font=font16, label_color=0x000000,
-                      fill_color=0x10C050, outline_color=0x000000)
-att_buttons.append(button_att_die3)  # adding this button to the buttons group
+att_army_label = Label(font16, text="Armies:% d" % att_armies, color=0xFF0000, max_glyphs=15)
+att_army_label.x = 105
+att_army_label.y = 205
+att_view.append(att_army_label)
 
 # Add all of the att buttons to the att_view Group
-for att in att_buttons:
-    att_view.append(att.group)
+add_buttons(ATT_VIEW, att_view)
 
 # Create the att select red dice TileGrid
-att_red_dice = displayio.TileGrid(red_dice_sheet, pixel_shader=palette,
+att_red_dice = displayio.TileGrid(red_dice_sheet, pixel_shader=red_palette,
                                 x=20,  # Position relative to its parent group
                                 y=120,
                                 width = 7,  # Number of tiles in the grid
@@ -185,100 +245,124 @@ att_red_dice[3,0] = 2
 att_red_dice[5,0] = 3
 
 att_view.append(att_red_dice)
+boot.stage("att view")
 
 # ---------- Def select view -----------------------------------------------------------#
-def_label = Label(font16, text="Choose number of defenders", color=0xFFFFFF, max_glyphs=50)
-def_label.x = 20
-def_label.y = 80
-def_view.append(def_label)
-
-def_win_label = Label(font16, text="Defender wins:% d" % def_wins, color=0xFFFFFF, max_glyphs=50)
-def_win_label.x = 50
-def_win_label.y = 210
-roll_view.append(def_win_label)
-
-# Make a button to change number of defenders to 1
-button_def_die1 = Button(x=100, y=110,
-                      width=40, height=60,
-                      label="D1", label_font=font16, label_color=0x000000,
-                      fill_color=0x10C050, outline_color=0x000000)
-def_buttons.append(button_def_die1)  # adding this button to the buttons group
-
-# Make a button to change number of defenders to 2
-button_def_die2 = Button(x=180, y=110,
-                      width=40, height=60,
-                      label="D2", label_font=font16, label_color=0x000000,
-                      fill_color=0x10C050, outline_color=0x000000)
-def_buttons.append(button_def_die2)  # adding this button to the buttons group
-
-# Add all of the def buttons to the def_view Group
-for defend in def_buttons:
-    def_view.append(defend.group)
-
-# Create the white dice TileGrid
-def_wht_dice = displayio.TileGrid(wht_dice_sheet, pixel_shader=palette,
-                                x=20,  # Position relative to its parent group
-                                y=120,
-                                width = 7,  # Number of tiles in the grid
-                                height = 1,
-                                tile_width = 40,
-                                tile_height = 40,
-                                # tile_width=None,  # Number of tiles * tile size must match BMP size
-                                # tile_height=None,  # None means auto size the tiles
-                                default_tile = 0)
-
-def_wht_dice[2,0] = 1
-def_wht_dice[4,0] = 2
-
-def_view.append(def_wht_dice)
+# This view and the next two are built after the first screen is up, see finish_boot
+def build_def_view():
+    global wht_dice_sheet, wht_palette, def_label, def_army_label, def_wht_dice
+    # Load the white dice sheet (bitmap), with its own palette
+    wht_dice_sheet, wht_palette = assets.sheet("/images/dice_white.bmp", DICE_ON_DISK)
+
+    def_label = Label(font16, text="Choose number of defenders", color=0xFFFFFF, max_glyphs=50)
+    def_label.x = 20
+    def_label.y = 80
+    def_view.append(def_label)
+
+    def_army_label = Label(font16, text="Armies:% d" % def_armies, color=0xFFFFFF, max_glyphs=15)
+    def_army_label.x = 105
+    def_army_label.y = 205
+    def_view.append(def_army_label)
+
+    # Add all of the def buttons to the def_view Group
+    add_buttons(DEF_VIEW, def_view)
+
+    # Create the white dice TileGrid
+    def_wht_dice = displayio.TileGrid(wht_dice_sheet, pixel_shader=wht_palette,
+                                    x=20,  # Position relative to its parent group
+                                    y=120,
+                                    width = 7,  # Number of tiles in the grid
+                                    height = 1,
+                                    tile_width = 40,
+                                    tile_height = 40,
+                                    # tile_width=None,  # Number of tiles * tile size must match BMP size
+                                    # tile_height=None,  # None means auto size the tiles
+                                    default_tile = 0)
+
+    def_wht_dice[2,0] = 1
+    def_wht_dice[4,0] = 2
+
+    def_view.append(def_wht_dice)
 
 # ---------- Roll view -----------------------------------------------------------------#
-# Make a button to roll dice
-btn_roll_dice = Button(x=255, y=80,
-                    width=50, height=100,
-                    label="Roll", label_font=font16, label_color=0x000000,
-                    fill_color=0x10A0F0, outline_color=0x000000,
-                    style=Button.ROUNDRECT)
-roll_buttons.append(btn_roll_dice)  # add this button to the buttons group
-
-# Create the roll red dice TileGrid
-red_dice = displayio.TileGrid(red_dice_sheet, pixel_shader=palette,
-                                x=-15,  # Position relative to its parent group
-                                y=70,
-                                width = 7,  # Number of tiles in the grid
-                                height = 1,
-                                tile_width = 40,
-                                tile_height = 40,
-                                # tile_width=None,  # Number of tiles * tile size must match BMP size
-                                # tile_height=None,  # None means auto size the tiles
-                                default_tile = 0)
-
-red_dice[1,0] = 1
-red_dice[3,0] = 2
-red_dice[5,0] = 3
-
-roll_view.append(red_dice)
-
-# Create the roll white dice TileGrid
-wht_dice = displayio.TileGrid(wht_dice_sheet, pixel_shader=palette,
-                                x=-15,  # Position relative to its parent group
-                                y=150,
-                                width = 7,  # Number of tiles in the grid
-                                height = 1,
-                                tile_width = 40,
-                                tile_height = 40,
-                                # tile_width=None,  # Number of tiles * tile size must match BMP size
-                                # tile_height=None,  # None means auto size the tiles
-                                default_tile = 0)
-
-wht_dice[2,0] = 1
-wht_dice[4,0] = 2
-
-roll_view.append(wht_dice)
-
-# Append the roll button on top
-for r in roll_buttons:
-    roll_view.append(r.group)
+def build_roll_view():
+    global att_win_count, att_left_label, def_win_count, def_left_label
+    global blitz_label, red_dice, wht_dice
+    # Attacker wins, digits drawn from pre-rendered tiles
+    att_win_count = Counter(font16, "Attacker wins: ", 0xFF0000, digits=2, x=50, y=130)
+    roll_view.append(att_win_count)
+
+    # Attackers left after a blitz
+    att_left_label = Label(font16, text="", color=0xFF0000, max_glyphs=30)
+    att_left_label.x = 50
+    att_left_label.y = 130
+    roll_view.append(att_left_label)
+
+    # Defender wins, digits drawn from pre-rendered tiles
+    def_win_count = Counter(font16, "Defender wins: ", 0xFFFFFF, digits=2, x=50, y=210)
+    roll_view.append(def_win_count)
+
+    # Defenders left after a blitz
+    def_left_label = Label(font16, text="", color=0xFFFFFF, max_glyphs=30)
+    def_left_label.x = 50
+    def_left_label.y = 210
+    roll_view.append(def_left_label)
+
+    # Odds before a battle, blitz summary after
+    blitz_label = Label(font16, text="", color=0xFFFF00, max_glyphs=30)
+    blitz_label.x = 10
+    blitz_label.y = 58
+    roll_view.append(blitz_label)
+
+    # Create the roll red dice TileGrid
+    red_dice = displayio.TileGrid(red_dice_sheet, pixel_shader=red_palette,
+                                    x=-15,  # Position relative to its parent group
+                                    y=70,
+                                    width = 7,  # Number of tiles in the grid
+                                    height = 1,
+                                    tile_width = 40,
+                                    tile_height = 40,
+                                    # tile_width=None,  # Number of tiles * tile size must match BMP size
+                                    # tile_height=None,  # None means auto size the tiles
+                                    default_tile = 0)
+
+    red_dice[1,0] = 1
+    red_dice[3,0] = 2
+    red_dice[5,0] = 3
+
+    roll_view.append(red_dice)
+
+    # Create the roll white dice TileGrid
+    wht_dice = displayio.TileGrid(wht_dice_sheet, pixel_shader=wht_palette,
+                                    x=-15,  # Position relative to its parent group
+                                    y=150,
+                                    width = 7,  # Number of tiles in the grid
+                                    height = 1,
+                                    tile_width = 40,
+                                    tile_height = 40,
+                                    # tile_width=None,  # Number of tiles * tile size must match BMP size
+                                    # tile_height=None,  # None means auto size the tiles
+                                    default_tile = 0)
+
+    wht_dice[2,0] = 1
+    wht_dice[4,0] = 2
+
+    roll_view.append(wht_dice)
+
+    # Append the roll buttons on top
+    add_buttons(ROLL_VIEW, roll_view)
+
+# ---------- Luck stats view -----------------------------------------------------------#
+stats_lines = []    # One Label per line, filled in when the view is shown
+
+def build_stats_view():
+    for line in range(7):
+        stats_label = Label(font16, text="", color=0xFFFF00 if line >= 4 else
+                            (0xFF0000 if line < 2 else 0xFFFFFF), max_glyphs=36)
+        stats_label.x = 10
+        stats_label.y = 66 + 25 * line
+        stats_view.append(stats_label)
+        stats_lines.append(stats_label)
 
 # ------------- Functions ------------------------------------------------------------- #
 # Backlight function, 0 - 1
@@ -287,148 +371,215 @@ def set_backlight(val):
     board.DISPLAY.auto_brightness = False
     board.DISPLAY.brightness = val
 
-# Hide layer function
-def hideLayer(hide_target):
-    try:
-        main.remove(hide_target)
-    except ValueError:
-        pass
-
-# Show layer function
-def showLayer(show_target):
-    try:
-        time.sleep(0.1)
-        main.append(show_target)
-    except ValueError:
-        pass
-
-# Function to sort the list by i item of tuple
-def Sort_Tuple(tup):
-    # Small anonymous function <lambda x> determines key
-    # key is set to sort using x[i] element of
-    # supplied tuple
-    # reverse = False is default (Sorts in Ascending order)
-    return(sorted(tup, key = lambda x: x[0], reverse = True))
-
 # Roll dice function
 def roll_dice(att_num_die, def_num_die):
-    global red_dice_position
-    global wht_dice_position
+    """Start a roll as a background task; the touch loop keeps running.
+        :param att_num_die: Number of attack dice, 1 - 3
+        :param def_num_die: Number of defend dice, 1 - 2
+    """
+    global roll_task
+    scheduler.cancel(roll_task)
+    scheduler.reset_latency()
+    roll_task = scheduler.add(roll_dice_steps(att_num_die, def_num_die), "roll")
+
+# The roll itself, one step per yield (yield = seconds to wait)
+def roll_dice_steps(att_num_die, def_num_die):
     global att_wins
     global def_wins
-    att_tup = []
-    def_tup = []
-    att_label = ''
-    def_label = ''
-    def_win_label.text = ("Defender wins: ")
-    att_win_label.text = ("Attacker wins: ")
-    #def_win_label.text = ('')
-    #att_win_label.text = ('') 
-    
-    pyportal.play_file(soundRoll, False)
-    # While the wave is playing, show random dice values
-    t = time.monotonic()
-    while time.monotonic() - t < 2.3:   # 2.3 second wave file
-        for num in range(att_num_die):
-            red_dice[red_dice_position[num], 0] = random.randint(1, 6)
-        for num in range(def_num_die):
-            wht_dice[wht_dice_position[num], 0] = random.randint(1, 6)    
-        time.sleep(.2875) 
-   
-    # Then roll dice and add to the tuples...
-    for num in range(att_num_die):
-        rand_num = random.randint(1, 6)
-        red_dice[red_dice_position[num], 0] = rand_num
-        attack_tuple = ((rand_num,) + (num,),)
-        att_tup += (attack_tuple)
+    att_wins = 0
+    def_wins = 0
+    blitz_label.text = ''
+    clear_wins()
 
-    att_sort_tup = Sort_Tuple(att_tup)
-    #print(att_sort_tup)
-    att_hiDice = att_sort_tup[0]
+    # Roll the real dice up front, so a skipped animation shows the same result.
+    # Hi pair, and the Lo pair if both sides rolled more than one die.
+    round_dice.roll_and_resolve(att_num_die, def_num_die)
+    rolls.add_round(journal.ROLL, round_dice, att_num_die, def_num_die)
+    luck.add_round(round_dice, att_num_die, def_num_die)
 
+    try:
+        voice.play(roll_sound)
+        # While the wave is playing, show random dice values, one frame per yield
+        shake_frames.start()
+        while shake_frames.elapsed() < SHAKE_TIME:
+            first = shake_dice.take(att_num_die + def_num_die)
+            for num in range(att_num_die):
+                red_dice[red_dice_position[num], 0] = shake_dice.faces[first + num]
+            first += att_num_die
+            for num in range(def_num_die):
+                wht_dice[wht_dice_position[num], 0] = shake_dice.faces[first + num]
+            yield shake_frames.frame()
+
+        # Then show the real roll...
+        show_dice(att_num_die, def_num_die)
+
+        # Show the roll result for a bit, then blink each pair, update winner lables
+        yield 2
+        for pair in range(round_dice.pairs):
+            blink_color = score_pair(pair)
+            att_pos = round_dice.att_order[pair]
+            def_pos = round_dice.def_order[pair]
+            yield from blinkDie(round_dice.att[att_pos], round_dice.defend[def_pos],
+                                att_pos, def_pos, blink_color)
+            show_wins()
+    finally:
+        # Runs when done, and straight away when the roll is skipped by a tap
+        voice.stop(roll_sound)
+        show_dice(att_num_die, def_num_die)
+        for pair in range(att_wins + def_wins, round_dice.pairs):
+            score_pair(pair)
+        show_wins()
+        pixel.fill(BLUE)
+
+# Change the army counts, and their labels
+def set_armies(att, defend):
+    global att_armies
+    global def_armies
+    att_armies = max(0, min(MAX_ARMIES, att))
+    def_armies = max(0, min(MAX_ARMIES, defend))
+    att_army_label.text = "Armies:% d" % att_armies
+    if views_built:
+        def_army_label.text = "Armies:% d" % def_armies
+    show_advice()
+
+# Highlight the advised dice buttons, and the win chance with the chosen dice
+def show_advice():
+    advice = advisor.advise(att_armies, def_armies)
+    for num in range(1, 4):
+        buttons["att_die%d" % num].selected = advice is not None and num == advice.att_dice
+    if views_built:
+        for num in range(1, 3):
+            buttons["def_die%d" % num].selected = advice is not None and num == advice.def_dice
+        def_label.text = ("Choose number of defenders" if advice is None else
+                          "Choose defenders, best is %d" % advice.def_dice)
+    if advice is None:
+        att_label.text = "Choose number of attackers"
+        return
+    if advice.win is None:
+        att_label.text = "Choose attackers, best is %d" % advice.att_dice
+    elif advice.win[att_num_die - 1]:
+        att_label.text = "Choose attackers, %d win% d%%" % (
+            att_num_die, round(100 * advice.win[att_num_die - 1]))
+    else:
+        att_label.text = "Choose attackers, at most %d" % min(att_armies, 3)
+
+# Show the chance of winning the whole battle
+def show_odds():
+    global odds_task
+    scheduler.cancel(odds_task)
+    odds_task = None
+    if att_armies < 1 or def_armies < 1:
+        blitz_label.text = ''
+    elif att_armies <= TABLE_SIZE and def_armies <= TABLE_SIZE:
+        blitz_label.text = "Odds to win:% d%%" % round(100 * win_probability(att_armies, def_armies))
+    else:
+        # Big armies take a while to work out, do it in the background
+        blitz_label.text = "Odds to win: ..."
+        odds_task = scheduler.add(odds_steps(att_armies, def_armies), "odds")
+
+def odds_steps(att, defend):
+    for odds in battle_steps(att, defend):
+        yield
+    blitz_label.text = "Odds to win:% d%%" % round(100 * odds.win)
+
+# Fight the whole battle with no animation, then show a summary
+def run_blitz():
+    if att_armies < 1 or def_armies < 1:
+        blitz_label.text = "Set both armies first"
+        return
+    if att_armies <= blitz_stop_at:
+        blitz_label.text = "Attacker already at% d" % att_armies
+        return
+    scheduler.cancel(odds_task)
+    att_start = att_armies
+    def_start = def_armies
+    att_left, def_left, rounds = blitz(att_armies, def_armies, blitz_stop_at,
+                                         round_dice, journal_blitz_round)
+    set_armies(att_left, def_left)
+    for pos in red_dice_position:
+        red_dice[pos, 0] = 0
+    for pos in wht_dice_position:
+        wht_dice[pos, 0] = 0
+    if def_left == 0:
+        blitz_label.text = "Blitz won in% d rounds" % rounds
+        pixel.fill(RED)
+    elif att_left == 0:
+        blitz_label.text = "Blitz lost in% d rounds" % rounds
+        pixel.fill(WHITE)
+    else:
+        blitz_label.text = "Blitz stopped after% d" % rounds
+        pixel.fill(BLUE)
+    att_win_count.hidden = True
+    def_win_count.hidden = True
+    att_left_label.text = "Attacker left:% d of% d" % (att_left, att_start)
+    def_left_label.text = "Defender left:% d of% d" % (def_left, def_start)
+    print('Blitz %d v %d -> %d v %d in %d rounds' % (att_start, def_start, att_left, def_left, rounds))
+
+def journal_blitz_round(resolver, att_dice, def_dice):
+    rolls.add_round(journal.BLITZ, resolver, att_dice, def_dice)
+    luck.add_round(resolver, att_dice, def_dice)
+
+# Put the rolled values on the dice
+def show_dice(att_num_die, def_num_die):
+    for num in range(att_num_die):
+        red_dice[red_dice_position[num], 0] = round_dice.att[num]
     for num in range(def_num_die):
-        rand_num = random.randint(1, 6)
-        wht_dice[wht_dice_position[num], 0] = rand_num
-        defend_tuple = ((rand_num,) + (num,),)
-        def_tup += (defend_tuple)
-
-    def_sort_tup = Sort_Tuple(def_tup)
-    #print(def_sort_tup)
-    def_hiDice = def_sort_tup[0]
-
-    # Determine Hi pair winner
-    if (def_hiDice[0] >= att_hiDice[0]):
-        def_wins += 1
-        def_label = "Defender wins: " + str(def_wins)
-        blink_color = WHITE
-
-    if (att_hiDice[0] > def_hiDice[0]):
+        wht_dice[wht_dice_position[num], 0] = round_dice.defend[num]
+
+# Score one pair of dice (0 = hi, 1 = lo). Returns the blink colour.
+def score_pair(pair):
+    global att_wins
+    global def_wins
+    if round_dice.winners[pair] == ATT_WIN:
         att_wins += 1
-        att_label = "Attacker wins: " + str(att_wins)
-        blink_color = RED
-
-    # Show the roll result for a bit, then blink Hi pair, update winner lables
-    time.sleep(2)
-    blinkDie(att_hiDice[0], def_hiDice[0], att_hiDice[1], def_hiDice[1], blink_color)
-    def_win_label.text = def_label
-    att_win_label.text = att_label
-
-    # If there is a Lo pair determine winner
-    if att_num_die > 1 and def_num_die > 1:
-        att_loDice = att_sort_tup[1]
-        def_loDice = def_sort_tup[1]
-        if (def_loDice[0] >= att_loDice[0]):
-            def_wins += 1
-            def_label = "Defender wins: " + str(def_wins)
-            blink_color = WHITE
-
-        if (att_loDice[0] > def_loDice[0]):
-            att_wins += 1
-            att_label = "Attacker wins: " + str(att_wins)
-            blink_color = RED
-
-        # Blink Lo pair, update winner lables
-        blinkDie(att_loDice[0], def_loDice[0], att_loDice[1], def_loDice[1], blink_color)
-        def_win_label.text = def_label
-        att_win_label.text = att_label
-
-# Blink winners function
+        return RED
+    def_wins += 1
+    return WHITE
+
+# Update winner counters, only a side that won something is shown
+def show_wins():
+    def_win_count.hidden = not def_wins
+    def_win_count.show(def_wins)
+    att_win_count.hidden = not att_wins
+    att_win_count.show(att_wins)
+
+# Winner counters with no number yet, blitz summary gone
+def clear_wins():
+    att_left_label.text = ''
+    def_left_label.text = ''
+    att_win_count.clear()
+    def_win_count.clear()
+    att_win_count.hidden = False
+    def_win_count.hidden = False
+
+# Blink winners, one step per yield
 def blinkDie(att_val, def_val, att_pos, def_pos, blink_color):
 
     for i in range(3):
         red_dice[red_dice_position[att_pos], 0] = 0
         wht_dice[wht_dice_position[def_pos], 0] = 0
         pixel.fill(BLACK)
-        time.sleep(.5)
+        yield .5
         red_dice[red_dice_position[att_pos], 0] = att_val
         wht_dice[wht_dice_position[def_pos], 0] = def_val
         pixel.fill(blink_color)
-        time.sleep(.5)
+        yield .5
 
     pixel.fill(BLUE)
 
-# This handles switching Images and Icons
-def set_image(group, filename):
-    """Set the image file for a given goup for display.
-    This is most useful for Icons or image slideshows.
+# A solid background, drawn from one small tile instead of a full screen image
+def set_fill(group, color):
+    """Fill the screen behind a given group's views with one colour.
         :param group: The chosen group
-        :param filename: The filename of the chosen image
+        :param color: The colour, e.g. 0x20C040
     """
-    # print("Set image to ", filename)
     if group:
         group.pop()
-
-    if not filename:
-        return  # we're done, no icon desired
-
-    image_file = open(filename, "rb")
-    image = displayio.OnDiskBitmap(image_file)
-    try:
-        image_sprite = displayio.TileGrid(image, pixel_shader=displayio.ColorConverter())
-    except TypeError:
-        image_sprite = displayio.TileGrid(image, pixel_shader=displayio.ColorConverter(),
-                                          position=(0, 0))
-    group.append(image_sprite)
+    palette = displayio.Palette(1)
+    palette[0] = color
+    tile = displayio.Bitmap(16, 16, 1)
+    group.append(displayio.TileGrid(tile, pixel_shader=palette,
+                                    width=display.width // 16, height=display.height // 16))
 
 # View switching function
 #pylint: disable=global-statement
@@ -436,168 +587,485 @@ def switch_view(what_view):
     global view_live
     if what_view == 1:
         pixel.fill(LITE_RED)
-        hideLayer(def_view)
-        hideLayer(roll_view)
-        button_att_view.selected = False
-        button_def_view.selected = True
-        button_roll_view.selected = True
-        showLayer(att_view)
+        buttons["tab_att"].selected = False
+        buttons["tab_def"].selected = True
+        buttons["tab_roll"].selected = True
+        views.show(ATT_VIEW)
         view_live = 1
-        print("Att View On")
-        print()
     elif what_view == 2:
         pixel.fill(LITE_WHT)
-        hideLayer(att_view)
-        hideLayer(roll_view)
-        button_att_view.selected = True
-        button_def_view.selected = False
-        button_roll_view.selected = True
-        showLayer(def_view)
+        buttons["tab_att"].selected = True
+        buttons["tab_def"].selected = False
+        buttons["tab_roll"].selected = True
+        views.show(DEF_VIEW)
         view_live = 2
-        print("Def View On")
-        print()
     #else:
     elif what_view == 3:
         pixel.fill(BLUE)
         # Clear old values if switching back to Battle
-        def_win_label.text = ("Defender wins: ")
-        att_win_label.text = ("Attacker wins: ")
-        #def_win_label.text = ('')
-        #att_win_label.text = ('')
-        hideLayer(att_view)
-        hideLayer(def_view)
-        button_att_view.selected = True
-        button_def_view.selected = True
-        button_roll_view.selected = False
-        showLayer(roll_view)
+        clear_wins()
+        buttons["tab_att"].selected = True
+        buttons["tab_def"].selected = True
+        buttons["tab_roll"].selected = False
+        show_odds()
+        views.show(ROLL_VIEW)
         view_live = 3
-        print("Roll View On")
-        print()
+    elif what_view == 4:
+        pixel.fill(BLUE)
+        # No tab for this one, Battle ! leads back
+        buttons["tab_att"].selected = True
+        buttons["tab_def"].selected = True
+        buttons["tab_roll"].selected = True
+        show_stats()
+        views.show(STATS_VIEW)
+        view_live = 4
 #pylint: enable=global-statement
 
+# Fill in the luck view from the running counts
+def show_stats():
+    for line, name, faces in ((0, "Red", luck.red), (2, "White", luck.white)):
+        stats_lines[line].text = "%s dice% d  chi2 %.1f %s" % (
+            name, faces.total, faces.chi2,
+            "high" if faces.chi2 > CHI2_LIMIT else "fair")
+        stats_lines[line + 1].text = "  ".join("%d:%d" % (f, faces.counts[f]) for f in range(1, 7))
+    observed, expected = luck.pair_win(att_num_die, def_num_die)
+    if observed is None:
+        stats_lines[4].text = "%dv%d pairs: none yet" % (att_num_die, def_num_die)
+    else:
+        stats_lines[4].text = "%dv%d att pairs% d%% odds% d%%" % (
+            att_num_die, def_num_die, round(100 * observed), round(100 * expected))
+    pairs = sum(luck.pairs)
+    if pairs:
+        won = sum(luck.att_pairs)
+        odds = 0
+        for m in range(len(luck.pairs)):
+            odds += luck.expected[m] * luck.pairs[m]
+        stats_lines[5].text = "All att pairs% d%% odds% d%%" % (
+            round(100 * won / pairs), round(100 * odds / pairs))
+    else:
+        stats_lines[5].text = ""
+    stats_lines[6].text = "Best runs att% d def% d" % (luck.best_att_streak, luck.best_def_streak)
+
+# ------------- Button actions ------------- #
+# Tabs, only if that view is not already showing
+def on_view(view):
+    if view_live == view:
+        return
+    voice.play(beep_sound)
+    switch_view(view)
+    if view == ROLL_VIEW:
+        # Show as many dice as were selected
+        for num, pos in enumerate(red_dice_position):
+            red_dice[pos, 0] = num + 1 if num < att_num_die else 0
+        for num, pos in enumerate(wht_dice_position):
+            wht_dice[pos, 0] = num + 1 if num < def_num_die else 0
+
+# Number of attack dice, show only the chosen die
+def on_att_dice(num):
+    global att_num_die
+    for n, pos in enumerate(red_dice_position):
+        att_red_dice[pos, 0] = num if n + 1 == num else 0
+    att_num_die = num
+    show_advice()
+
+# Number of defend dice, show only the chosen die
+def on_def_dice(num):
+    global def_num_die
+    for n, pos in enumerate(wht_dice_position):
+        def_wht_dice[pos, 0] = num if n + 1 == num else 0
+    def_num_die = num
+    show_advice()
+
+def on_att_armies(step):
+    set_armies(att_armies + step, def_armies)
+
+def on_def_armies(step):
+    set_armies(att_armies, def_armies + step)
+
+def on_roll(arg):
+    roll_dice(att_num_die, def_num_die)
+
+def on_blitz(arg):
+    run_blitz()
+
+# Background task: decode the wavs so the first play doesn't have to
+def load_sounds():
+    yield from beep_sound.load_steps()
+    yield from roll_sound.load_steps()
+
+# ------------- Console commands ------------- #
+def print_sound():
+    for sound in (beep_sound, roll_sound):
+        if sound.loaded:
+            print('%s: %d bytes in RAM' % (sound.path, len(sound.samples)))
+        else:
+            print('%s: not decoded yet' % sound.path)
+    print('Playing: %s, %d plays' % (voice.playing, voice.plays))
+
+console.add("sound", print_sound, "decoded sounds and voice state")
+console.add("boot", boot.report, "startup stage times and free memory")
+console.add("assets", assets.report, "loaded images and fonts, and their RAM")
+
+def print_fps():
+    print('Shake ' + shake_frames.report())
+    print('Display refresh calls %d (%d sent again), %.3f s' % (views.frames, views.retries, views.refresh_time))
+
+console.add("fps", print_fps, "dice animation frame counters")
+
+def print_alloc(rounds="100"):
+    used = allocation_check(int(rounds))
+    if used is None:
+        print('gc.mem_free() not available')
+    else:
+        print('%d bytes allocated over %s rounds' % (used, rounds))
+
+console.add("alloc", print_alloc, "[rounds] heap used resolving rounds")
+
+# Print the dice seed, or replay: reseed, then skip to a draw number
+def dice_seed(seed=None, draw="0"):
+    if seed is not None:
+        dice.reseed(int(seed))
+        dice.skip(int(draw))
+        rolls.add_session(dice.seed)
+    print('Dice seed %d, %d faces drawn' % (dice.seed, dice.draws))
+
+console.add("seed", dice_seed, "[seed [draw]] show or replay the dice seed")
+
+# Write the journal now, and list the last few rounds
+def print_journal(last="5"):
+    rolls.flush()
+    print('Journal %s: %d rounds, %d written, %d lost' % (
+        rolls.path, rolls.count, rolls.flushed - rolls.lost, rolls.lost))
+    entries = list(rolls.recent())
+    for e in entries[-int(last):]:
+        print('%8d %s %r v %r %r' % (e.time, "SRB"[e.kind], e.att, e.defend, e.winners))
+
+console.add("journal", print_journal, "[last] flush the roll journal and list rounds")
+
+# Every matchup's pair wins against the odds, plus face counts
+def print_stats():
+    for name, faces in (("Red", luck.red), ("White", luck.white)):
+        print('%-5s %s  chi2 %.2f (fair dice < %.2f 95%% of the time)' % (
+            name, faces.counts[1:], faces.chi2, CHI2_LIMIT))
+    for m, (a, d) in enumerate(MATCHUPS):
+        observed, expected = luck.pair_win(a, d)
+        if observed is not None:
+            print('%dv%d %5d rounds, att won %.1f%% of pairs, odds %.1f%%' % (
+                a, d, luck.rounds[m], 100 * observed, 100 * expected))
+    print('Longest runs: att %d, def %d, now %s %d' % (
+        luck.best_att_streak, luck.best_def_streak,
+        "att" if luck.streak_side == ATT_WIN else "def", luck.streak))
+
+console.add("stats", print_stats, "luck stats for every dice matchup")
+
+def print_advice(att=None, defend=None):
+    att = att_armies if att is None else int(att)
+    defend = def_armies if defend is None else int(defend)
+    advice = advisor.advise(att, defend)
+    if advice is None:
+        print('No advice for %d v %d' % (att, defend))
+        return
+    print('%d v %d: attack with %d (%d by round losses), defend with %d (%d by round losses)' % (
+        att, defend, advice.att_dice, advice.att_dice_by_loss,
+        advice.def_dice, advice.def_dice_by_loss))
+    if advice.win is not None:
+        print('Win chance with 1, 2, 3 attack dice: %.1f%% %.1f%% %.1f%%' % (
+            100 * advice.win[0], 100 * advice.win[1], 100 * advice.win[2]))
+
+console.add("advice", print_advice, "[att def] best dice counts for a battle")
+
+# Show or set how far down the attacker may go before a blitz stops
+def set_blitz_stop(stop_at=None):
+    global blitz_stop_at
+    if stop_at is not None:
+        if int(stop_at) < 0:
+            raise ValueError("stop can't be negative")
+        blitz_stop_at = int(stop_at)
+    print('Blitz stops with the attacker at %d' % blitz_stop_at)
+
+console.add("blitz", set_blitz_stop, "[stop] attackers a blitz leaves, 0 fights to the end")
+
+# Plan a chain of attacks in the background, e.g. "chain 20 3 5 2 leave 2"
+def plan_chain(att, *defenders):
+    leave = 1
+    defenders = list(defenders)
+    if "leave" in defenders:
+        i = defenders.index("leave")
+        leave = [int(n) for n in defenders[i + 1:]]
+        del defenders[i:]
+        if not leave or len(leave) > len(defenders):
+            raise ValueError("leave one number, or one per defender")
+        # The last number given holds for the rest of the chain
+        leave += [leave[-1]] * (len(defenders) - len(leave))
+    if not defenders:
+        raise ValueError("need defenders")
+    att = int(att)
+    defenders = [int(d) for d in defenders]
+    if att < 1 or min(defenders) < 0 or (leave != 1 and min(leave) < 0):
+        raise ValueError("need att 1 or more, def and leave 0 or more")
+    scheduler.add(chain_steps(att, defenders, leave), "chain")
+
+def chain_steps(att, defenders, leave):
+    for result in plan_steps(att, defenders, leave):
+        yield
+    print('Chain %d v %s, leaving %s:' % (att, defenders, leave))
+    for i in range(len(defenders)):
+        print('  %d: take it% .1f%%, expect% .1f attackers in' % (
+            i + 1, 100 * result.reach[i], result.survivors[i]))
+    print('Whole chain% .1f%%' % (100 * result.win))
+
+console.add("chain", plan_chain, "att def [def ...] [leave n ...] odds of a chain of attacks")
+
+# Actions that repeat while the button is held
+REPEAT_ACTIONS = ("att_armies", "def_armies")
+
+# ButtonSpec action name -> function, called with the spec's arg
+ACTIONS = {
+    "view": on_view,
+    "att_dice": on_att_dice,
+    "def_dice": on_def_dice,
+    "att_armies": on_att_armies,
+    "def_armies": on_def_armies,
+    "roll": on_roll,
+    "blitz": on_blitz,
+}
+
+# Handle one touch event
+def on_touch(event, x, y):
+    global touch_swallowed
+    if not views_built:
+        ensure_views()
+    if event == RELEASE:
+        touch_swallowed = False
+        return
+    if touch_swallowed:
+        return
+    if event == PRESS and roll_task is not None:
+        # A tap while the dice are rolling skips straight to the result
+        scheduler.cancel(roll_task)
+        touch_swallowed = True
+        return
+    # One lookup in the live view's hit grid finds the button
+    i = hit_index.lookup(view_live, x, y)
+    if i < 0:
+        return
+    spec = UI_BUTTONS[i]
+    if event == HOLD and spec.action not in REPEAT_ACTIONS:
+        return
+    ACTIONS[spec.action](spec.arg)
+
+# ------------- Staged startup ------------- #
+# Everything not on the first screen, one piece per pass of the loop
+def finish_boot():
+    global views_built
+    build_def_view()
+    boot.stage("def view")
+    yield
+    build_roll_view()
+    boot.stage("roll view")
+    yield
+    build_stats_view()
+    boot.stage("stats view")
+    yield
+    font16.load_glyphs(GLYPHS)
+    boot.stage("glyphs")
+    views_built = True
+    show_advice()
+
+boot_steps = finish_boot()
+
+# A touch can't wait for the background build, finish it now
+def ensure_views():
+    for _ in boot_steps:
+        pass
+
+# ------------- Instrumentation ------------- #
+# Hot paths the probe can time.  They are only wrapped while probing
+# is on, so the rest of the time they cost nothing extra.  The names
+# are looked up as globals on every call, so rebinding them is enough.
+PROBED = ("roll_dice", "switch_view", "on_touch")
+PROBED_STEPS = ("blinkDie",)    # Generators, timed by their steps
+probing = False
+plain = {}
+for name in PROBED + PROBED_STEPS:
+    plain[name] = globals()[name]
+
+def set_probes(on):
+    global probing
+    probing = on
+    for name in PROBED:
+        globals()[name] = probe.wrap(name, plain[name]) if on else plain[name]
+    for name in PROBED_STEPS:
+        globals()[name] = probe.wrap_gen(name, plain[name]) if on else plain[name]
+
+def probe_command(what="dump"):
+    if what == "on":
+        set_probes(True)
+    elif what == "off":
+        set_probes(False)
+    elif what == "clear":
+        probe.clear()
+    elif what == "dump":
+        probe.dump()
+    else:
+        raise ValueError("on, off, clear or dump")
+    print('Probes %s, %d calls recorded' % ("on" if probing else "off", probe.count))
+
+def print_telemetry():
+    if telemetry is None:
+        print('Telemetry off: needs telemetry_host, ssid and password in secrets.py')
+    else:
+        telemetry.report()
+
+console.add("telemetry", print_telemetry, "rounds sent to the collector, queue depth")
+console.add("probe", probe_command, "[on|off|clear|dump] time the hot paths")
+
+if PROBE_AT_BOOT:
+    set_probes(True)
+
+# ------------- Record and replay ------------- #
+def session_start():
+    return SessionStart(view_live, att_num_die, def_num_die, dice.seed, dice.draws,
+                        shake_dice.seed, shake_dice.draws, att_armies, def_armies)
+
+# Put the app back where a recording started
+def restore_start(start):
+    global touch_swallowed
+    ensure_views()
+    scheduler.cancel(roll_task)
+    touch_swallowed = False
+    dice.reseed(start.seed)
+    dice.skip(start.draws)
+    shake_dice.reseed(start.shake_seed)
+    shake_dice.skip(start.shake_draws)
+    on_att_dice(start.att_dice)
+    on_def_dice(start.def_dice)
+    set_armies(start.att_armies, start.def_armies)
+    clear_wins()
+    switch_view(ATT_VIEW)
+    if start.view != ATT_VIEW:
+        on_view(start.view)
+
+def record_command(what="start"):
+    global recorder
+    if what == "start":
+        recorder = Recorder(journal.find_journal(name=RECORDING_NAME), session_start())
+        print('Recording touches to %s' % recorder.path)
+    elif what == "stop":
+        if recorder is not None:
+            recorder.flush()
+            print('Recorded %d touch events to %s' % (recorder.count, recorder.path))
+        recorder = None
+    else:
+        raise ValueError("start or stop")
+
+console.add("record", record_command, "[start|stop] record touches, with the dice seeds")
+
+def replay_command(speed="real"):
+    global replay
+    if speed not in ("real", "fast"):
+        raise ValueError("real or fast")
+    record_command("stop")
+    path = journal.find_journal(name=RECORDING_NAME)
+    try:
+        replay = Replayer(path, speed == "fast")
+    except OSError:
+        print('No recording at %s' % path)
+        return
+    if replay.done:
+        replay = None
+        raise ValueError("%s has no touches in it" % path)
+    restore_start(replay.start)
+    print('Replaying %s' % path)
+
+console.add("replay", replay_command, "[real|fast] play the recorded touches back, with latencies")
+
 #----------- End functions -------------------------------------------------------------#
 
 # Set variables and startup states
 # Set the background
-set_image(bg_group, "/images/bg_green.bmp")
-# Set the Backlight
-set_backlight(1)    # Or vary with ambient...
+set_fill(bg_group, BG_GREEN)
+# Set the Backlight, from here on the power governor follows the room and dims it when idle
+set_backlight(1)
+power = PowerGovernor(touch_input, display, pixel, board.LIGHT)
+console.add("power", power.report, "time in each power stage and loop duty cycle")
 # Init the view_live variable
 view_live = 1
 # Set neopixel to lite red
 pixel.fill(LITE_RED)
 # Set up buttons
-button_att_view.selected = False
-button_def_view.selected = True
-button_roll_view.selected = True
-# Set up layers
-showLayer(att_view)
+buttons["tab_att"].selected = False
+buttons["tab_def"].selected = True
+buttons["tab_roll"].selected = True
+show_advice()
+# Set up layers, all resident, only the att view showing
+views = ViewManager(display, main, [None, att_view, def_view, roll_view, stats_view])
+views.show(ATT_VIEW)
 print('Att view initialized')
 print()
-hideLayer(def_view)
-hideLayer(roll_view)
-# Come out of splash screen
-board.DISPLAY.show(main)
+# Come out of splash screen, from here on the loop does the refreshing
+views.start()
+boot.stage("first screen")
+# The other views, then the sounds, are made in the background
+scheduler.add(boot_steps, "boot")
+scheduler.add(load_sounds(), "sounds", draws=False)
+if telemetry is not None:
+    scheduler.add(telemetry.steps(), "telemetry", draws=False)
 
 # ------------- Code Loop ------------- #
 while True:
-    touch = ts.touch_point
-    time.sleep(.05)     # Seems to help debounce touchscreen
-
     # ------------- Handle Button Press Detection  ------------- #
-    if touch:  # Only do this if the screen is touched
-        # loop with buttons using enumerate() to number each button group as i
-        for i, b in enumerate(buttons):
-            if b.contains(touch):  # Test each button to see if it was pressed
-                print('Main button% d pressed' % i)
-                print("Touch" + str(touch))
-                
-                if i == 0 and view_live != 1:  # only if att_view is visible
-                    pyportal.play_file(soundBeep)
-                    switch_view(1)
-                    while ts.touch_point:  # for debounce
-                        pass
-                if i == 1 and view_live != 2:  # only if def_view is visible
-                    pyportal.play_file(soundBeep)
-                    switch_view(2)
-                    while ts.touch_point:
-                        pass
-                if i == 2 and view_live != 3:  # only if roll_view is visible
-                    pyportal.play_file(soundBeep)
-                    switch_view(3)
-                    while ts.touch_point:
-                        pass
-                    if att_num_die == 1:
-                        red_dice[1,0] = 1
-                        red_dice[3,0] = 0
-                        red_dice[5,0] = 0
-                    elif att_num_die == 2:
-                        red_dice[1,0] = 1
-                        red_dice[3,0] = 2
-                        red_dice[5,0] = 0
-                    else:
-                        red_dice[1,0] = 1
-                        red_dice[3,0] = 2
-                        red_dice[5,0] = 3
-
-                    if def_num_die == 1:
-                        wht_dice[2,0] = 1
-                        wht_dice[4,0] = 0
-                    else:
-                        wht_dice[2,0] = 1
-                        wht_dice[4,0] = 2
-
-        for j, att in enumerate(att_buttons):
-            if att.contains(touch):  # Test each button to see if it was pressed
-                print('Att select% d pressed' % j)
-                if j == 0 and view_live == 1:  # only if att_view is visible:
-                    while ts.touch_point:
-                        pass
-                    att_red_dice[1, 0] = 1
-                    att_red_dice[3, 0] = 0
-                    att_red_dice[5, 0] = 0
-                    att_num_die = 1
-                if j == 1 and view_live == 1:  # only if att_view is visible:
-                    while ts.touch_point:
-                        pass
-                    att_red_dice[1, 0] = 0
-                    att_red_dice[3, 0] = 2
-                    att_red_dice[5, 0] = 0
-                    att_num_die = 2
-                if j == 2 and view_live == 1:  # only if att_view is visible:
-                    while ts.touch_point:
-                        pass
-                    att_red_dice[1, 0] = 0
-                    att_red_dice[3, 0] = 0
-                    att_red_dice[5, 0] = 3
-                    att_num_die = 3
-
-        for k, defend in enumerate(def_buttons):
-            if defend.contains(touch):  # Test each button to see if it was pressed
-                print('Def select% d pressed' % k)
-                if k == 0 and view_live == 2:  # only if def_view is visible:
-                    while ts.touch_point:
-                        pass
-                    def_wht_dice[2, 0] = 1
-                    def_wht_dice[4, 0] = 0
-                    def_num_die = 1
-                if k == 1 and view_live == 2:  # only if def_view is visible:
-                    while ts.touch_point:
-                        pass
-                    def_wht_dice[2, 0] = 0
-                    def_wht_dice[4, 0] = 2
-                    def_num_die = 2
-
-        for m, roll in enumerate(roll_buttons):
-            if roll.contains(touch):  # Test each button to see if it was pressed
-                print("Roll button pressed")
-                if m == 0 and view_live == 3:  # only if roll_view is visible:
-                    while ts.touch_point:
-                        pass
-                    print('Number of attackers% d' % att_num_die)
-                    print('Number of defenders% d' % def_num_die)
-                    roll_dice(att_num_die,def_num_die)
-                    att_wins = 0
-                    def_wins = 0
-                    att_tup = []
-                    def_tup = []
\ No newline at end of file
+    touch_input.poll()
+    # A touch wakes a dark screen without pressing what's under it
+    if power.update(roll_task is not None or replay is not None):
+        touch_swallowed = True
+    # While replaying, the recording stands in for the touchscreen
+    source = touch_input if replay is None else replay
+    event = source.get()
+    while event:
+        views.changed()
+        boot.mark_once("first touch")
+        if recorder is not None:
+            recorder.add(event, source.x, source.y)
+        on_touch(event, source.x, source.y)
+        event = source.get()
+    if replay is not None:
+        while touch_input.get():
+            pass
+
+    # ------------- Run animations ------------- #
+    if scheduler.run():
+        views.changed()
+    if roll_task is not None and roll_task.done:
+        print('Roll done, worst input latency %.3f s' % scheduler.reset_latency())
+        roll_task = None
+
+    # One refresh for everything that changed this pass
+    views.refresh()
+    if replay is not None:
+        replay.refreshed()
+        if replay.finished is not None and roll_task is None:
+            replay.report()
+            replay = None
+    # A command can change the screen; it goes out on the next pass
+    if console.poll():
+        views.changed()
+
+    # Journal writes wait until no dice are rolling
+    if roll_task is None and rolls.flush_due():
+        rolls.flush()
+    if roll_task is None and recorder is not None and recorder.flush_due():
+        recorder.flush()
+
+    # Nothing to do until the next touch sample or task step
+    pause = touch_input.sleep_time()
+    wake = scheduler.sleep_time()
+    if wake is not None and wake < pause:
+        pause = wake
+    if replay is not None:
+        if roll_task is None:
+            replay.skip_idle()
+        wake = replay.sleep_time()
+        if wake is not None and wake < pause:
+            pause = wake
+    power.sleep(pause)
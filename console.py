@@ -0,0 +1,53 @@
+# * ------------------------------------------------------------
+# The Diceinator - serial console
+#
+# Reads commands typed on the USB serial port without blocking the
+# loop, e.g. "fps" to print the dice animation frame counters.
+# Type "help" for the list.
+# * ------------------------------------------------------------
+
+import sys
+import supervisor
+
+
+class Console:
+    def __init__(self, max_line=80):
+        self.commands = {}
+        self.max_line = max_line
+        self._line = ""
+        self.add("help", self._help, "list commands")
+
+    def add(self, name, func, help_text=""):
+        """Run ``func(*args)`` when ``name args...`` is typed."""
+        self.commands[name] = (func, help_text)
+
+    def poll(self):
+        """Handle any complete lines waiting on the serial port.
+            :return: True if a command was run
+        """
+        ran = False
+        while supervisor.runtime.serial_bytes_available:
+            c = sys.stdin.read(1)
+            if c in "\r\n":
+                if self._line:
+                    self._run(self._line)
+                    ran = True
+                self._line = ""
+            elif len(self._line) < self.max_line:
+                self._line += c
+        return ran
+
+    def _run(self, line):
+        words = line.split()
+        command = self.commands.get(words[0])
+        if command is None:
+            print("Unknown command '%s', try help" % words[0])
+            return
+        try:
+            command[0](*words[1:])
+        except (TypeError, ValueError) as e:
+            print("%s: %s" % (words[0], e))
+
+    def _help(self):
+        for name in sorted(self.commands):
+            print("%-10s %s" % (name, self.commands[name][1]))
@@ -0,0 +1,90 @@
+# * ------------------------------------------------------------
+# The Diceinator - digit counter
+#
+# A caption Label drawn once, followed by a row of digit tiles cut
+# from the font when the counter is made.  Changing the number only
+# writes tile indexes: no strings, no glyph layout, no allocation.
+# * ------------------------------------------------------------
+
+import displayio
+from adafruit_display_text.label import Label
+
+BLANK = 0       # Tile 0 is empty, tiles 1 - 10 are the digits 0 - 9
+
+
+def digit_sheet(font, color):
+    """Render 0 - 9 from ``font`` into one Bitmap of equal width tiles.
+    Returns (bitmap, palette, tile width, tile height, baseline offset).
+    """
+    glyphs = [font.get_glyph(ord("0") + n) for n in range(10)]
+    width = max(g.shift_x for g in glyphs)
+    top = max(g.height + g.dy for g in glyphs)
+    bottom = min(g.dy for g in glyphs)
+    height = top - bottom
+    bitmap = displayio.Bitmap(width * 11, height, 2)
+    for n, g in enumerate(glyphs):
+        left = (n + 1) * width + g.dx
+        row = top - g.height - g.dy
+        for gy in range(g.height):
+            for gx in range(g.width):
+                if g.bitmap[gx, gy]:
+                    bitmap[left + gx, row + gy] = 1
+    palette = displayio.Palette(2)
+    palette[0] = 0x000000
+    palette.make_transparent(0)
+    palette[1] = color
+    return bitmap, palette, width, height, top
+
+
+class Counter(displayio.Group):
+    """'Caption: 123' where only the number changes.
+        :param font: Font for the caption and digits
+        :param caption: Fixed text in front of the number
+        :param color: Text colour
+        :param digits: Most digits shown
+    """
+
+    def __init__(self, font, caption, color, digits=3, x=0, y=0):
+        super().__init__(max_size=2, x=x, y=y)
+        self.caption = Label(font, text=caption, color=color, max_glyphs=len(caption))
+        self.append(self.caption)
+        sheet, palette, width, height, top = digit_sheet(font, color)
+        self.digits = displayio.TileGrid(sheet, pixel_shader=palette,
+                                         width=digits, height=1,
+                                         tile_width=width, tile_height=height,
+                                         default_tile=BLANK)
+        # Line the digits up after the caption, on the same baseline
+        # (Label puts its baseline half an 'M' below its y)
+        pen = 0
+        for c in caption:
+            pen += font.get_glyph(ord(c)).shift_x
+        self.digits.x = pen
+        self.digits.y = font.get_glyph(ord("M")).height // 2 - top
+        self.append(self.digits)
+        self.value = None
+
+    def show(self, value):
+        """Show ``value``, capped at what the digits can hold."""
+        if value == self.value:
+            return
+        self.value = value
+        tiles = self.digits
+        count = 1
+        rest = value
+        while rest >= 10 and count < tiles.width:
+            rest //= 10
+            count += 1
+        if rest >= 10:
+            value = 10 ** tiles.width - 1
+        for i in range(tiles.width - 1, -1, -1):
+            if i < count:
+                tiles[i, 0] = value % 10 + 1
+                value //= 10
+            else:
+                tiles[i, 0] = BLANK
+
+    def clear(self):
+        """Caption only, no number."""
+        self.value = None
+        for i in range(self.digits.width):
+            self.digits[i, 0] = BLANK
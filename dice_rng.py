@@ -0,0 +1,113 @@
+# * ------------------------------------------------------------
+# The Diceinator - dice RNG pool
+#
+# Faces come out of a buffer filled in bulk from a small 16-bit
+# xorshift generator (32 bits of state, period 2^32 - 1).  Each
+# random byte under 252 becomes a face, the rest are thrown away,
+# so all six faces stay equally likely.
+#
+# The generator only uses small ints, so it runs the same (and
+# allocates nothing) on the PyPortal and on a PC.  The stream of
+# faces depends only on the seed, not on how they are taken, so
+# seed + number of faces drawn is enough to replay any roll.
+# * ------------------------------------------------------------
+
+import os
+import time
+
+ACCEPT = 252    # Largest multiple of 6 that fits in a byte
+
+
+def new_seed():
+    """A fresh 32 bit seed, from the hardware RNG where there is one."""
+    try:
+        b = os.urandom(4)
+        return (b[0] << 24) | (b[1] << 16) | (b[2] << 8) | b[3]
+    except (AttributeError, NotImplementedError):
+        return time.monotonic_ns() & 0xFFFFFFFF
+
+
+class DicePool:
+    """A buffer of die faces (1 - 6), handed out by index.
+        :param seed: Seed to replay, or None for a new logged seed
+        :param size: Faces made per refill
+        :param log: Print the seed each time one is set
+    """
+
+    def __init__(self, seed=None, size=64, log=True):
+        self.faces = bytearray(size)
+        self.log = log
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        """Start the stream over from ``seed``; returns the seed used."""
+        if seed is None:
+            seed = new_seed()
+        self.seed = seed
+        self._x = (seed >> 16) & 0xFFFF
+        self._y = seed & 0xFFFF
+        if not (self._x or self._y):
+            self._y = 1             # All-zero state never leaves zero
+        self._spare = -1
+        self.draws = 0              # Faces handed out since the seed
+        self._fill(0)
+        self._next = 0
+        if self.log:
+            print('Dice seed %d' % seed)
+        return seed
+
+    def take(self, count):
+        """Take ``count`` faces; they are faces[i] to faces[i + count - 1]
+        for the returned i, until the next take.
+        """
+        i = self._next
+        if i + count > len(self.faces):
+            self._refill()
+            i = 0
+        self._next = i + count
+        self.draws += count
+        return i
+
+    def face(self):
+        """One face."""
+        return self.faces[self.take(1)]
+
+    def skip(self, count):
+        """Throw away ``count`` faces, e.g. to replay from a draw number."""
+        size = len(self.faces)
+        while count > size:
+            self.take(size)
+            count -= size
+        self.take(count)
+
+    def _refill(self):
+        # Keep the faces not yet taken, then top up behind them
+        faces = self.faces
+        left = len(faces) - self._next
+        for i in range(left):
+            faces[i] = faces[self._next + i]
+        self._fill(left)
+
+    def _fill(self, start):
+        faces = self.faces
+        size = len(faces)
+        x = self._x
+        y = self._y
+        spare = self._spare
+        i = start
+        while i < size:
+            if spare < 0:
+                t = x ^ ((x << 5) & 0xFFFF)
+                x = y
+                y = (y ^ (y >> 1)) ^ (t ^ (t >> 3))
+                b = y >> 8
+                spare = y & 0xFF
+            else:
+                b = spare
+                spare = -1
+            if b < ACCEPT:
+                faces[i] = b % 6 + 1
+                i += 1
+        self._x = x
+        self._y = y
+        self._spare = spare
@@ -0,0 +1,67 @@
+# * ------------------------------------------------------------
+# The Diceinator - frame clock
+#
+# Keeps an animation on a fixed frame grid: each frame is due at
+# start + n / fps.  A late frame gets a shorter wait before the next
+# one, and frames that are missed altogether are dropped (and counted)
+# so the animation always lasts as long as it should.
+# * ------------------------------------------------------------
+
+import time
+
+
+class FrameClock:
+    """Fixed-rate frame timing with counters.
+        :param fps: Target frames per second
+        :param budget: Seconds a frame may start after it was due before
+            it counts as late, defaults to half a frame
+    """
+
+    def __init__(self, fps, budget=None):
+        self.fps = fps
+        self.period = 1 / fps
+        self.budget = budget if budget is not None else self.period / 2
+        self.rendered = 0
+        self.dropped = 0
+        self.late = 0
+        self.frame_time = 0     # Total seconds between rendered frames
+        self._intervals = 0
+        self._start = 0
+        self._frame = -1
+        self._last = None
+
+    def start(self, now=None):
+        """Begin a run of frames; counters keep adding up across runs."""
+        self._start = time.monotonic() if now is None else now
+        self._frame = -1
+        self._last = None
+
+    def elapsed(self, now=None):
+        return (time.monotonic() if now is None else now) - self._start
+
+    def frame(self, now=None):
+        """Call when drawing a frame.  Returns seconds to wait for the next."""
+        if now is None:
+            now = time.monotonic()
+        due = int((now - self._start) / self.period)
+        if due > self._frame + 1:
+            # Whole frames went by, skip them to stay on time
+            self.dropped += due - self._frame - 1
+        self._frame = max(due, self._frame + 1)
+        if now - (self._start + self._frame * self.period) > self.budget:
+            self.late += 1
+        if self._last is not None:
+            self.frame_time += now - self._last
+            self._intervals += 1
+        self._last = now
+        self.rendered += 1
+        return max(0, self._start + (self._frame + 1) * self.period - now)
+
+    @property
+    def average_frame_time(self):
+        return self.frame_time / max(1, self._intervals)
+
+    def report(self):
+        return "frames %d  dropped %d  late %d  avg %.1f ms (target %.1f ms)" % (
+            self.rendered, self.dropped, self.late,
+            1000 * self.average_frame_time, 1000 * self.period)
@@ -0,0 +1,280 @@
+# * ------------------------------------------------------------
+# The Diceinator - host benchmarks
+#
+# Runs code.py in the simulator and times what a player feels: touch
+# to screen update for every button, view switches and a whole
+# animated roll.  These use the virtual clock and the display cost
+# model, so they repeat exactly and only move when the app changes.
+# Host CPU figures (rounds resolved per second, heap per round, odds
+# engine throughput) are measured on this machine and are noisier.
+#
+#   python host/bench.py                    # compare with the baseline
+#   python host/bench.py --json out.json    # also write the results
+#   python host/bench.py --save-baseline    # accept the current figures
+#
+# Exits with 1 if any figure is worse than the baseline by more than
+# its kind's threshold.
+# * ------------------------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+if HOST_DIR not in sys.path:
+    sys.path.insert(0, HOST_DIR)
+
+import sim  # noqa: E402
+import simcore  # noqa: E402
+
+BASELINE = os.path.join(HOST_DIR, "bench_baseline.json")
+
+# Allowed slowdown before a figure counts as a regression
+THRESHOLDS = {
+    "sim": 0.05,    # Virtual clock: repeatable, so small changes are real
+    "host": 0.30,   # Host CPU: varies from run to run and box to box
+}
+
+PRESS_AT = 3.0      # Script time of the measured press, after the first screen
+NAV_AT = 1.5        # Script time of the tab press that gets to its view
+
+
+class Results:
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, kind, better="lower", slack=0):
+        """Record a figure.
+            :param slack: Change too small to count, whatever the threshold
+        """
+        self.metrics[name] = {"value": value, "unit": unit, "kind": kind,
+                              "better": better, "slack": slack}
+
+
+# ------------- Simulator runs ------------- #
+def _boot(presses=(), tail=1.0):
+    # Same dice every run, so the shake draws the same tiles each time
+    urandom = os.urandom
+    os.urandom = lambda n: bytes(range(1, n + 1))
+    try:
+        return sim.run(simcore.TouchScript(list(presses), tail), keep_events=20000)
+    finally:
+        os.urandom = urandom
+
+
+def _center(spec):
+    return spec.x + spec.width // 2, spec.y + spec.height // 2
+
+
+def _first_refresh_after(session, t):
+    for when, kind, _detail in session.log.events:
+        if kind == "refresh" and when > t:
+            return when
+    return None
+
+
+def bench_touch(results, specs):
+    """Touch-to-screen latency for every button, one simulator run each."""
+    by_name = dict((spec.name, spec) for spec in specs)
+    views = dict((spec.arg, spec) for spec in specs if spec.action == "view" and spec.view == 0)
+    for spec in specs:
+        presses = []
+        if spec.name == "tab_att":
+            nav = by_name["tab_def"]    # Start elsewhere, so the tab does something
+        elif spec.view in views and spec.view != 1:
+            nav = views[spec.view]
+        else:
+            nav = None
+        if nav is not None:
+            x, y = _center(nav)
+            presses.append((NAV_AT, x, y, 0.1))
+        x, y = _center(spec)
+        presses.append((PRESS_AT, x, y, 0.1))
+        session = _boot(presses)
+        done = _first_refresh_after(session, PRESS_AT)
+        if done is None:
+            raise RuntimeError("no refresh after pressing %s" % spec.name)
+        results.add("touch_%s" % spec.name, round(done - PRESS_AT, 6), "s", "sim")
+
+
+def _drive(ns, until, limit=60.0):
+    # The main loop without the touch screen, until until() or limit seconds
+    clock = simcore.clock
+    start = clock.monotonic()
+    while not until():
+        if clock.monotonic() - start > limit:
+            raise RuntimeError("benchmark step did not finish")
+        if ns["scheduler"].run():
+            ns["views"].changed()
+        ns["views"].refresh()
+        wake = ns["scheduler"].sleep_time()
+        clock.sleep(0.02 if wake is None or wake > 0.02 else wake)
+    return clock.monotonic() - start
+
+
+def bench_views(results, ns):
+    """Virtual time to switch to each view and refresh the screen."""
+    clock = simcore.clock
+    for view, name in ((2, "def"), (3, "roll"), (4, "luck"), (1, "att")):
+        bus = simcore.bus
+        before = bus.refreshes
+        start = clock.monotonic()
+        ns["switch_view"](view)
+        ns["views"].refresh()
+        results.add("view_switch_%s" % name, round(clock.monotonic() - start, 6), "s", "sim")
+        results.add("view_refreshes_%s" % name, bus.refreshes - before, "refreshes", "sim")
+
+
+def bench_roll(results, ns):
+    """One animated 3 v 2 roll from start to the last blink."""
+    ns["switch_view"](3)
+    ns["views"].refresh()
+    ns["dice"].reseed(1)
+    bus = simcore.bus
+    refreshes = bus.refreshes
+    pixels = bus.pixels_pushed
+    ns["roll_dice"](3, 2)
+    elapsed = _drive(ns, lambda: ns["roll_task"].done)
+    results.add("roll_animated", round(elapsed, 6), "s", "sim")
+    results.add("roll_refreshes", bus.refreshes - refreshes, "refreshes", "sim")
+    results.add("roll_pixels", bus.pixels_pushed - pixels, "px", "sim")
+
+
+# ------------- Host CPU ------------------- #
+def bench_rounds(results, rounds=20000):
+    """Rounds resolved per second without animation, and their heap use."""
+    from dice_rng import DicePool
+    from resolver import RoundResolver
+    resolver = RoundResolver(DicePool(seed=1, log=False))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        resolver.roll_and_resolve(3, 2)
+    elapsed = time.perf_counter() - start
+    results.add("rounds_per_s", round(rounds / elapsed), "rounds/s", "host", "higher")
+
+    # Heap: a warmed-up round should leave nothing behind
+    tracemalloc.start()
+    base = tracemalloc.take_snapshot()
+    for _ in range(1000):
+        resolver.roll_and_resolve(3, 2)
+    used = tracemalloc.take_snapshot().compare_to(base, "filename")
+    tracemalloc.stop()
+    net = sum(stat.size_diff for stat in used
+              if stat.traceback[0].filename.startswith(simcore.REPO_ROOT)
+              and not stat.traceback[0].filename.startswith(HOST_DIR))
+    results.add("round_heap_bytes", round(max(0, net) / 1000.0, 3), "bytes/round", "host",
+                slack=1)
+
+
+def bench_odds(results):
+    """Throughput of the odds engine: sampled blitzes and exact battles."""
+    import blitz
+    import risk_odds
+    from dice_rng import DicePool
+    from resolver import RoundResolver
+    resolver = RoundResolver(DicePool(seed=2, log=False))
+    trials = 2000
+    rounds = 0
+    start = time.perf_counter()
+    for _ in range(trials):
+        rounds += blitz.blitz(10, 10, resolver=resolver)[2]
+    elapsed = time.perf_counter() - start
+    results.add("blitz_trials_per_s", round(trials / elapsed), "battles/s", "host", "higher")
+    results.add("blitz_rounds_per_s", round(rounds / elapsed), "rounds/s", "host", "higher")
+
+    start = time.perf_counter()
+    count = 0
+    for att in range(1, 21):
+        for defend in range(1, 21):
+            risk_odds.clear_cache()
+            risk_odds.battle(att, defend)
+            count += 1
+    elapsed = time.perf_counter() - start
+    results.add("exact_battles_per_s", round(count / elapsed), "battles/s", "host", "higher")
+
+
+# ------------- Baseline ------------------- #
+def compare(metrics, baseline, thresholds=THRESHOLDS):
+    """Figures worse than the baseline by more than their threshold."""
+    worse = []
+    for name, now in sorted(metrics.items()):
+        old = baseline.get(name)
+        if old is None or abs(now["value"] - old["value"]) <= now["slack"]:
+            continue
+        if not old["value"]:
+            worse.append((name, old["value"], now["value"], 1.0))
+            continue
+        change = (now["value"] - old["value"]) / float(old["value"])
+        if now["better"] == "higher":
+            change = -change
+        if change > thresholds[now["kind"]]:
+            worse.append((name, old["value"], now["value"], change))
+    return worse
+
+
+def run_all():
+    results = Results()
+    session = _boot()
+    ns = session.namespace
+    # Finish the background boot so every view exists
+    _drive(ns, lambda: ns["views_built"])
+    bench_views(results, ns)
+    bench_roll(results, ns)
+    bench_touch(results, ns["UI_BUTTONS"])
+    if simcore.REPO_ROOT not in sys.path:
+        sys.path.insert(0, simcore.REPO_ROOT)
+    bench_rounds(results)
+    bench_odds(results)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark code.py on the simulator")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare with")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    quiet = open(os.devnull, "w")
+    saved = sys.stdout
+    sys.stdout = quiet      # The app's own prints
+    try:
+        results = run_all()
+    finally:
+        sys.stdout = saved
+        quiet.close()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+    worse = compare(results.metrics, baseline)
+    for name in sorted(results.metrics):
+        m = results.metrics[name]
+        old = baseline.get(name)
+        print("%-24s %12s %-12s %s" % (name, m["value"], m["unit"],
+                                       "" if old is None else "(baseline %s)" % old["value"]))
+    for name, old, new, change in worse:
+        print("REGRESSION %s: %s -> %s (%+.1f%%, limit %.0f%%)" % (
+            name, old, new, 100 * change, 100 * THRESHOLDS[results.metrics[name]["kind"]]))
+
+    report = {"metrics": results.metrics, "thresholds": THRESHOLDS,
+              "regressions": [w[0] for w in worse]}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"metrics": results.metrics}, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print("Baseline saved to %s" % args.baseline)
+        return 0
+    return 1 if worse else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
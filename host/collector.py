@@ -0,0 +1,139 @@
+# * ------------------------------------------------------------
+# The Diceinator - telemetry collector
+#
+# Reference server for telemetry.py: accepts batches of rounds from
+# any number of Diceinators, acks each one, and appends the records
+# to one file per device in the journal format, so
+# journal.read_journal() reads them back.
+#
+#   python host/collector.py                    # port 5741, ./collected
+#   python host/collector.py --port 6000 --out /tmp/rounds --verbose
+#
+# Point a device at it with telemetry_host (and telemetry_port) in
+# its secrets.py; the simulator takes the same through --secrets.
+# * ------------------------------------------------------------
+
+import argparse
+import os
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HOST_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import journal  # noqa: E402
+from telemetry import (ACK, ACK_MAGIC, HEADER, HEADER_SIZE, MAGIC, PORT,  # noqa: E402
+                       VERSION)
+
+
+class DeviceStats:
+    def __init__(self):
+        self.batches = 0
+        self.records = 0
+        self.repeats = 0        # Batches sent again after a lost ack
+        self.last_seq = None
+        self.last_records = None
+
+
+class Collector:
+    """Stores batches by device; safe to call from several connections."""
+
+    def __init__(self, out_dir, verbose=False):
+        self.out_dir = out_dir
+        self.verbose = verbose
+        self.devices = {}
+        self.lock = threading.Lock()
+        os.makedirs(out_dir, exist_ok=True)
+
+    def path(self, device):
+        return os.path.join(self.out_dir, "%08x.bin" % device)
+
+    def store(self, device, seq, records):
+        """Keep a batch; returns False if it is a repeat of the last one.
+        A device resends a batch whose ack was lost exactly as it was, so
+        the same number with other records is a new batch (after a reboot).
+        """
+        with self.lock:
+            stats = self.devices.setdefault(device, DeviceStats())
+            if seq == stats.last_seq and records == stats.last_records:
+                stats.repeats += 1
+                return False
+            with open(self.path(device), "ab") as f:
+                f.write(records)
+            stats.last_seq = seq
+            stats.last_records = records
+            stats.batches += 1
+            stats.records += len(records) // journal.RECORD_SIZE
+        if self.verbose:
+            for offset in range(0, len(records), journal.RECORD_SIZE):
+                print("  %08x %r" % (device, journal.unpack(records, offset)))
+        return True
+
+
+def read_exactly(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        collector = self.server.collector
+        peer = "%s:%d" % self.client_address
+        print("%s connected" % peer)
+        while True:
+            header = read_exactly(self.request, HEADER_SIZE)
+            if header is None:
+                break
+            magic, version, _flags, count, device, seq = struct.unpack(HEADER, header)
+            if magic != MAGIC or version != VERSION:
+                print("%s: not a telemetry batch, dropping the connection" % peer)
+                break
+            records = read_exactly(self.request, count * journal.RECORD_SIZE)
+            if records is None:
+                break
+            fresh = collector.store(device, seq, records)
+            self.request.sendall(struct.pack(ACK, ACK_MAGIC, seq))
+            print("%s device %08x batch %d: %d rounds%s" % (
+                time.strftime("%H:%M:%S"), device, seq, count, "" if fresh else " (repeat)"))
+        print("%s closed" % peer)
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect Diceinator roll telemetry")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--out", default="collected", help="directory for the device files")
+    parser.add_argument("--verbose", action="store_true", help="print every round")
+    args = parser.parse_args(argv)
+
+    server = Server((args.host, args.port), Handler)
+    server.collector = Collector(args.out, args.verbose)
+    print("Collecting on %s:%d into %s" % (args.host, args.port, args.out))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for device, stats in sorted(server.collector.devices.items()):
+            print("device %08x: %d batches, %d rounds, %d repeats" % (
+                device, stats.batches, stats.records, stats.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# * ------------------------------------------------------------
+# The Diceinator - advisor table builder
+#
+# Works out the best dice counts for every army count up to the
+# table size and writes the packed table advisor.py reads, see the
+# format notes there.  Run it after changing the odds or the format:
+#
+#   python host/make_advisor.py              # writes data/advisor.bin
+#   python host/make_advisor.py --size 40 --check
+# * ------------------------------------------------------------
+
+import argparse
+import os
+import struct
+import sys
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HOST_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import advisor  # noqa: E402
+from risk_odds import TABLE_SIZE, round_odds  # noqa: E402
+
+OUTPUT = os.path.join(REPO_ROOT, advisor.ADVISOR_PATH.lstrip("/"))
+TIE = 1e-12     # Closer than this counts as a tie, and more dice win it
+
+
+def win_table(size):
+    """win[a][d]: chance a armies take d, both rolling all they can."""
+    win = [[0.0] * (size + 1) for _ in range(size + 1)]
+    for a in range(1, size + 1):
+        win[a][0] = 1.0
+        for d in range(1, size + 1):
+            p = 0.0
+            for al, dl, q in round_odds(min(a, 3), min(d, 2)):
+                p += q * win[a - al][d - dl]
+            win[a][d] = p
+    return win
+
+
+def _after(win, a, d, att_dice, def_dice):
+    # Win chance after one round rolled with these dice
+    p = 0.0
+    for al, dl, q in round_odds(att_dice, def_dice):
+        p += q * win[a - al][d - dl]
+    return p
+
+
+def _net(att_dice, def_dice):
+    # Expected defender losses minus attacker losses for one round
+    net = 0.0
+    for al, dl, q in round_odds(att_dice, def_dice):
+        net += q * (dl - al)
+    return net
+
+
+def _best(choices, score):
+    # Highest score, ties to the last (most dice) choice
+    best = choices[0]
+    for c in choices[1:]:
+        if score(c) >= score(best) - TIE:
+            best = c
+    return best
+
+
+def advise(win, a, d):
+    """(att by win, att by loss, def by win, def by loss, win per att dice)"""
+    att_max = min(a, 3)
+    def_max = min(d, 2)
+    att_choices = list(range(1, att_max + 1))
+    def_choices = list(range(1, def_max + 1))
+    def_win = _best(def_choices, lambda y: -_after(win, a, d, att_max, y))
+    def_loss = _best(def_choices, lambda y: -_net(att_max, y))
+    att_win = _best(att_choices, lambda x: _after(win, a, d, x, def_win))
+    att_loss = _best(att_choices, lambda x: _net(x, def_max))
+    chances = [_after(win, a, d, x, def_win) if x <= att_max else 0.0 for x in (1, 2, 3)]
+    return att_win, att_loss, def_win, def_loss, chances
+
+
+def build(size):
+    win = win_table(size)
+    out = bytearray(struct.pack(advisor.HEADER, advisor.MAGIC, advisor.VERSION,
+                                size, advisor.RECORD_SIZE))
+    for a in range(1, size + 1):
+        for d in range(1, size + 1):
+            att_win, att_loss, def_win, def_loss, chances = advise(win, a, d)
+            out += struct.pack(advisor.RECORD, att_win | att_loss << 4,
+                               def_win | def_loss << 4,
+                               *[int(p * 65535 + 0.5) for p in chances])
+    return bytes(out)
+
+
+def check(path, size):
+    """Read the table back through advisor.Advisor and compare."""
+    win = win_table(size)
+    table = advisor.Advisor(path)
+    bad = 0
+    for a in range(1, size + 1):
+        for d in range(1, size + 1):
+            want = advise(win, a, d)
+            got = table.advise(a, d)
+            if got[:4] != want[:4] or any(abs(g - w) > 1 / 65535 for g, w in zip(got.win, want[4])):
+                bad += 1
+    return bad
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the dice advisor table")
+    parser.add_argument("--size", type=int, default=TABLE_SIZE,
+                        help="largest army count per side (default %d)" % TABLE_SIZE)
+    parser.add_argument("--output", default=OUTPUT)
+    parser.add_argument("--check", action="store_true",
+                        help="read the file back and compare every record")
+    args = parser.parse_args(argv)
+
+    data = build(args.size)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print("%s: %d x %d, %d bytes" % (args.output, args.size, args.size, len(data)))
+
+    # Where the advice is anything other than "roll every die you can"
+    win = win_table(args.size)
+    for a in range(1, args.size + 1):
+        for d in range(1, args.size + 1):
+            att_win, att_loss, def_win, def_loss, chances = advise(win, a, d)
+            if (att_win, att_loss) != (min(a, 3),) * 2 or (def_win, def_loss) != (min(d, 2),) * 2:
+                print("  %2d v %-2d  att %d (loss %d)  def %d (loss %d)" % (
+                    a, d, att_win, att_loss, def_win, def_loss))
+    if args.check:
+        print("mismatched records: %d" % check(args.output, args.size))
+
+
+if __name__ == "__main__":
+    main()
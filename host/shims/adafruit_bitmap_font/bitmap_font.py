@@ -0,0 +1,89 @@
+# Host stand-in for ``adafruit_bitmap_font.bitmap_font`` (BDF only).
+
+from collections import namedtuple
+
+import displayio
+import simcore
+
+Glyph = namedtuple("Glyph", ["bitmap", "tile_index", "width", "height",
+                             "dx", "dy", "shift_x", "shift_y"])
+
+
+class BDF:
+    def __init__(self, path):
+        self.path = path
+        self._glyphs = {}
+        self._boundingbox = None
+        self._offsets = None
+        with open(simcore.device_path(path), "rb") as f:
+            for line in f:
+                if line.startswith(b"FONTBOUNDINGBOX"):
+                    w, h, dx, dy = (int(v) for v in line.split()[1:5])
+                    self._boundingbox = (w, h, dx, dy)
+                    break
+
+    def get_bounding_box(self):
+        return self._boundingbox
+
+    def _index(self):
+        # Map code point -> byte offset of its STARTCHAR line
+        if self._offsets is None:
+            self._offsets = {}
+            with open(simcore.device_path(self.path), "rb") as f:
+                pos = 0
+                start = None
+                for line in f:
+                    if line.startswith(b"STARTCHAR"):
+                        start = pos
+                    elif line.startswith(b"ENCODING") and start is not None:
+                        self._offsets[int(line.split()[1])] = start
+                    pos += len(line)
+        return self._offsets
+
+    def load_glyphs(self, code_points):
+        if isinstance(code_points, int):
+            code_points = (code_points,)
+        elif isinstance(code_points, (str, bytes)):
+            code_points = set(ord(c) if isinstance(c, str) else c for c in code_points)
+        offsets = self._index()
+        with open(simcore.device_path(self.path), "rb") as f:
+            for code in code_points:
+                if code in self._glyphs or code not in offsets:
+                    continue
+                f.seek(offsets[code])
+                self._glyphs[code] = self._parse(f)
+                simcore.clock.charge(simcore.GLYPH_LOAD_COST)
+                simcore.log.add("glyph", code)
+
+    @staticmethod
+    def _parse(f):
+        shift_x = shift_y = width = height = dx = dy = 0
+        rows = []
+        in_bitmap = False
+        for line in f:
+            if line.startswith(b"ENDCHAR"):
+                break
+            if in_bitmap:
+                rows.append(int(line.strip(), 16))
+            elif line.startswith(b"DWIDTH"):
+                shift_x, shift_y = (int(v) for v in line.split()[1:3])
+            elif line.startswith(b"BBX"):
+                width, height, dx, dy = (int(v) for v in line.split()[1:5])
+            elif line.startswith(b"BITMAP"):
+                in_bitmap = True
+        bitmap = displayio.Bitmap(max(1, width), max(1, height), 2)
+        row_bits = ((width + 7) // 8) * 8
+        for y, bits in enumerate(rows[:height]):
+            for x in range(width):
+                if bits & (1 << (row_bits - 1 - x)):
+                    bitmap[x, y] = 1
+        return Glyph(bitmap, 0, width, height, dx, dy, shift_x, shift_y)
+
+    def get_glyph(self, code_point):
+        if code_point not in self._glyphs:
+            self.load_glyphs(code_point)
+        return self._glyphs.get(code_point)
+
+
+def load_font(filename):
+    return BDF(filename)
@@ -0,0 +1,75 @@
+# Host stand-in for ``adafruit_button`` (2020 API, ``.group`` attribute).
+
+import displayio
+import simcore
+from adafruit_display_text.label import Label
+
+
+class _Body(displayio._Node):
+    def __init__(self, width, height):
+        super().__init__()
+        self._w = width
+        self._h = height
+
+    def _size(self):
+        return self._w, self._h
+
+
+class Button:
+    RECT = 0
+    ROUNDRECT = 1
+    SHADOWRECT = 2
+    SHADOWROUNDRECT = 3
+
+    def __init__(self, *, x, y, width, height, name=None, style=RECT,
+                 fill_color=0xFFFFFF, outline_color=0x0,
+                 label=None, label_font=None, label_color=0x0,
+                 selected_fill=None, selected_outline=None,
+                 selected_label=None):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.name = name
+        self.style = style
+        self.fill_color = fill_color
+        self.outline_color = outline_color
+        self.label_color = label_color
+        self.selected_fill = selected_fill
+        self.selected_outline = selected_outline
+        self.selected_label = selected_label
+        self._selected = False
+        self.group = displayio.Group(max_size=2, x=x, y=y)
+        self.body = _Body(width, height)
+        self.group.append(self.body)
+        self._label = None
+        if label is not None:
+            self._label = Label(label_font, text=label, color=label_color)
+            self._label.x = (width - self._label.bounding_box[2]) // 2
+            self._label.y = height // 2
+            self.group.append(self._label)
+
+    def _get_selected(self):
+        return self._selected
+
+    def _set_selected(self, value):
+        if value == self._selected:
+            return
+        self._selected = value
+        # Real Button swaps fill, outline and label colour in place
+        self.group._invalidate()
+        simcore.log.add("button_selected", self.name)
+
+    selected = property(_get_selected, _set_selected)
+
+    @property
+    def label(self):
+        return self._label.text if self._label else None
+
+    @label.setter
+    def label(self, text):
+        self._label.text = text
+
+    def contains(self, point):
+        return (self.x <= point[0] <= self.x + self.width) and (
+            self.y <= point[1] <= self.y + self.height)
@@ -0,0 +1,57 @@
+# Host stand-in for ``adafruit_display_text.label`` (2020 API, max_glyphs).
+
+import displayio
+import simcore
+
+
+class Label(displayio.Group):
+    def __init__(self, font, *, text=None, max_glyphs=None, color=0xFFFFFF,
+                 background_color=None, line_spacing=1.25, **kwargs):
+        if not max_glyphs and not text:
+            raise RuntimeError("Please provide a max size, or initial text")
+        if not max_glyphs:
+            max_glyphs = len(text)
+        super().__init__(max_size=max_glyphs, **kwargs)
+        self.font = font
+        self.color = color
+        self.background_color = background_color
+        self._max_glyphs = max_glyphs
+        self._text = ""
+        self._width = 0
+        if text is not None:
+            self._update_text(str(text))
+
+    def _update_text(self, new_text):
+        if len(new_text) > self._max_glyphs:
+            raise RuntimeError("Text length exceeds max_glyphs")
+        self._invalidate()
+        width = 0
+        for c in new_text:
+            glyph = self.font.get_glyph(ord(c))
+            if glyph:
+                width += glyph.shift_x
+        self._text = new_text
+        self._width = width
+        self._invalidate()
+        simcore.log.add("label", new_text)
+
+    def _get_text(self):
+        return self._text
+
+    def _set_text(self, new_text):
+        self._update_text(str(new_text))
+
+    text = property(_get_text, _set_text)
+
+    @property
+    def bounding_box(self):
+        _w, h, _dx, dy = self.font.get_bounding_box()
+        return (0, -(h + dy), self._width, h)
+
+    def _areas(self):
+        ox, oy = self._origin()
+        _x, y, w, h = self.bounding_box
+        return [(ox + self._x, oy + self._y + y, w, h)]
+
+    def _bounds(self):
+        return self._areas()[0]
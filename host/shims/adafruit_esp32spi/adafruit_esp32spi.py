@@ -0,0 +1,81 @@
+# Host stand-in for the ESP32 WiFi co-processor.  Joining takes a
+# little virtual time; sockets are real host sockets, see
+# adafruit_esp32spi_socket, so the app can talk to host/collector.py.
+# socket_open() starts a connection without waiting, as the ESP32 does.
+
+import errno
+import select
+import socket as _socket
+
+import simcore
+
+WL_IDLE_STATUS = 0
+WL_CONNECTED = 3
+TCP_MODE = 0
+UDP_MODE = 1
+
+JOIN_TIME = 1.5         # Seconds from passphrase to connected
+
+
+class ESP_SPIcontrol:
+    TCP_MODE = TCP_MODE
+    UDP_MODE = UDP_MODE
+
+    def __init__(self, spi=None, cs_pin=None, ready_pin=None, reset_pin=None,
+                 gpio0_pin=None, *, debug=False):
+        self.MAC_address = bytearray(b"\x24\x6f\x28\x5a\x11\x02")
+        self._joined_at = None
+        self._clock = simcore.clock
+        self._sockets = {}      # socknum: host socket
+        self._next_socknum = 0
+
+    @property
+    def status(self):
+        if self._joined_at is None or self._clock is not simcore.clock:
+            return WL_IDLE_STATUS
+        if self._clock._elapsed() >= self._joined_at:
+            return WL_CONNECTED
+        return WL_IDLE_STATUS
+
+    @property
+    def is_connected(self):
+        return self.status == WL_CONNECTED
+
+    def wifi_set_passphrase(self, ssid, passphrase):
+        self._clock = simcore.clock
+        self._joined_at = self._clock._elapsed() + JOIN_TIME
+        simcore.log.add("wifi_join", ssid)
+
+    def get_socket(self):
+        self._next_socknum += 1
+        return self._next_socknum
+
+    def socket_open(self, socket_num, dest, port, conn_mode=TCP_MODE):
+        self.socket_close(socket_num)
+        sock = _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM)
+        sock.setblocking(False)
+        if sock.connect_ex((dest, port)) not in (0, errno.EINPROGRESS):
+            sock.close()
+            sock = None     # Refused at once: it never connects
+        self._sockets[socket_num] = sock
+        simcore.log.add("socket_open", "%s:%d" % (dest, port))
+
+    def socket_connected(self, socket_num):
+        sock = self._sockets.get(socket_num)
+        if sock is None:
+            return False
+        # Wait a moment for real network time; the app's clock is virtual
+        if not select.select([], [sock], [], 0.05)[1]:
+            return False
+        if sock.getsockopt(_socket.SOL_SOCKET, _socket.SO_ERROR):
+            # Refused: stays closed, as the ESP32 reports it
+            sock.close()
+            self._sockets[socket_num] = None
+            return False
+        sock.setblocking(True)
+        return True
+
+    def socket_close(self, socket_num):
+        sock = self._sockets.pop(socket_num, None)
+        if sock is not None:
+            sock.close()
@@ -0,0 +1,63 @@
+# Host stand-in for the ESP32 socket module, on real host sockets.
+
+import select
+import socket as _socket
+import time
+
+import simcore
+
+AF_INET = 2
+SOCK_STREAM = 1
+
+_the_interface = None
+
+
+def set_interface(iface):
+    global _the_interface
+    _the_interface = iface
+
+
+class socket:
+    def __init__(self, family=AF_INET, type=SOCK_STREAM, proto=0, fileno=None):
+        self._socknum = _the_interface.get_socket()
+        self._timeout = 0
+
+    @property
+    def _sock(self):
+        return _the_interface._sockets.get(self._socknum)
+
+    def settimeout(self, value):
+        self._timeout = value
+
+    def connect(self, address, conntype=None):
+        # Blocks, as on the device: open, then poll for up to 3 s
+        host, port = address
+        _the_interface.socket_open(self._socknum, host, port, conntype or 0)
+        give_up = time.monotonic() + 3
+        while not _the_interface.socket_connected(self._socknum):
+            if time.monotonic() > give_up:
+                raise RuntimeError("Failed to connect to host", host)
+        simcore.log.add("socket_connect", "%s:%d" % address)
+
+    def send(self, data):
+        self._sock.sendall(bytes(data))
+        simcore.log.add("socket_send", len(data))
+
+    def available(self):
+        # Wait a moment for real network time; the app's clock is virtual
+        readable = select.select([self._sock], [], [], 0.05)[0]
+        if not readable:
+            return 0
+        data = self._sock.recv(64, _socket.MSG_PEEK)
+        if not data:
+            raise RuntimeError("connection closed")
+        return len(data)
+
+    def recv(self, bufsize=0):
+        return self._sock.recv(bufsize)
+
+    def connected(self):
+        return _the_interface.socket_connected(self._socknum)
+
+    def close(self):
+        _the_interface.socket_close(self._socknum)
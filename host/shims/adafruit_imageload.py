@@ -0,0 +1,34 @@
+# Host stand-in for ``adafruit_imageload`` (indexed BMP only).
+
+import struct
+
+import simcore
+
+
+def load(file_or_filename, *, bitmap=None, palette=None):
+    if isinstance(file_or_filename, str):
+        with open(simcore.device_path(file_or_filename), "rb") as f:
+            data = f.read()
+    else:
+        data = file_or_filename.read()
+    if data[:2] != b"BM":
+        raise NotImplementedError("Unsupported image format")
+    offset = struct.unpack("<I", data[10:14])[0]
+    width, height = struct.unpack("<ii", data[18:26])
+    bpp = struct.unpack("<H", data[28:30])[0]
+    colors = struct.unpack("<I", data[46:50])[0] or (1 << bpp)
+    simcore.clock.charge(len(data) / simcore.FLASH_BYTES_PER_SEC)
+    simcore.log.add("imageload", file_or_filename)
+    bmp = bitmap(width, abs(height), colors) if bitmap else None
+    pal = None
+    if palette:
+        pal = palette(colors)
+        for i in range(colors):
+            b, g, r = data[54 + i * 4: 57 + i * 4]
+            pal[i] = (r << 16) | (g << 8) | b
+    if bmp is not None and bpp == 8:
+        row = (width + 3) & ~3
+        for y in range(abs(height)):
+            src = offset + (abs(height) - 1 - y) * row if height > 0 else offset + y * row
+            bmp._data[y * width:(y + 1) * width] = data[src:src + width]
+    return bmp, pal
@@ -0,0 +1,79 @@
+# Host stand-in for ``adafruit_pyportal.PyPortal`` (display, sound, backlight, ESP32).
+
+import struct
+
+import audioio
+import board
+import displayio
+import simcore
+from adafruit_esp32spi import adafruit_esp32spi
+
+
+def wav_duration(path):
+    """Length in seconds of a PCM wav, read from its header."""
+    with open(simcore.device_path(path), "rb") as f:
+        header = f.read(44)
+    channels, rate = struct.unpack("<HI", header[22:28])
+    bits = struct.unpack("<H", header[34:36])[0]
+    size = struct.unpack("<I", header[40:44])[0]
+    return size / (rate * channels * bits // 8)
+
+
+class _Pin:
+    # digitalio.DigitalInOut for SPEAKER_ENABLE
+    def __init__(self):
+        self.value = False
+
+
+class PyPortal:
+    def __init__(self, *, url=None, headers=None, json_path=None,
+                 regexp_path=None, default_bg=0x000000, status_neopixel=None,
+                 text_font=None, text_position=None, text_color=0x808080,
+                 text_wrap=False, text_maxlen=0, text_transform=None,
+                 json_transform=None, image_json_path=None,
+                 image_resize=None, image_position=None, caption_text=None,
+                 caption_font=None, caption_position=None,
+                 caption_color=0x808080, image_url_path=None,
+                 success_callback=None, esp=None, external_spi=None,
+                 debug=False):
+        self.display = board.DISPLAY
+        self.splash = displayio.Group(max_size=15)
+        self._bg_group = displayio.Group(max_size=1)
+        self.splash.append(self._bg_group)
+        self.sound_until = 0.0
+        self.audio = audioio.AudioOut(board.AUDIO_OUT)
+        self._speaker_enable = _Pin()
+        self._esp = esp if esp is not None else adafruit_esp32spi.ESP_SPIcontrol()
+        self.display.show(self.splash)
+
+    def set_background(self, file_or_color, position=None):
+        while self._bg_group:
+            self._bg_group.pop()
+        if not file_or_color:
+            return
+        if isinstance(file_or_color, str):
+            with open(simcore.device_path(file_or_color), "rb") as f:
+                image = displayio.OnDiskBitmap(f)
+            sprite = displayio.TileGrid(image, pixel_shader=displayio.ColorConverter())
+        else:
+            image = displayio.Bitmap(self.display.width, self.display.height, 1)
+            palette = displayio.Palette(1)
+            palette[0] = file_or_color
+            sprite = displayio.TileGrid(image, pixel_shader=palette)
+        self._bg_group.append(sprite)
+        self.display.refresh()
+
+    def set_backlight(self, val):
+        val = max(0, min(1.0, val))
+        board.DISPLAY.auto_brightness = False
+        board.DISPLAY.brightness = val
+
+    def play_file(self, file_name, wait_to_finish=True):
+        duration = wav_duration(file_name)
+        # Opening the file and priming the DAC from flash
+        simcore.clock.charge(4096 / simcore.FLASH_BYTES_PER_SEC)
+        simcore.log.add("play_file", file_name)
+        if wait_to_finish:
+            simcore.clock.sleep(duration)
+        else:
+            self.sound_until = simcore.clock._elapsed() + duration
@@ -0,0 +1,17 @@
+# Host stand-in for ``adafruit_touchscreen``, fed by simcore.touch.
+
+import simcore
+
+
+class Touchscreen:
+    def __init__(self, x1_pin, x2_pin, y1_pin, y2_pin, *, x_resistance=None,
+                 samples=4, z_threshold=10000, calibration=None, size=None):
+        self._samples = samples
+        self._size = size
+
+    @property
+    def touch_point(self):
+        # Each read does several ADC conversions on the real board
+        simcore.clock.charge(simcore.TOUCH_READ_COST * self._samples / 4)
+        simcore.log.add("touch_read")
+        return simcore.touch.point(simcore.clock._elapsed())
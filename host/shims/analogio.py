@@ -0,0 +1,17 @@
+# Host stand-in for ``analogio``; the light sensor reads simcore.ambient.
+
+import simcore
+
+
+class AnalogIn:
+    def __init__(self, pin):
+        self.pin = pin
+        self.reference_voltage = 3.3
+
+    @property
+    def value(self):
+        simcore.log.add("analog_read", self.pin.name)
+        return simcore.ambient
+
+    def deinit(self):
+        pass
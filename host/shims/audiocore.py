@@ -0,0 +1,15 @@
+# Host stand-in for ``audiocore``: only RawSample, which just keeps its buffer.
+
+
+class RawSample:
+    def __init__(self, buffer, *, channel_count=1, sample_rate=8000):
+        self.buffer = buffer
+        self.channel_count = channel_count
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self):
+        return len(self.buffer) / (self.channel_count * self.sample_rate)
+
+    def deinit(self):
+        self.buffer = None
@@ -0,0 +1,35 @@
+# Host stand-in for ``audioio``; playback takes the sample's length of
+# virtual time and costs nothing up front, like the DMA-driven DAC.
+
+import simcore
+
+
+_in_use = {}    # Pin name -> the session's clock, like CircuitPython's claimed pins
+
+
+class AudioOut:
+    def __init__(self, left_channel, *, right_channel=None, quiescent_value=0x8000):
+        if _in_use.get(left_channel.name) is simcore.clock:
+            raise ValueError("%s in use" % left_channel)
+        _in_use[left_channel.name] = simcore.clock
+        self._pin = left_channel.name
+        self._until = 0.0
+        self._clock = simcore.clock
+
+    @property
+    def playing(self):
+        return self._clock is simcore.clock and self._clock._elapsed() < self._until
+
+    def play(self, sample, *, loop=False):
+        self._clock = simcore.clock
+        self._until = simcore.clock._elapsed() + sample.duration
+        simcore.log.add("audio_play", "%d samples" % len(sample.buffer))
+
+    def stop(self):
+        self._until = 0.0
+        simcore.log.add("audio_stop")
+
+    def deinit(self):
+        self.stop()
+        if _in_use.get(self._pin) is self._clock:
+            del _in_use[self._pin]
@@ -0,0 +1,73 @@
+# Host stand-in for the CircuitPython ``board`` module on a PyPortal.
+
+import simcore
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+
+for _name in ("TOUCH_XL", "TOUCH_XR", "TOUCH_YD", "TOUCH_YU", "NEOPIXEL",
+              "AUDIO_OUT", "SPEAKER_ENABLE", "LIGHT", "SD_CS", "SCK", "MOSI",
+              "MISO", "ESP_CS", "ESP_BUSY", "ESP_RESET", "TFT_BACKLIGHT"):
+    globals()[_name] = Pin(_name)
+
+
+class Display:
+    """Enough of ``displayio.Display`` for the app, backed by simcore.bus."""
+
+    def __init__(self):
+        self.width = simcore.SCREEN_WIDTH
+        self.height = simcore.SCREEN_HEIGHT
+        self.rotation = 0
+        self.brightness = 1.0
+        self.auto_brightness = True
+        self.auto_refresh = True
+        self.root_group = None
+        self._last_call = 0.0
+        self._last_refresh = 0.0
+
+    def show(self, group):
+        if self.root_group is not None:
+            self.root_group._parent = None
+        self.root_group = group
+        if group is not None:
+            group._parent = self
+        simcore.bus.invalidate_all()
+        simcore.log.add("show", group)
+
+    def refresh(self, target_frames_per_second=60, minimum_frames_per_second=1):
+        # As CircuitPython 5: a call made more than one frame after the
+        # previous call skips the frame and returns False; otherwise it
+        # waits for the next frame boundary after the last real refresh.
+        clock = simcore.clock
+        now = clock._elapsed()
+        frame = 1 / target_frames_per_second
+        since_real = now - self._last_refresh
+        if minimum_frames_per_second and since_real > 1 / minimum_frames_per_second:
+            raise RuntimeError("Below minimum frame rate")
+        since_call = now - self._last_call
+        self._last_call = now
+        if since_call > frame:
+            simcore.log.add("refresh_skipped")
+            return False
+        clock.charge(frame - since_real % frame)
+        simcore.bus.refresh()
+        self._last_refresh = clock._elapsed()
+        return True
+
+
+DISPLAY = None
+
+
+def _reset():
+    global DISPLAY
+    DISPLAY = Display()
+    simcore.display = DISPLAY
+
+
+_reset()
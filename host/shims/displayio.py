@@ -0,0 +1,284 @@
+# Host stand-in for CircuitPython 5 ``displayio``.
+#
+# Keeps the display tree in plain Python objects and reports every visible
+# change to simcore.bus as a dirty rectangle, the way displayio does.
+
+import struct
+
+import simcore
+
+
+class _Node:
+    """Common position/visibility handling for groups and tile grids."""
+
+    def __init__(self, x=0, y=0):
+        self._x = x
+        self._y = y
+        self._hidden = False
+        self._parent = None
+
+    def _get_x(self):
+        return self._x
+
+    def _set_x(self, value):
+        self._moved(value, self._y)
+
+    x = property(_get_x, _set_x)
+
+    def _get_y(self):
+        return self._y
+
+    def _set_y(self, value):
+        self._moved(self._x, value)
+
+    y = property(_get_y, _set_y)
+
+    def _get_hidden(self):
+        return self._hidden
+
+    def _set_hidden(self, value):
+        value = bool(value)
+        if value != self._hidden:
+            self._invalidate(force=True)
+            self._hidden = value
+            simcore.log.add("hidden", value)
+
+    hidden = property(_get_hidden, _set_hidden)
+
+    def _moved(self, x, y):
+        if (x, y) != (self._x, self._y):
+            self._invalidate()
+            self._x, self._y = x, y
+            self._invalidate()
+
+    def _origin(self):
+        x, y = 0, 0
+        node = self._parent
+        while isinstance(node, _Node):
+            x += node._x
+            y += node._y
+            node = node._parent
+        return x, y
+
+    def _on_screen(self):
+        node = self
+        while isinstance(node, _Node):
+            if node._hidden:
+                return False
+            node = node._parent
+        return node is not None and getattr(node, "root_group", None) is not None
+
+    def _size(self):
+        return 0, 0
+
+    def _bounds(self):
+        ox, oy = self._origin()
+        w, h = self._size()
+        return ox + self._x, oy + self._y, w, h
+
+    def _invalidate(self, force=False):
+        if force:
+            node = self._parent
+            while isinstance(node, _Node):
+                if node._hidden:
+                    return
+                node = node._parent
+            if node is None:
+                return
+        elif not self._on_screen():
+            return
+        for x, y, w, h in self._areas():
+            simcore.bus.invalidate(x, y, w, h)
+
+    def _areas(self):
+        return [self._bounds()]
+
+
+class Group(_Node):
+    def __init__(self, *, max_size=4, scale=1, x=0, y=0):
+        super().__init__(x, y)
+        self.max_size = max_size
+        self.scale = scale
+        self._children = []
+
+    def append(self, layer):
+        self.insert(len(self._children), layer)
+
+    def insert(self, index, layer):
+        if len(self._children) >= self.max_size:
+            raise RuntimeError("Group full")
+        if layer._parent is not None:
+            raise ValueError("Layer already in a group.")
+        self._children.insert(index, layer)
+        layer._parent = self
+        layer._invalidate()
+        simcore.log.add("group_insert")
+
+    def remove(self, layer):
+        self.pop(self.index(layer))
+
+    def pop(self, i=-1):
+        layer = self._children[i]
+        layer._invalidate()
+        del self._children[i]
+        layer._parent = None
+        simcore.log.add("group_remove")
+        return layer
+
+    def index(self, layer):
+        for i, child in enumerate(self._children):
+            if child is layer:
+                return i
+        raise ValueError("object not in sequence")
+
+    def __len__(self):
+        return len(self._children)
+
+    def __getitem__(self, index):
+        return self._children[index]
+
+    def __setitem__(self, index, layer):
+        self.pop(index)
+        self.insert(index, layer)
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def __contains__(self, layer):
+        return any(child is layer for child in self._children)
+
+    def __iter__(self):
+        return iter(list(self._children))
+
+    def __bool__(self):
+        return bool(self._children)
+
+    def _areas(self):
+        areas = []
+        for child in self._children:
+            if not child._hidden:
+                areas.extend(child._areas())
+        return areas
+
+    def _bounds(self):
+        areas = self._areas()
+        if not areas:
+            ox, oy = self._origin()
+            return ox + self._x, oy + self._y, 0, 0
+        x0 = min(a[0] for a in areas)
+        y0 = min(a[1] for a in areas)
+        x1 = max(a[0] + a[2] for a in areas)
+        y1 = max(a[1] + a[3] for a in areas)
+        return x0, y0, x1 - x0, y1 - y0
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self._data = bytearray(width * height)
+        self.bytes = width * height * max(1, (value_count - 1).bit_length()) // 8
+
+    def _index(self, index):
+        if isinstance(index, tuple):
+            x, y = index
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                raise IndexError("pixel coordinates out of bounds")
+            return y * self.width + x
+        return index
+
+    def __getitem__(self, index):
+        return self._data[self._index(index)]
+
+    def __setitem__(self, index, value):
+        if value >= self.value_count:
+            raise ValueError("pixel value requires too many bits")
+        self._data[self._index(index)] = value
+
+    def fill(self, value):
+        for i in range(len(self._data)):
+            self._data[i] = value
+
+
+class Palette:
+    def __init__(self, color_count):
+        self._colors = [0] * color_count
+        self._transparent = set()
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, value):
+        self._colors[index] = value
+
+    def make_transparent(self, index):
+        self._transparent.add(index)
+
+    def make_opaque(self, index):
+        self._transparent.discard(index)
+
+
+class ColorConverter:
+    pass
+
+
+class OnDiskBitmap:
+    """Only the header is read; pixels are "streamed" at refresh time."""
+
+    def __init__(self, file):
+        header = file.read(26)
+        if header[:2] != b"BM":
+            raise ValueError("Invalid BMP file")
+        self.width, self.height = struct.unpack("<ii", header[18:26])
+        self.height = abs(self.height)
+        self.bytes = 0
+
+
+class TileGrid(_Node):
+    def __init__(self, bitmap, *, pixel_shader, width=1, height=1,
+                 tile_width=None, tile_height=None, default_tile=0,
+                 x=0, y=0, position=None):
+        if position is not None:
+            x, y = position
+        super().__init__(x, y)
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width or bitmap.width
+        self.tile_height = tile_height or bitmap.height
+        if bitmap.width % self.tile_width or bitmap.height % self.tile_height:
+            raise ValueError("Tile width must exactly divide bitmap width")
+        self._tiles = bytearray([default_tile] * (width * height))
+        if isinstance(bitmap, OnDiskBitmap):
+            simcore.bus.ondisk_grids.append(self)
+
+    def _size(self):
+        return self.width * self.tile_width, self.height * self.tile_height
+
+    def _index(self, index):
+        if isinstance(index, tuple):
+            x, y = index
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                raise IndexError("Tile index out of bounds")
+            return y * self.width + x
+        return index
+
+    def __getitem__(self, index):
+        return self._tiles[self._index(index)]
+
+    def __setitem__(self, index, value):
+        i = self._index(index)
+        simcore.log.add("tile")
+        if self._tiles[i] == value:
+            return
+        self._tiles[i] = value
+        if self._on_screen():
+            ox, oy = self._origin()
+            simcore.bus.invalidate(ox + self._x + (i % self.width) * self.tile_width,
+                                   oy + self._y + (i // self.width) * self.tile_height,
+                                   self.tile_width, self.tile_height)
@@ -0,0 +1,40 @@
+# Host stand-in for ``neopixel``; records every write.
+
+import simcore
+
+
+class NeoPixel:
+    def __init__(self, pin, n, *, bpp=3, brightness=1.0, auto_write=True,
+                 pixel_order=None):
+        self.n = n
+        self.brightness = brightness
+        self.auto_write = auto_write
+        self._pixels = [(0, 0, 0)] * n
+
+    @staticmethod
+    def _rgb(color):
+        if isinstance(color, int):
+            return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+        return tuple(color[:3])
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, color):
+        self._pixels[index] = self._rgb(color)
+        if self.auto_write:
+            self.show()
+
+    def fill(self, color):
+        self._pixels = [self._rgb(color)] * self.n
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        simcore.log.add("neopixel", self._pixels[0] if self._pixels else None)
+
+    def deinit(self):
+        pass
@@ -0,0 +1,20 @@
+# Host stand-in for ``supervisor``; serial input comes from simcore.serial.
+
+import simcore
+
+
+class _Runtime:
+    @property
+    def serial_connected(self):
+        return True
+
+    @property
+    def serial_bytes_available(self):
+        return simcore.serial.available() > 0
+
+
+runtime = _Runtime()
+
+
+def reload():
+    raise simcore.SimulationComplete()
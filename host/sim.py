@@ -0,0 +1,169 @@
+# * ------------------------------------------------------------
+# The Diceinator - headless host runner
+#
+# Runs code.py on plain Linux against the stand-ins in host/shims,
+# driving the main loop from a scripted touch feed.
+#
+#   python host/sim.py                       # built-in demo session
+#   python host/sim.py host/scripts/demo.touch --profile
+#   python host/sim.py --realtime            # real sleeps, watchable pace
+# * ------------------------------------------------------------
+
+import argparse
+import builtins
+import cProfile
+import os
+import pstats
+import runpy
+import sys
+import tempfile
+import time
+import types
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+SHIM_DIR = os.path.join(HOST_DIR, "shims")
+for _path in (SHIM_DIR, HOST_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import simcore  # noqa: E402
+
+APP_PATH = os.path.join(simcore.REPO_ROOT, "code.py")
+DEMO_SCRIPT = os.path.join(HOST_DIR, "scripts", "demo.touch")
+
+
+class SimSession:
+    """What one run of the app did: its globals, clock, bus and event log."""
+
+    def __init__(self, namespace, clock, bus, log, touch, cpu_time):
+        self.namespace = namespace
+        self.clock = clock
+        self.bus = bus
+        self.log = log
+        self.touch = touch
+        self.cpu_time = cpu_time
+
+    def summary(self):
+        lines = [
+            "virtual time   %8.3f s" % self.clock._elapsed(),
+            "  slept        %8.3f s" % self.clock.slept,
+            "  hardware     %8.3f s" % self.clock.charged,
+            "host CPU time  %8.3f s" % self.cpu_time,
+            "refreshes      %8d (%.3f s, %d px)" % (
+                self.bus.refreshes, self.bus.refresh_time, self.bus.pixels_pushed),
+            "touch reads    %8d" % self.touch.reads,
+        ]
+        for kind in sorted(self.log.counts):
+            lines.append("%-14s %8d" % (kind, self.log.counts[kind]))
+        return "\n".join(lines)
+
+
+def run(script=None, app=APP_PATH, virtual=True, flash_dir=None, profile=None,
+        keep_events=2000, secrets=None):
+    """Run ``app`` until the touch script is exhausted; return a SimSession.
+
+    The app's module globals are returned too, so callers can poke at
+    functions such as ``roll_dice`` after the loop has been unwound.
+    ``secrets`` is the dict the app sees as secrets.secrets, if any.
+    """
+    if script is None:
+        script = simcore.TouchScript.load(DEMO_SCRIPT)
+    if flash_dir is None:
+        flash_dir = tempfile.mkdtemp(prefix="diceinator-flash-")
+    simcore.reset(script, virtual=virtual, flash_dir=flash_dir,
+                  keep_events=keep_events)
+    namespace = {}
+    before = set(sys.modules)
+    saved_time = sys.modules["time"]
+    saved_open = builtins.open
+    saved_stdin = sys.stdin
+    saved_secrets = sys.modules.get("secrets")
+    if secrets is not None:
+        module = types.ModuleType("secrets")
+        module.secrets = secrets
+        sys.modules["secrets"] = module
+    sys.modules["time"] = simcore.time_module
+    builtins.open = simcore.device_open
+    sys.stdin = simcore.serial
+    if simcore.REPO_ROOT not in sys.path:
+        sys.path.insert(0, simcore.REPO_ROOT)
+    start = time.process_time()
+    try:
+        if profile is not None:
+            profile.enable()
+        try:
+            namespace = runpy.run_path(app, run_name="__main__")
+        except simcore.SimulationComplete:
+            namespace = _last_frame_globals(app)
+        finally:
+            if profile is not None:
+                profile.disable()
+    finally:
+        sys.modules["time"] = saved_time
+        builtins.open = saved_open
+        sys.stdin = saved_stdin
+        if secrets is not None:
+            if saved_secrets is None:
+                del sys.modules["secrets"]
+            else:
+                sys.modules["secrets"] = saved_secrets
+        # App-side modules are re-imported fresh by the next run
+        for name in set(sys.modules) - before:
+            module = sys.modules[name]
+            if getattr(module, "__file__", "") and module.__file__.startswith(simcore.REPO_ROOT) \
+                    and not module.__file__.startswith(HOST_DIR):
+                del sys.modules[name]
+    cpu_time = time.process_time() - start
+    return SimSession(namespace, simcore.clock, simcore.bus, simcore.log,
+                      simcore.touch, cpu_time)
+
+
+def _last_frame_globals(app):
+    # runpy discards the module namespace when the script raises; recover
+    # it from the traceback so the caller can still inspect the app.
+    tb = sys.exc_info()[2]
+    found = {}
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == app:
+            found = tb.tb_frame.f_globals
+        tb = tb.tb_next
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run code.py headless")
+    parser.add_argument("script", nargs="?", default=DEMO_SCRIPT,
+                        help="touch script: '<start> <x> <y> [hold]' or "
+                             "'<start> serial <command>' per line")
+    parser.add_argument("--realtime", action="store_true",
+                        help="use wall-clock time instead of the virtual clock")
+    parser.add_argument("--tail", type=float, default=8.0,
+                        help="seconds to keep running after the last touch")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the top functions by cumulative host CPU time")
+    parser.add_argument("--events", type=int, default=0,
+                        help="print the last N hardware events")
+    parser.add_argument("--flash", help="directory for files the app writes "
+                                        "(default: a new temporary one)")
+    parser.add_argument("--secrets", help="python file defining the app's secrets dict")
+    args = parser.parse_args(argv)
+    secrets = None
+    if args.secrets:
+        secrets = runpy.run_path(args.secrets)["secrets"]
+
+    profiler = cProfile.Profile() if args.profile else None
+    session = run(simcore.TouchScript.load(args.script, args.tail),
+                  virtual=not args.realtime, flash_dir=args.flash, profile=profiler,
+                  secrets=secrets)
+    print()
+    print(session.summary())
+    if args.events:
+        for t, kind, detail in session.log.events[-args.events:]:
+            print("%9.4f  %-14s %s" % (t, kind, "" if detail is None else detail))
+    if profiler is not None:
+        print()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+# * ------------------------------------------------------------
+# The Diceinator - host simulator core
+#
+# Shared state for the headless stand-ins in host/shims: a virtual
+# clock, the simulated display bus, the scripted touch feed and a
+# log of everything the app did to the "hardware".
+# * ------------------------------------------------------------
+
+import builtins
+import os
+import sys
+import time as _real_time
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCREEN_WIDTH = 320
+SCREEN_HEIGHT = 240
+
+# ------------- Cost model ----------------- #
+# Rough figures for a PyPortal running CircuitPython 5.  They only need
+# to be in the right ballpark so that relative costs show up on a dev box.
+REFRESH_OVERHEAD = 0.002        # Seconds per refresh, before any pixels
+BUS_BYTES_PER_SEC = 4000000     # 8-bit parallel bus to the ILI9341
+ONDISK_BYTES_PER_SEC = 1000000  # Extra flash reads for OnDiskBitmap areas
+AUTO_REFRESH_PERIOD = 1 / 60    # displayio background refresh rate
+TOUCH_READ_COST = 0.0015        # ADC reads for one touch_point
+FLASH_BYTES_PER_SEC = 1000000   # imageload and wav streaming from flash
+GLYPH_LOAD_COST = 0.002         # Parsing one BDF glyph
+
+
+class SimulationComplete(BaseException):
+    """Raised from the touch feed once the script has played out.
+
+    A BaseException so the app's own ``except`` clauses cannot swallow it.
+    """
+
+
+# ------------- Clock ---------------------- #
+class SimClock:
+    """Monotonic clock used in place of ``time`` while the app runs.
+
+    In virtual mode ``sleep`` and simulated hardware costs just move the
+    clock forward, so a 7 second roll takes microseconds of wall time.
+    In real mode the clock is wall time and costs really sleep.
+    """
+
+    def __init__(self, virtual=True):
+        self.virtual = virtual
+        self._start = _real_time.monotonic()
+        self._now = 0.0
+        self.slept = 0.0
+        self.charged = 0.0
+        self.hooks = []
+
+    def monotonic(self):
+        for hook in self.hooks:
+            hook(self)
+        return self._elapsed()
+
+    def monotonic_ns(self):
+        return int(self.monotonic() * 1000000000)
+
+    def sleep(self, seconds):
+        if seconds < 0:
+            raise ValueError("sleep length must be non-negative")
+        self.slept += seconds
+        self._advance(seconds)
+        for hook in self.hooks:
+            hook(self)
+
+    def charge(self, seconds):
+        """Account for time the simulated hardware would have taken."""
+        self.charged += seconds
+        self._advance(seconds)
+
+    def _elapsed(self):
+        if self.virtual:
+            return self._now
+        return _real_time.monotonic() - self._start
+
+    def _advance(self, seconds):
+        if self.virtual:
+            self._now += seconds
+        elif seconds > 0:
+            _real_time.sleep(seconds)
+
+
+# ------------- Display bus ---------------- #
+class SimDisplayBus:
+    """Tracks dirty rectangles and what refreshing them would cost."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.dirty = []
+        self.refreshes = 0
+        self.pixels_pushed = 0
+        self.refresh_time = 0.0
+        self.ondisk_grids = []
+        self._last_auto = 0.0
+
+    def invalidate(self, x, y, width, height):
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(SCREEN_WIDTH, x + width)
+        y1 = min(SCREEN_HEIGHT, y + height)
+        if x1 > x0 and y1 > y0:
+            self.dirty.append((x0, y0, x1, y1))
+
+    def invalidate_all(self):
+        self.invalidate(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def refresh(self):
+        """Push the dirty area, charging the clock.  Returns pixels sent."""
+        if not self.dirty:
+            return 0
+        area = 0
+        for x0, y0, x1, y1 in _merge(self.dirty):
+            area += (x1 - x0) * (y1 - y0)
+        area = min(area, SCREEN_WIDTH * SCREEN_HEIGHT)
+        cost = REFRESH_OVERHEAD + area * 2 / BUS_BYTES_PER_SEC
+        for grid in self.ondisk_grids:
+            if grid._on_screen():
+                cost += _overlap(grid._bounds(), self.dirty) / ONDISK_BYTES_PER_SEC
+        self.dirty = []
+        self.refreshes += 1
+        self.pixels_pushed += area
+        self.refresh_time += cost
+        self.clock.charge(cost)
+        log.add("refresh", area)
+        return area
+
+    def auto_refresh_hook(self, clock):
+        if display is None or not display.auto_refresh:
+            return
+        if self.dirty and clock._elapsed() - self._last_auto >= AUTO_REFRESH_PERIOD:
+            self._last_auto = clock._elapsed()
+            self.refresh()
+
+
+def _merge(rects):
+    # Drop rectangles wholly contained in another; good enough for the
+    # handful of tiles and labels an app frame touches.
+    rects = sorted(set(rects), key=lambda r: (r[2] - r[0]) * (r[3] - r[1]), reverse=True)
+    kept = []
+    for r in rects:
+        for k in kept:
+            if k[0] <= r[0] and k[1] <= r[1] and k[2] >= r[2] and k[3] >= r[3]:
+                break
+        else:
+            kept.append(r)
+    return kept
+
+
+def _overlap(bounds, rects):
+    bx, by, bw, bh = bounds
+    total = 0
+    for x0, y0, x1, y1 in _merge(rects):
+        w = min(x1, bx + bw) - max(x0, bx)
+        h = min(y1, by + bh) - max(y0, by)
+        if w > 0 and h > 0:
+            total += w * h
+    return total
+
+
+# ------------- Touch feed ----------------- #
+class TouchScript:
+    """Scripted finger presses: a list of ``(start, x, y, hold)`` tuples,
+    plus optional ``(start, text)`` lines typed on the serial console.
+
+    ``point(now)`` returns the touch under the finger at virtual time
+    ``now``.  Once the last press has been released and ``tail`` seconds
+    have passed, it raises SimulationComplete to end the app's loop.
+    """
+
+    def __init__(self, presses, tail=8.0, commands=()):
+        self.presses = sorted(presses)
+        self.commands = sorted(commands)
+        self.tail = tail
+        self.reads = 0
+        self.end = 0.0
+        for start, _x, _y, hold in self.presses:
+            self.end = max(self.end, start + hold)
+        for start, _text in self.commands:
+            self.end = max(self.end, start)
+
+    @classmethod
+    def load(cls, path, tail=8.0):
+        """Read a script file: ``<start> <x> <y> [hold]`` per line,
+        or ``<start> serial <text>`` to type a console command."""
+        presses = []
+        commands = []
+        with open(path) as f:
+            for line in f:
+                line = line.split("#", 1)[0].split()
+                if not line:
+                    continue
+                if line[1] == "serial":
+                    commands.append((float(line[0]), " ".join(line[2:])))
+                    continue
+                hold = float(line[3]) if len(line) > 3 else 0.1
+                presses.append((float(line[0]), int(line[1]), int(line[2]), hold))
+        return cls(presses, tail, commands)
+
+    def point(self, now):
+        self.reads += 1
+        if now > self.end + self.tail:
+            raise SimulationComplete()
+        for start, x, y, hold in self.presses:
+            if start <= now < start + hold:
+                return (x, y, 30000)
+            if start > now:
+                break
+        return None
+
+
+# ------------- Serial console ------------- #
+class SerialInput:
+    """Stands in for sys.stdin: script commands become readable once due."""
+
+    def __init__(self, script):
+        self.script = script
+        self.buffer = ""
+        self._next = 0
+
+    def _fill(self):
+        now = clock._elapsed()
+        commands = self.script.commands
+        while self._next < len(commands) and commands[self._next][0] <= now:
+            self.buffer += commands[self._next][1] + "\r\n"
+            self._next += 1
+
+    def available(self):
+        self._fill()
+        return len(self.buffer)
+
+    def read(self, n=-1):
+        self._fill()
+        if n < 0:
+            n = len(self.buffer)
+        data, self.buffer = self.buffer[:n], self.buffer[n:]
+        return data
+
+
+# ------------- Event log ------------------ #
+class EventLog:
+    """Counts every hardware action; keeps the most recent ones in order."""
+
+    def __init__(self, keep=2000):
+        self.keep = keep
+        self.counts = {}
+        self.events = []
+        self.clock = None
+
+    def add(self, kind, detail=None):
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if self.keep:
+            t = self.clock._elapsed() if self.clock else 0.0
+            self.events.append((t, kind, detail))
+            if len(self.events) > self.keep:
+                del self.events[: len(self.events) - self.keep]
+
+
+# ------------- Device filesystem ---------- #
+_real_open = builtins.open
+_flash_dir = None
+
+
+def device_path(path):
+    """Map an absolute CIRCUITPY path onto the repo or the scratch flash dir."""
+    if not isinstance(path, str) or not path.startswith("/"):
+        return path
+    top = path.lstrip("/").split("/", 1)[0]
+    if _flash_dir and os.path.exists(os.path.join(_flash_dir, top)):
+        return os.path.join(_flash_dir, path.lstrip("/"))
+    if os.path.exists(os.path.join(REPO_ROOT, top)):
+        return os.path.join(REPO_ROOT, path.lstrip("/"))
+    if _flash_dir and not os.path.exists("/" + top):
+        return os.path.join(_flash_dir, path.lstrip("/"))
+    return path
+
+
+def device_open(path, mode="r", *args, **kwargs):
+    writing = "w" in mode or "a" in mode or "+" in mode
+    if _flash_dir and writing and isinstance(path, str) and path.startswith("/"):
+        top = path.lstrip("/").split("/", 1)[0]
+        if os.path.exists(os.path.join(_flash_dir, top)) or not os.path.exists("/" + top):
+            # Writes never land in the repo; they go to the scratch flash dir
+            path = os.path.join(_flash_dir, path.lstrip("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            return _real_open(path, mode, *args, **kwargs)
+    return _real_open(device_path(path), mode, *args, **kwargs)
+
+
+# ------------- Session state -------------- #
+clock = SimClock()
+bus = SimDisplayBus(clock)
+touch = TouchScript([])
+serial = SerialInput(touch)
+log = EventLog()
+display = None      # board.DISPLAY, created by the board shim
+ambient = 8000      # Light sensor reading, 0 - 65535 (a lit room)
+
+
+def _time_attr(name):
+    def call(*args):
+        return getattr(clock, name)(*args)
+    call.__name__ = name
+    return call
+
+
+# Stand-in ``time`` module.  Its functions always forward to the current
+# session's clock, so modules imported during an earlier run stay valid.
+time_module = types.ModuleType("time")
+time_module.__dict__.update(
+    {k: v for k, v in vars(_real_time).items() if not k.startswith("__")})
+time_module.monotonic = _time_attr("monotonic")
+time_module.monotonic_ns = _time_attr("monotonic_ns")
+time_module.sleep = _time_attr("sleep")
+
+
+def reset(script=None, virtual=True, flash_dir=None, keep_events=2000):
+    """Start a fresh session with a new clock, bus, touch feed and log."""
+    global clock, bus, touch, serial, log, display, _flash_dir
+    clock = SimClock(virtual)
+    bus = SimDisplayBus(clock)
+    clock.hooks.append(bus.auto_refresh_hook)
+    touch = script if script is not None else TouchScript([])
+    serial = SerialInput(touch)
+    log = EventLog(keep_events)
+    log.clock = clock
+    display = None
+    _flash_dir = flash_dir
+    board = sys.modules.get("board")
+    if board is not None:
+        board._reset()
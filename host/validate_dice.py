@@ -0,0 +1,365 @@
+# * ------------------------------------------------------------
+# The Diceinator - dice validation harness
+#
+# Checks that the round logic is right and the dice are fair, in
+# three steps:
+#
+#   1. Every face combination of every matchup goes through the app's
+#      RoundResolver; the pair wins counted there are the exact odds,
+#      and must agree with risk_odds.ROUND_ODDS.
+#   2. A NumPy port of the resolver (sort high to low, pair high with
+#      high, ties to the defender, a lo pair only when both sides roll
+#      more than one die) must give the same winners as RoundResolver
+#      for every one of those combinations.  A NumPy port of the
+#      DicePool xorshift must give the same faces as DicePool.
+#   3. Monte Carlo: many DicePool streams, one per seed, run side by
+#      side as NumPy lanes over a process pool on every core.  The
+#      pair wins, round outcomes and faces rolled are compared with
+#      the exact odds (z-scores and chi-square).
+#
+# Lane seeds come from os.urandom, so each lane starts at a random
+# point of the generator's one cycle of 2^32-1 steps.  A matchup never
+# draws more than that many steps over all its lanes, about 1.7 to 4.2
+# billion rounds depending on the dice; past that it would only see
+# the same faces again.
+#
+#   python host/validate_dice.py                     # 60 million rounds
+#   python host/validate_dice.py --rounds 1e9        # a billion a matchup, all cores
+#   python host/validate_dice.py --scaling           # rounds/s by worker count
+#
+# Needs NumPy (pip install numpy); the app itself does not.
+# * ------------------------------------------------------------
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HOST_DIR)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from dice_rng import ACCEPT, DicePool  # noqa: E402
+from luck import MATCHUPS  # noqa: E402
+from resolver import ATT_WIN, RoundResolver  # noqa: E402
+from risk_odds import ROUND_ODDS  # noqa: E402
+
+LANES = 4096        # DicePool streams per NumPy batch
+STEPS = 256         # Generator steps per batch (two bytes each)
+PERIOD = 0xFFFFFFFF     # Steps before the DicePool xorshift repeats
+MAX_BATCHES = PERIOD // (LANES * STEPS)     # Batches a matchup can run in one period
+Z_LIMIT = 4.5       # |z| above this fails; about 1 in 150000 for fair dice
+CHI2_LIMITS = {1: 10.83, 2: 13.82, 5: 20.52}   # 0.1% points by degrees of freedom
+
+
+# ------------- Exact odds ----------------- #
+def exact_counts(att_dice, def_dice):
+    """Run every face combination through RoundResolver.
+    Returns (combinations, hi pair att wins, lo pair att wins,
+    combinations by defender losses).
+    """
+    resolver = RoundResolver(DicePool(seed=1, log=False))
+    hi = lo = 0
+    by_loss = [0, 0, 0]
+    total = 0
+    for faces in itertools.product(range(1, 7), repeat=att_dice + def_dice):
+        for i in range(att_dice):
+            resolver.att[i] = faces[i]
+        for i in range(def_dice):
+            resolver.defend[i] = faces[att_dice + i]
+        resolver.resolve(att_dice, def_dice)
+        hi += resolver.winners[0] == ATT_WIN
+        lo += resolver.winners[1] == ATT_WIN
+        by_loss[resolver.def_loss] += 1
+        total += 1
+    return total, hi, lo, by_loss
+
+
+def check_table(att_dice, def_dice, exact):
+    """Does ROUND_ODDS agree with the enumerated rounds?"""
+    total, _hi, _lo, by_loss = exact
+    table_total, rows = ROUND_ODDS[(att_dice, def_dice)]
+    table = [0, 0, 0]
+    for _att_loss, def_loss, count in rows:
+        table[def_loss] += count
+    return table_total == total and table == by_loss
+
+
+# ------------- NumPy port ----------------- #
+def np_resolve(att, defend):
+    """Att wins of the hi and lo pairs for rounds of faces, one row each.
+    The lo column is all False when there is no lo pair.
+    """
+    att = np.sort(att, axis=1)[:, ::-1]
+    defend = np.sort(defend, axis=1)[:, ::-1]
+    hi = att[:, 0] > defend[:, 0]
+    if att.shape[1] > 1 and defend.shape[1] > 1:
+        lo = att[:, 1] > defend[:, 1]
+    else:
+        lo = np.zeros(len(att), dtype=bool)
+    return hi, lo
+
+
+def check_port(att_dice, def_dice):
+    """Combinations where np_resolve() and RoundResolver disagree."""
+    n = att_dice + def_dice
+    faces = np.array(list(itertools.product(range(1, 7), repeat=n)), dtype=np.uint8)
+    hi, lo = np_resolve(faces[:, :att_dice], faces[:, att_dice:])
+    resolver = RoundResolver(DicePool(seed=1, log=False))
+    bad = 0
+    for row in range(len(faces)):
+        for i in range(att_dice):
+            resolver.att[i] = faces[row, i]
+        for i in range(def_dice):
+            resolver.defend[i] = faces[row, att_dice + i]
+        resolver.resolve(att_dice, def_dice)
+        if (resolver.winners[0] == ATT_WIN) != hi[row] or \
+                (resolver.winners[1] == ATT_WIN) != lo[row]:
+            bad += 1
+    return bad
+
+
+def lane_seeds(seed=None):
+    """LANES nonzero seeds from os.urandom, or from ``seed`` to repeat a run."""
+    if seed is None:
+        raw = np.frombuffer(os.urandom(4 * LANES), dtype=np.uint32)
+    else:
+        raw = np.random.default_rng(seed).integers(0, 1 << 32, LANES, dtype=np.uint32)
+    return np.where(raw == 0, 1, raw).astype(np.uint32)
+
+
+def lane_state(seeds):
+    # Same start as DicePool.reseed()
+    seeds = np.asarray(seeds, dtype=np.uint32)
+    x = (seeds >> 16) & 0xFFFF
+    y = seeds & 0xFFFF
+    y[(x == 0) & (y == 0)] = 1
+    return x, y
+
+
+def lane_faces(x, y, steps):
+    """Run the DicePool generator ``steps`` steps in every lane.
+    Returns (faces, count): each row holds that lane's next faces
+    in order, of which the first ``count`` are valid in every row.
+    """
+    out = np.empty((len(x), 2 * steps), dtype=np.uint32)
+    for s in range(steps):
+        t = x ^ ((x << 5) & 0xFFFF)
+        x[:] = y
+        y[:] = (y ^ (y >> 1)) ^ (t ^ (t >> 3))
+        out[:, 2 * s] = y >> 8
+        out[:, 2 * s + 1] = y & 0xFF
+    keep = out < ACCEPT
+    # Stable sort moves each lane's accepted bytes to the front, in order
+    order = np.argsort(~keep, axis=1, kind="stable")
+    faces = np.take_along_axis(out, order, axis=1) % 6 + 1
+    return faces.astype(np.uint8), int(keep.sum(axis=1).min())
+
+
+def check_stream(seeds, count=500):
+    """Lanes whose faces differ from DicePool's for the same seed."""
+    x, y = lane_state(seeds)
+    faces, valid = lane_faces(x, y, STEPS)
+    count = min(count, valid)
+    bad = 0
+    for lane, seed in enumerate(seeds):
+        pool = DicePool(seed=seed, size=count, log=False)
+        if bytes(pool.faces) != faces[lane, :count].tobytes():
+            bad += 1
+    return bad
+
+
+# ------------- Monte Carlo ---------------- #
+def simulate(job):
+    """One worker job: ``batches`` batches of LANES streams on one matchup,
+    one stream per seed in ``seeds``.
+    Faces past the shortest lane are dropped at the end of each batch,
+    so every round is consecutive faces of one seed's stream.
+    Returns (rounds, hi wins, lo wins, rounds by def losses,
+    red face counts, white face counts).
+    """
+    att_dice, def_dice, seeds, batches = job
+    n = att_dice + def_dice
+    x, y = lane_state(seeds)
+    rounds = hi_wins = lo_wins = 0
+    by_loss = np.zeros(3, dtype=np.int64)
+    red = np.zeros(7, dtype=np.int64)
+    white = np.zeros(7, dtype=np.int64)
+    for _ in range(batches):
+        faces, valid = lane_faces(x, y, STEPS)
+        per_lane = valid // n
+        faces = faces[:, :per_lane * n].reshape(-1, n)
+        att = faces[:, :att_dice]
+        defend = faces[:, att_dice:]
+        hi, lo = np_resolve(att, defend)
+        rounds += len(faces)
+        hi_wins += int(hi.sum())
+        lo_wins += int(lo.sum())
+        by_loss += np.bincount(hi.astype(np.int64) + lo, minlength=3)
+        red += np.bincount(att.ravel(), minlength=7)
+        white += np.bincount(defend.ravel(), minlength=7)
+    return rounds, hi_wins, lo_wins, by_loss, red, white
+
+
+def rounds_per_batch(att_dice, def_dice):
+    # About 99% of bytes are accepted
+    return LANES * ((2 * STEPS * ACCEPT // 256 - 8) // (att_dice + def_dice))
+
+
+def max_rounds(att_dice, def_dice):
+    """Most rounds a matchup runs: one generator period over all its lanes."""
+    return MAX_BATCHES * rounds_per_batch(att_dice, def_dice)
+
+
+def run_matchups(rounds, workers, seed=None):
+    """Spread about ``rounds`` rounds per matchup over ``workers`` processes,
+    at most max_rounds() each.  Lane seeds come from os.urandom, or from
+    ``seed`` to repeat a run.
+    Returns ({matchup: totals}, rounds run, seconds).
+    """
+    jobs = []
+    for m, (a, d) in enumerate(MATCHUPS):
+        batches = max(1, int(round(rounds / rounds_per_batch(a, d))))
+        batches = min(batches, MAX_BATCHES)
+        # Several jobs per matchup so every worker has a share
+        parts = min(batches, max(1, workers * 2))
+        for p in range(parts):
+            share = batches // parts + (p < batches % parts)
+            seeds = lane_seeds(None if seed is None else (seed, m, p))
+            jobs.append((m, (a, d, seeds, share)))
+    totals = {}
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(workers)
+    try:
+        results = pool.map(simulate, [job for _m, job in jobs])
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+    done = 0
+    for (m, _job), result in zip(jobs, results):
+        done += result[0]
+        if m not in totals:
+            totals[m] = list(result)
+        else:
+            for i in range(len(result)):
+                totals[m][i] = totals[m][i] + result[i]
+    return totals, done, elapsed
+
+
+def z_score(wins, n, p):
+    if n == 0 or p in (0, 1):
+        return 0.0
+    return (wins - n * p) / math.sqrt(n * p * (1 - p))
+
+
+def chi2(observed, expected):
+    total = 0.0
+    for o, e in zip(observed, expected):
+        if e > 0:
+            total += (o - e) ** 2 / e
+    return total
+
+
+def report(totals, exact):
+    """Print the comparison; returns the number of failed checks."""
+    failed = 0
+    print('%-5s %12s %9s %9s %7s %9s %9s %7s %8s %8s %8s' % (
+        "match", "rounds", "hi exact", "hi seen", "z", "lo exact", "lo seen", "z",
+        "loss X2", "red X2", "wht X2"))
+    for m, (a, d) in enumerate(MATCHUPS):
+        n, hi, lo, by_loss, red, white = totals[m]
+        total, hi_exact, lo_exact, loss_exact = exact[m]
+        pairs = 2 if a > 1 and d > 1 else 1
+        p_hi = hi_exact / total
+        p_lo = lo_exact / total
+        z_hi = z_score(hi, n, p_hi)
+        z_lo = z_score(lo, n, p_lo) if pairs == 2 else 0.0
+        x_loss = chi2(by_loss[:pairs + 1], [n * c / total for c in loss_exact[:pairs + 1]])
+        x_red = chi2(red[1:], [red[1:].sum() / 6.0] * 6)
+        x_wht = chi2(white[1:], [white[1:].sum() / 6.0] * 6)
+        bad = (abs(z_hi) > Z_LIMIT or abs(z_lo) > Z_LIMIT or x_loss > CHI2_LIMITS[pairs]
+               or x_red > CHI2_LIMITS[5] or x_wht > CHI2_LIMITS[5]
+               or (pairs == 1 and lo))
+        failed += bad
+        print('%dv%d   %12d %9.6f %9.6f %7.2f %9s %9s %7s %8.2f %8.2f %8.2f%s' % (
+            a, d, n, p_hi, hi / n, z_hi,
+            "%.6f" % p_lo if pairs == 2 else "-", "%.6f" % (lo / n) if pairs == 2 else "-",
+            "%.2f" % z_lo if pairs == 2 else "-",
+            x_loss, x_red, x_wht, "  FAIL" if bad else ""))
+    return failed
+
+
+def scaling(rounds, most):
+    print('%7s %14s %8s' % ("workers", "rounds/s", "speedup"))
+    single = None
+    workers = 1
+    while True:
+        _totals, done, elapsed = run_matchups(rounds, workers)
+        rate = done / elapsed
+        single = single or rate
+        print('%7d %14.0f %8.2f' % (workers, rate, rate / single))
+        if workers >= most:
+            break
+        workers = min(most, workers * 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the dice and round logic")
+    parser.add_argument("--rounds", type=float, default=1e7,
+                        help="Monte Carlo rounds per matchup (default 1e7)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes (default: every core)")
+    parser.add_argument("--seed", type=int,
+                        help="repeat a run: lane seeds from this instead of os.urandom")
+    parser.add_argument("--scaling", action="store_true",
+                        help="only measure rounds/s for 1, 2, 4 ... workers")
+    args = parser.parse_args(argv)
+    if np is None:
+        print("validate_dice.py needs NumPy: pip install numpy")
+        return 2
+    if args.scaling:
+        scaling(args.rounds, args.workers)
+        return 0
+
+    failed = 0
+    exact = []
+    for a, d in MATCHUPS:
+        counts = exact_counts(a, d)
+        exact.append(counts)
+        table = check_table(a, d, counts)
+        port = check_port(a, d)
+        failed += (not table) + (port > 0)
+        print('%dv%d  %5d combinations, ROUND_ODDS %s, NumPy port %s' % (
+            a, d, counts[0], "agrees" if table else "DISAGREES",
+            "agrees" if not port else "differs on %d" % port))
+    seeds = [int(n) for n in lane_seeds(args.seed)[:64]]
+    stream = check_stream(seeds + [1, 0, 0xFFFFFFFF])
+    failed += stream > 0
+    print('NumPy dice streams %s DicePool' % ("match" if not stream else
+                                              "DIFFER from %d" % stream))
+
+    for a, d in MATCHUPS:
+        if args.rounds > max_rounds(a, d):
+            print('%dv%d capped at %d rounds, one generator period' % (a, d, max_rounds(a, d)))
+    totals, done, elapsed = run_matchups(args.rounds, args.workers, args.seed)
+    print()
+    failed += report(totals, exact)
+    print()
+    print('%d rounds in %.1f s on %d workers: %.0f rounds/s' % (
+        done, elapsed, args.workers, done / elapsed))
+    print('%s' % ("All checks passed" if not failed else "%d checks FAILED" % failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
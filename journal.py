@@ -0,0 +1,203 @@
+# * ------------------------------------------------------------
+# The Diceinator - roll journal
+#
+# Every resolved round as an 8 byte record, kept in a RAM ring and
+# appended to a file in batches, so flash is written rarely and
+# never in the middle of a roll.  A blitz fills the ring faster than
+# that, so a full ring is written straight away instead.
+#
+# Record, little endian "<IHBB":
+#   time    uint32  ms since boot (the seed, for a SESSION record)
+#   faces   uint16  3 bits per face: att 0 - 2, then def 0 - 1
+#   dice    uint8   att dice | def dice << 2 | winner 0 << 4 | winner 1 << 6
+#   kind    uint8   SESSION, ROLL or BLITZ
+# * ------------------------------------------------------------
+
+import os
+import struct
+import time
+from collections import namedtuple
+
+RECORD = "<IHBB"
+RECORD_SIZE = struct.calcsize(RECORD)
+
+SESSION = 0     # Start of a session, time holds the dice seed
+ROLL = 1        # A round rolled with the Roll button
+BLITZ = 2       # A round fought by a blitz
+
+JOURNAL_NAME = "journal.bin"
+JOURNAL_DIRS = ("/sd", "/")     # SD card first, then CIRCUITPY
+
+Entry = namedtuple("Entry", ("kind", "time", "att_dice", "def_dice",
+                             "att", "defend", "winners"))
+
+
+def find_journal(dirs=JOURNAL_DIRS, name=JOURNAL_NAME):
+    """Path of the journal (or another file ``name``) on the first of
+    ``dirs`` that exists."""
+    for d in dirs:
+        try:
+            os.stat(d)
+        except OSError:
+            continue
+        return d.rstrip("/") + "/" + name
+    return None
+
+
+def unpack(buf, offset=0):
+    """One record from ``buf`` as an Entry."""
+    t, faces, dice, kind = struct.unpack_from(RECORD, buf, offset)
+    att_dice = dice & 3
+    def_dice = (dice >> 2) & 3
+    att = tuple((faces >> (3 * i)) & 7 for i in range(att_dice))
+    defend = tuple((faces >> (9 + 3 * i)) & 7 for i in range(def_dice))
+    winners = ((dice >> 4) & 3, (dice >> 6) & 3)
+    return Entry(kind, t, att_dice, def_dice, att, defend, winners)
+
+
+def read_journal(path, start=0):
+    """Yield the Entries in the file at ``path``, one record read at a time.
+        :param start: Number of records to skip first
+    """
+    buf = bytearray(RECORD_SIZE)
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start * RECORD_SIZE)
+        while f.readinto(buf) == RECORD_SIZE:
+            yield unpack(buf)
+
+
+class Journal:
+    """RAM ring of round records, flushed to ``path`` in batches.
+        :param path: File to append to, or None to keep records in RAM only
+        :param capacity: Records held in RAM
+        :param batch: Pending records that make a flush due
+        :param max_age: Seconds a pending record may wait for a flush
+    """
+
+    def __init__(self, path, capacity=64, batch=32, max_age=30):
+        self.path = path
+        self.capacity = capacity
+        self.batch = batch
+        self.max_age = max_age
+        self.ring = bytearray(RECORD_SIZE * capacity)
+        self.count = 0          # Records ever added
+        self.flushed = 0        # Records written to the file
+        self.lost = 0           # Overwritten in RAM before they were written
+        self.write_errors = 0
+        self._oldest = None     # When the oldest pending record was added
+        self.base = 0           # Records already in the file at boot
+        if path is not None:
+            try:
+                with open(path, "rb") as f:
+                    self.base = f.seek(0, 2) // RECORD_SIZE
+            except OSError:
+                pass
+
+    @property
+    def pending(self):
+        return self.count - self.flushed
+
+    @property
+    def oldest(self):
+        """Number of the oldest record copy_records() can still give."""
+        if self.path is not None and not self.lost:
+            return 0        # Gone from RAM means it is in the file
+        return max(0, self.count - self.capacity)
+
+    def add(self, kind, t, faces, dice):
+        """Append one raw record to the ring."""
+        if self.pending == self.capacity:
+            self.flush()
+            if self.pending == self.capacity:
+                # Ring full and can't be written: the oldest pending record goes
+                self.flushed += 1
+                self.lost += 1
+        struct.pack_into(RECORD, self.ring, (self.count % self.capacity) * RECORD_SIZE,
+                         t & 0xFFFFFFFF, faces, dice, kind)
+        self.count += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+    def add_session(self, seed):
+        self.add(SESSION, seed, 0, 0)
+
+    def add_round(self, kind, resolver, att_dice, def_dice):
+        """Record the round just settled by ``resolver``."""
+        faces = 0
+        for i in range(att_dice):
+            faces |= resolver.att[i] << (3 * i)
+        for i in range(def_dice):
+            faces |= resolver.defend[i] << (9 + 3 * i)
+        dice = att_dice | def_dice << 2 | resolver.winners[0] << 4 | resolver.winners[1] << 6
+        self.add(kind, time.monotonic_ns() // 1000000, faces, dice)
+
+    def flush_due(self, now=None):
+        """True when a batch is ready, or a pending record is getting old."""
+        if self.path is None or not self.pending:
+            return False
+        if self.pending >= self.batch:
+            return True
+        if now is None:
+            now = time.monotonic()
+        return now - self._oldest >= self.max_age
+
+    def flush(self):
+        """Append the pending records to the file.
+        A write error (read-only or full filesystem, no card) stops
+        further writes; records then live in the RAM ring only.
+        """
+        if self.path is None or not self.pending:
+            return
+        first = self.flushed % self.capacity
+        end = first + self.pending
+        view = memoryview(self.ring)
+        try:
+            with open(self.path, "ab") as f:
+                if end <= self.capacity:
+                    f.write(view[first * RECORD_SIZE:end * RECORD_SIZE])
+                else:
+                    f.write(view[first * RECORD_SIZE:])
+                    f.write(view[:(end - self.capacity) * RECORD_SIZE])
+        except OSError as e:
+            self.write_errors += 1
+            print('Journal write to %s failed: %s' % (self.path, e))
+            self.path = None
+            return
+        self.flushed = self.count
+        self._oldest = None
+
+    def copy_records(self, first, count, buf, offset=0):
+        """Copy records ``first`` on (numbered from 0 at boot) into ``buf``
+        at ``offset``; those gone from RAM are read back from the file.
+        """
+        in_ram = max(first, self.count - self.capacity)
+        end = first + count
+        if in_ram > first:
+            n = (min(in_ram, end) - first) * RECORD_SIZE
+            with open(self.path, "rb") as f:
+                f.seek((self.base + first) * RECORD_SIZE)
+                if f.readinto(memoryview(buf)[offset:offset + n]) != n:
+                    raise OSError("journal file is short")
+            offset += n
+        ring = memoryview(self.ring)
+        for n in range(in_ram, end):
+            i = (n % self.capacity) * RECORD_SIZE
+            buf[offset:offset + RECORD_SIZE] = ring[i:i + RECORD_SIZE]
+            offset += RECORD_SIZE
+
+    def recent(self):
+        """Yield the Entries still in RAM, oldest first."""
+        for n in range(max(0, self.count - self.capacity), self.count):
+            yield unpack(self.ring, (n % self.capacity) * RECORD_SIZE)
+
+    def entries(self):
+        """Yield every Entry: the file, then anything not yet written."""
+        if self.path is not None:
+            try:
+                for entry in read_journal(self.path):
+                    yield entry
+            except OSError:
+                pass
+        for n in range(self.flushed, self.count):
+            yield unpack(self.ring, (n % self.capacity) * RECORD_SIZE)
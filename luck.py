@@ -0,0 +1,100 @@
+# * ------------------------------------------------------------
+# The Diceinator - luck statistics
+#
+# Is the Diceinator rigged?  Running counts fed one round at a time,
+# each update a fixed handful of additions, so the numbers are live
+# at any point in a game with nothing to rescan:
+#   - faces rolled per colour, and chi-square against fair dice
+#   - pairs won by the attacker per dice matchup, next to the odds
+#   - the longest runs of pairs won by either side
+#
+# Chi-square over k equally likely faces is (k / n) * sum(c^2) - n,
+# so keeping sum(c^2) up to date (c^2 grows by 2c + 1) is enough.
+# * ------------------------------------------------------------
+
+from risk_odds import ROUND_ODDS
+from resolver import ATT_WIN
+
+CHI2_LIMIT = 11.07      # 5 degrees of freedom, 5% chance for fair dice
+
+# Matchup number for (att dice, def dice)
+MATCHUPS = ((1, 1), (1, 2), (2, 1), (2, 2), (3, 1), (3, 2))
+_MATCHUP = {}
+for _i, _key in enumerate(MATCHUPS):
+    _MATCHUP[_key] = _i
+
+
+def expected_pair_win(att_dice, def_dice):
+    """Chance the attacker wins any one pair in this matchup."""
+    total, rows = ROUND_ODDS[(att_dice, def_dice)]
+    pairs = min(att_dice, def_dice)
+    def_losses = 0
+    for att_loss, def_loss, count in rows:
+        def_losses += def_loss * count
+    return def_losses / (total * pairs)
+
+
+class FaceCounts:
+    """Faces rolled by one colour of dice, with a running chi-square."""
+
+    def __init__(self):
+        self.counts = [0] * 7       # counts[face], index 0 unused
+        self.total = 0
+        self._sum_sq = 0
+
+    def add(self, face):
+        c = self.counts[face]
+        self._sum_sq += 2 * c + 1
+        self.counts[face] = c + 1
+        self.total += 1
+
+    @property
+    def chi2(self):
+        if not self.total:
+            return 0
+        return 6 * self._sum_sq / self.total - self.total
+
+
+class LuckStats:
+    def __init__(self):
+        self.red = FaceCounts()
+        self.white = FaceCounts()
+        self.rounds = [0] * len(MATCHUPS)
+        self.pairs = [0] * len(MATCHUPS)
+        self.att_pairs = [0] * len(MATCHUPS)    # Pairs the attacker won
+        self.expected = [expected_pair_win(a, d) for a, d in MATCHUPS]
+        self.streak_side = 0    # ATT_WIN or DEF_WIN, who won the last pair
+        self.streak = 0
+        self.best_att_streak = 0
+        self.best_def_streak = 0
+
+    def add_round(self, resolver, att_dice, def_dice):
+        """Count the round just settled by ``resolver``."""
+        for i in range(att_dice):
+            self.red.add(resolver.att[i])
+        for i in range(def_dice):
+            self.white.add(resolver.defend[i])
+        m = _MATCHUP[(att_dice, def_dice)]
+        self.rounds[m] += 1
+        self.pairs[m] += resolver.pairs
+        self.att_pairs[m] += resolver.def_loss
+        for k in range(resolver.pairs):
+            side = resolver.winners[k]
+            if side == self.streak_side:
+                self.streak += 1
+            else:
+                self.streak_side = side
+                self.streak = 1
+            if side == ATT_WIN:
+                if self.streak > self.best_att_streak:
+                    self.best_att_streak = self.streak
+            elif self.streak > self.best_def_streak:
+                self.best_def_streak = self.streak
+
+    def pair_win(self, att_dice, def_dice):
+        """(observed, expected) attacker pair win rate for a matchup.
+        Observed is None until a pair has been rolled.
+        """
+        m = _MATCHUP[(att_dice, def_dice)]
+        observed = self.att_pairs[m] / self.pairs[m] if self.pairs[m] else None
+        return observed, self.expected[m]
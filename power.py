@@ -0,0 +1,131 @@
+# * ------------------------------------------------------------
+# The Diceinator - idle power governor
+#
+# Left alone, the Diceinator steps down through power stages: the
+# touchscreen is sampled less often (so the loop sleeps longer), and
+# the backlight and NeoPixel dim, then go dark.  Any touch, or dice
+# rolling, brings it straight back to full rate.
+#
+# While awake the backlight follows the room, read from the PyPortal
+# light sensor every few seconds.  Counters keep the time spent in
+# each stage and how much of it the loop was awake (duty cycle).
+# * ------------------------------------------------------------
+
+import time
+
+try:
+    import analogio
+except ImportError:
+    analogio = None     # No light sensor, backlight stays at full
+
+ACTIVE = 0
+DIM = 1
+IDLE = 2
+DARK = 3
+STATE_NAMES = ("active", "dim", "idle", "dark")
+
+# (seconds untouched, touch sample period, backlight, NeoPixel brightness)
+STAGES = (
+    (0, 0.02, 1.0, 1.0),
+    (30, 0.05, 0.4, 0.3),
+    (120, 0.1, 0.1, 0.05),
+    (600, 0.25, 0.0, 0.0),
+)
+
+LIGHT_PERIOD = 2.0      # Seconds between light sensor reads
+LIGHT_DARK = 1000       # Sensor reading for a dark room: lowest backlight
+LIGHT_BRIGHT = 20000    # Sensor reading for daylight: full backlight
+BACKLIGHT_MIN = 0.3     # Backlight in a dark room, while active
+
+
+class PowerGovernor:
+    """Steps the loop, backlight and NeoPixel down while nobody plays.
+        :param touch_input: The TouchInput whose sample period is set
+        :param display: board.DISPLAY, for the backlight
+        :param pixel: The NeoPixel
+        :param light_pin: board.LIGHT, or None to skip the sensor
+        :param stages: Power stages, see STAGES
+    """
+
+    def __init__(self, touch_input, display, pixel, light_pin=None, stages=STAGES):
+        self.touch_input = touch_input
+        self.display = display
+        self.pixel = pixel
+        self.stages = stages
+        self.light = None
+        if light_pin is not None and analogio is not None:
+            self.light = analogio.AnalogIn(light_pin)
+        self.ambient = 1.0          # Backlight the room calls for, while active
+        self.state = ACTIVE
+        self.wakes = 0
+        self.time_in = [0.0] * len(stages)
+        self.slept = [0.0] * len(stages)
+        now = time.monotonic()
+        self._last_active = now
+        self._since = now
+        self._next_light = now
+        self._apply()
+
+    def update(self, busy=False, now=None):
+        """Call once a pass of the loop.
+            :param busy: Something is animating, counts as activity
+            :return: True if a touch just woke it from the dark stage
+        """
+        if now is None:
+            now = time.monotonic()
+        woke = False
+        if busy or self.touch_input.last_touch > self._last_active:
+            woke = self.state == DARK and not busy
+            self._last_active = max(now, self.touch_input.last_touch)
+            if self.state != ACTIVE:
+                self.wakes += 1
+                self._enter(ACTIVE, now)
+        else:
+            idle = now - self._last_active
+            state = self.state
+            while state + 1 < len(self.stages) and idle >= self.stages[state + 1][0]:
+                state += 1
+            if state != self.state:
+                self._enter(state, now)
+        if self.light is not None and now >= self._next_light and self.state < DARK:
+            self._next_light = now + LIGHT_PERIOD
+            self._read_light()
+        return woke
+
+    def sleep(self, seconds):
+        """Sleep the loop for ``seconds``, counting it against this stage."""
+        self.slept[self.state] += seconds
+        time.sleep(seconds)
+
+    def _enter(self, state, now):
+        self.time_in[self.state] += now - self._since
+        self._since = now
+        self.state = state
+        self._apply()
+        # A faster rate starts with the next sample, not after a slow one
+        self.touch_input.set_period(self.stages[state][1], now)
+
+    def _apply(self):
+        stage = self.stages[self.state]
+        self.display.brightness = self.ambient * stage[2]
+        self.pixel.brightness = stage[3]
+
+    def _read_light(self):
+        level = (self.light.value - LIGHT_DARK) / (LIGHT_BRIGHT - LIGHT_DARK)
+        level = BACKLIGHT_MIN + (1 - BACKLIGHT_MIN) * min(1.0, max(0.0, level))
+        # Only follow clear changes, so the backlight doesn't flicker
+        if abs(level - self.ambient) > 0.05:
+            self.ambient = level
+            self._apply()
+
+    def report(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        print('Power %s, %d wakes, backlight %.2f' % (
+            STATE_NAMES[self.state], self.wakes, self.display.brightness))
+        for state in range(len(self.stages)):
+            total = self.time_in[state]
+            if state == self.state:
+                total += now - self._since
+            duty = 100 * (1 - self.slept[state] / total) if total else 0
+            print('%-7s %9.1f s, awake %5.1f%%' % (STATE_NAMES[state], total, duty))
@@ -0,0 +1,119 @@
+# * ------------------------------------------------------------
+# The Diceinator - instrumentation
+#
+# Wraps chosen functions to count calls and time them with
+# monotonic_ns, plus the heap used (gc.mem_free() before - after, on
+# the device).  Each call lands in a fixed-size ring buffer that is
+# printed over serial on request.
+#
+# Turned off, nothing is wrapped at all: the app calls its own
+# functions directly, so the probes cost nothing.  Generator
+# functions (animation steps) are timed by the work done in their
+# steps, not the seconds they spend asleep.
+# * ------------------------------------------------------------
+
+import gc
+import time
+from array import array
+
+_has_mem_free = hasattr(gc, "mem_free")
+
+
+class Probe:
+    """Call counts, times and heap use of wrapped functions.
+        :param size: Calls kept in the ring buffer
+    """
+
+    def __init__(self, size=128):
+        self.names = []
+        self.calls = []         # Per name
+        self.total_us = []
+        self.worst_us = []
+        self.size = size
+        self.count = 0          # Calls recorded, ever
+        self._ids = bytearray(size)
+        self._stamp = array("L", [0] * size)    # ms, wraps after 49 days
+        self._us = array("l", [0] * size)
+        self._heap = array("l", [0] * size)
+
+    def wrap(self, name, func):
+        """``func`` with every call recorded under ``name``."""
+        n = self._id(name)
+
+        def probed(*args, **kwargs):
+            heap = gc.mem_free() if _has_mem_free else 0
+            t = time.monotonic_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._record(n, t, time.monotonic_ns() - t,
+                             heap - gc.mem_free() if _has_mem_free else 0)
+        return probed
+
+    def wrap_gen(self, name, func):
+        """Generator function ``func`` with each run recorded under ``name``."""
+        n = self._id(name)
+
+        def probed(*args, **kwargs):
+            return self._timed(n, func(*args, **kwargs))
+        return probed
+
+    def _timed(self, n, gen):
+        busy = 0
+        heap = 0
+        start = time.monotonic_ns()
+        try:
+            while True:
+                free = gc.mem_free() if _has_mem_free else 0
+                t = time.monotonic_ns()
+                try:
+                    value = next(gen)
+                except StopIteration:
+                    return
+                finally:
+                    busy += time.monotonic_ns() - t
+                    if _has_mem_free:
+                        heap += free - gc.mem_free()
+                yield value
+        finally:
+            gen.close()
+            self._record(n, start, busy, heap)
+
+    def _id(self, name):
+        if name not in self.names:
+            self.names.append(name)
+            self.calls.append(0)
+            self.total_us.append(0)
+            self.worst_us.append(0)
+        return self.names.index(name)
+
+    def _record(self, n, start_ns, elapsed_ns, heap):
+        us = elapsed_ns // 1000
+        self.calls[n] += 1
+        self.total_us[n] += us
+        if us > self.worst_us[n]:
+            self.worst_us[n] = us
+        i = self.count % self.size
+        self._ids[i] = n
+        self._stamp[i] = (start_ns // 1000000) & 0xFFFFFFFF
+        self._us[i] = us
+        self._heap[i] = heap
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+        for n in range(len(self.names)):
+            self.calls[n] = 0
+            self.total_us[n] = 0
+            self.worst_us[n] = 0
+
+    def dump(self):
+        """Print the totals, then the calls in the ring, oldest first, as CSV."""
+        print('name,calls,total_us,worst_us')
+        for n, name in enumerate(self.names):
+            print('%s,%d,%d,%d' % (name, self.calls[n], self.total_us[n], self.worst_us[n]))
+        print('ms,name,us,heap')
+        for k in range(max(0, self.count - self.size), self.count):
+            i = k % self.size
+            print('%d,%s,%d,%d' % (self._stamp[i], self.names[self._ids[i]],
+                                   self._us[i], self._heap[i]))
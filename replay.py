@@ -0,0 +1,245 @@
+# * ------------------------------------------------------------
+# The Diceinator - session record and replay
+#
+# The recorder keeps every touch event (PRESS, HOLD, RELEASE and
+# where) with its time, plus what is needed to start over from the
+# same place: both dice seeds and how many faces they had drawn, the
+# view, dice and armies.  The replayer feeds the events back through
+# the loop's normal dispatch, in real time or with the idle gaps
+# left out, and times each one from dispatch to the screen refresh
+# that follows.  A game night recorded at the table replays the same
+# way on the simulator or on another build.
+#
+# File, little endian: header "<4sBBBBIIIIHH"
+#   magic       b"DREC"
+#   version     1
+#   view, att dice, def dice
+#   seed, draws             of the dice pool
+#   shake seed, shake draws of the shake animation's pool
+#   att armies, def armies
+# then one "<IBHH" per event: ms since the recording started, kind, x, y
+# * ------------------------------------------------------------
+
+import struct
+import time
+from array import array
+
+MAGIC = b"DREC"
+VERSION = 1
+HEADER = "<4sBBBBIIIIHH"
+HEADER_SIZE = struct.calcsize(HEADER)
+EVENT = "<IBHH"
+EVENT_SIZE = struct.calcsize(EVENT)
+RECORDING_NAME = "session.rec"
+
+KEPT = 2000     # Events whose latency is kept for the report
+
+
+class SessionStart:
+    """Where a recording starts; the app restores this before a replay."""
+
+    def __init__(self, view, att_dice, def_dice, seed, draws, shake_seed, shake_draws,
+                 att_armies, def_armies):
+        self.view = view
+        self.att_dice = att_dice
+        self.def_dice = def_dice
+        self.seed = seed
+        self.draws = draws
+        self.shake_seed = shake_seed
+        self.shake_draws = shake_draws
+        self.att_armies = att_armies
+        self.def_armies = def_armies
+
+
+class Recorder:
+    """Touch events to ``path``, buffered and appended between rolls.
+        :param path: File to write, replaced
+        :param start: SessionStart of the app right now
+        :param batch: Events buffered before a flush is due
+        :param max_age: Seconds a buffered event may wait for a flush
+    """
+
+    def __init__(self, path, start, batch=32, max_age=10):
+        self.path = path
+        self.batch = batch
+        self.max_age = max_age
+        self.count = 0
+        self.write_errors = 0
+        self.started = time.monotonic()
+        self._buf = bytearray(EVENT_SIZE * batch)
+        self._pending = 0
+        self._oldest = None
+        try:
+            with open(path, "wb") as f:
+                f.write(struct.pack(HEADER, MAGIC, VERSION, start.view, start.att_dice,
+                                    start.def_dice, start.seed, start.draws, start.shake_seed,
+                                    start.shake_draws, start.att_armies, start.def_armies))
+        except OSError as e:
+            self._failed(e)
+
+    def add(self, kind, x, y, now=None):
+        if now is None:
+            now = time.monotonic()
+        if self._pending == self.batch:
+            self.flush()
+            if self._pending == self.batch:
+                return      # Can't write, keep the start of the session
+        t = int((now - self.started) * 1000)
+        struct.pack_into(EVENT, self._buf, self._pending * EVENT_SIZE, t, kind, x, y)
+        self._pending += 1
+        self.count += 1
+        if self._oldest is None:
+            self._oldest = now
+
+    def flush_due(self, now=None):
+        if self.path is None or not self._pending:
+            return False
+        if self._pending >= self.batch:
+            return True
+        if now is None:
+            now = time.monotonic()
+        return now - self._oldest >= self.max_age
+
+    def flush(self):
+        if self.path is None or not self._pending:
+            return
+        try:
+            with open(self.path, "ab") as f:
+                f.write(memoryview(self._buf)[:self._pending * EVENT_SIZE])
+        except OSError as e:
+            self._failed(e)
+            return
+        self._pending = 0
+        self._oldest = None
+
+    def _failed(self, e):
+        self.write_errors += 1
+        print('Recording to %s failed: %s' % (self.path, e))
+        self.path = None
+
+
+def read_start(path):
+    """The SessionStart at the head of a recording."""
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise ValueError("not a recording")
+    fields = struct.unpack(HEADER, header)
+    if fields[0] != MAGIC or fields[1] != VERSION:
+        raise ValueError("not a recording")
+    return SessionStart(*fields[2:])
+
+
+def read_events(path):
+    """Yield (ms, kind, x, y) for each event, one record read at a time."""
+    buf = bytearray(EVENT_SIZE)
+    with open(path, "rb") as f:
+        f.seek(HEADER_SIZE)
+        while f.readinto(buf) == EVENT_SIZE:
+            yield struct.unpack(EVENT, buf)
+
+
+class Replayer:
+    """Recorded events, handed out like TouchInput.get() once due.
+        :param path: The recording
+        :param fast: Skip the time between events while nothing is running
+    """
+
+    def __init__(self, path, fast=False):
+        self.path = path
+        self.fast = fast
+        self.start = read_start(path)
+        self.x = 0
+        self.y = 0
+        self.count = 0          # Events dispatched
+        self.lag = array("H", [])       # ms late, per event, up to KEPT
+        self.latency = array("H", [])   # ms from dispatch to refreshed, per event
+        self.total_latency = 0
+        self.worst = 0
+        self._events = read_events(path)
+        self._next = None
+        self._due = 0
+        self._waiting = 0       # Dispatched this pass, not yet refreshed
+        self._dispatched = 0
+        self.started = time.monotonic()     # Event times count from here
+        self.began = self.started
+        self.finished = None
+        self._load()
+
+    @property
+    def done(self):
+        return self._next is None
+
+    def _load(self):
+        try:
+            self._next = next(self._events)
+        except StopIteration:
+            self._next = None
+            return
+        self._due = self.started + self._next[0] / 1000
+
+    def skip_idle(self, now=None):
+        """Fast mode: nothing is running, so bring the next event forward."""
+        if not self.fast or self._next is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        if self._due > now:
+            self.started -= self._due - now
+            self._due = now
+
+    def sleep_time(self, now=None):
+        """Seconds until the next event is due, or None when there are no more."""
+        if self._next is None:
+            return None
+        if now is None:
+            now = time.monotonic()
+        return max(0, self._due - now)
+
+    def get(self, now=None):
+        """The next event if it is due: PRESS, HOLD, RELEASE or 0 for none."""
+        if self._next is None:
+            return 0
+        if now is None:
+            now = time.monotonic()
+        if now < self._due:
+            return 0
+        _t, kind, self.x, self.y = self._next
+        if self.count < KEPT:
+            self.lag.append(min(65535, int((now - self._due) * 1000)))
+        self.count += 1
+        self._waiting += 1
+        self._dispatched = now
+        self._load()
+        return kind
+
+    def refreshed(self, now=None):
+        """Call after the screen refresh that follows a dispatch, or once
+        a pass of the loop; finished is set once every event is done."""
+        if now is None:
+            now = time.monotonic()
+        if self._waiting:
+            ms = min(65535, int((now - self._dispatched) * 1000))
+            for _ in range(self._waiting):
+                if len(self.latency) < KEPT:
+                    self.latency.append(ms)
+                self.total_latency += ms
+            self.worst = max(self.worst, ms)
+            self._waiting = 0
+        if self._next is None and self.finished is None:
+            self.finished = now
+
+    def report(self, events=True):
+        """Per-event latency (as far as KEPT), then the totals."""
+        if events:
+            print('n,ms,kind,x,y,lag_ms,latency_ms')
+            n = 0
+            for t, kind, x, y in read_events(self.path):
+                if n >= len(self.latency):
+                    break
+                print('%d,%d,%d,%d,%d,%d,%d' % (n, t, kind, x, y, self.lag[n], self.latency[n]))
+                n += 1
+        took = (self.finished or time.monotonic()) - self.began
+        print('Replayed %d events in %.1f s (%s), latency mean %.1f ms, worst %d ms' % (
+            self.count, took, "fast" if self.fast else "real time",
+            self.total_latency / self.count if self.count else 0, self.worst))
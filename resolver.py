@@ -0,0 +1,101 @@
+# * ------------------------------------------------------------
+# The Diceinator - round resolver
+#
+# Settles one round of Risk dice in buffers allocated once, so a
+# round makes no garbage: faces come from a DicePool, a fixed
+# sorting network orders them, and the result is left in attributes.
+# * ------------------------------------------------------------
+
+import gc
+from dice_rng import DicePool
+
+ATT_WIN = 1
+DEF_WIN = 2
+
+
+class RoundResolver:
+    """One round of up to 3 attack and 2 defend dice, rolled from ``dice``.
+    After resolve():
+        att_order / def_order: die numbers, highest face first
+        winners[k]: ATT_WIN or DEF_WIN for pair k (0 = hi, 1 = lo)
+        pairs, att_loss, def_loss
+    """
+
+    def __init__(self, dice):
+        self.dice = dice
+        self.att = bytearray(3)         # Faces by die number
+        self.defend = bytearray(2)
+        self.att_order = bytearray(3)
+        self.def_order = bytearray(2)
+        self.winners = bytearray(2)
+        self.pairs = 0
+        self.att_loss = 0
+        self.def_loss = 0
+
+    def roll(self, att_dice, def_dice):
+        """Take the faces for a round from the dice pool."""
+        faces = self.dice.faces
+        first = self.dice.take(att_dice + def_dice)
+        for i in range(att_dice):
+            self.att[i] = faces[first + i]
+        first += att_dice
+        for i in range(def_dice):
+            self.defend[i] = faces[first + i]
+
+    def resolve(self, att_dice, def_dice):
+        """Pair the dice high to high, ties to the defender."""
+        att = self.att
+        order = self.att_order
+        order[0] = 0
+        order[1] = 1
+        order[2] = 2
+        # Sorting network, highest first.  Only swapping on a strictly
+        # higher face keeps equal faces in die order, like sorted().
+        if att_dice > 1:
+            if att[order[1]] > att[order[0]]:
+                order[0], order[1] = order[1], order[0]
+            if att_dice > 2:
+                if att[order[2]] > att[order[1]]:
+                    order[1], order[2] = order[2], order[1]
+                if att[order[1]] > att[order[0]]:
+                    order[0], order[1] = order[1], order[0]
+        defend = self.defend
+        dorder = self.def_order
+        dorder[0] = 0
+        dorder[1] = 1
+        if def_dice > 1 and defend[1] > defend[0]:
+            dorder[0] = 1
+            dorder[1] = 0
+
+        self.pairs = 2 if att_dice > 1 and def_dice > 1 else 1
+        self.att_loss = 0
+        self.def_loss = 0
+        for k in range(self.pairs):
+            if att[order[k]] > defend[dorder[k]]:
+                self.winners[k] = ATT_WIN
+                self.def_loss += 1
+            else:
+                self.winners[k] = DEF_WIN
+                self.att_loss += 1
+        if self.pairs == 1:
+            self.winners[1] = 0     # No lo pair, no winner
+
+    def roll_and_resolve(self, att_dice, def_dice):
+        self.roll(att_dice, def_dice)
+        self.resolve(att_dice, def_dice)
+
+
+def allocation_check(rounds=100):
+    """Bytes of heap used by ``rounds`` resolved rounds (expect 0).
+    Needs gc.mem_free(), so returns None off the device.
+    """
+    if not hasattr(gc, "mem_free"):
+        return None
+    resolver = RoundResolver(DicePool(log=False))
+    resolver.roll_and_resolve(3, 2)     # First call can warm caches
+    gc.collect()
+    before = gc.mem_free()
+    for i in range(rounds):
+        resolver.roll_and_resolve(3, 2)
+    after = gc.mem_free()
+    return before - after
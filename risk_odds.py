@@ -0,0 +1,184 @@
+# * ------------------------------------------------------------
+# The Diceinator - battle odds
+#
+# Exact Risk battle outcomes, from the single-round dice tables up
+# to whole battles between two army stacks.
+#
+# Armies here are the armies actually attacking or defending: an
+# attacker with a stack of 10 and one left behind attacks with 9.
+# Each round the attacker rolls min(3, att) dice and the defender
+# min(2, def); the battle ends when either side reaches zero.
+# * ------------------------------------------------------------
+
+from array import array
+
+# ------------- Single round tables ---------- #
+# (att dice, def dice): (outcomes, ((att loss, def loss, outcome count), ...))
+# Counted over every face combination; ties go to the defender.
+ROUND_ODDS = {
+    (1, 1): (36, ((0, 1, 15), (1, 0, 21))),
+    (1, 2): (216, ((0, 1, 55), (1, 0, 161))),
+    (2, 1): (216, ((0, 1, 125), (1, 0, 91))),
+    (2, 2): (1296, ((0, 2, 295), (1, 1, 420), (2, 0, 581))),
+    (3, 1): (1296, ((0, 1, 855), (1, 0, 441))),
+    (3, 2): (7776, ((0, 2, 2890), (1, 1, 2611), (2, 0, 2275))),
+}
+
+# Same tables as probabilities, (att loss, def loss, probability)
+_ROUND = {}
+for _key, (_total, _rows) in ROUND_ODDS.items():
+    _ROUND[_key] = tuple((al, dl, n / _total) for al, dl, n in _rows)
+
+
+def round_odds(att_dice, def_dice):
+    """Return ((att loss, def loss, probability), ...) for one round."""
+    return _ROUND[(att_dice, def_dice)]
+
+
+# ------------- Whole battles ---------------- #
+class BattleOdds:
+    """Outcome distribution of a battle fought to the end.
+
+    att_left[k] is the chance the attacker wins with k armies left,
+    def_left[k] the chance the defender holds with k armies left.
+    """
+
+    def __init__(self, att, defend, att_left, def_left):
+        self.att = att
+        self.defend = defend
+        self.att_left = att_left
+        self.def_left = def_left
+        self.win = sum(att_left)
+
+    @property
+    def expected_att_losses(self):
+        left = 0
+        for k in range(len(self.att_left)):
+            left += k * self.att_left[k]
+        return self.att - left
+
+    @property
+    def expected_def_losses(self):
+        left = 0
+        for k in range(len(self.def_left)):
+            left += k * self.def_left[k]
+        return self.defend - left
+
+
+CACHE_SIZE = 48         # Battles kept, least recently used goes first
+_cache = {}
+_cache_order = []
+
+
+def battle(att, defend):
+    """Exact outcome of ``att`` armies attacking ``defend`` armies.
+
+    Results are memoized, so asking again is a dictionary lookup.
+    The first query walks every reachable (att, def) state once,
+    O(att * def) time and O(att + def) memory.
+        :param att: Attacking armies
+        :param defend: Defending armies
+    """
+    for odds in battle_steps(att, defend):
+        pass
+    return odds
+
+
+def battle_steps(att, defend):
+    """Generator form of battle() for big armies.
+
+    Yields None after each slice of work so the caller can keep the
+    touch loop going, then yields the BattleOdds as its last value.
+    """
+    key = (att, defend)
+    odds = _cache.get(key)
+    if odds is not None:
+        if _cache_order[-1] != key:
+            _cache_order.remove(key)
+            _cache_order.append(key)
+    else:
+        att_left = array("f", [0] * (att + 1))
+        def_left = array("f", [0] * (defend + 1))
+        for _ in _propagate(att, defend, att_left, def_left):
+            yield None
+        odds = BattleOdds(att, defend, att_left, def_left)
+        if key not in _cache:   # Another task may have got there first
+            if len(_cache_order) >= CACHE_SIZE:
+                del _cache[_cache_order.pop(0)]
+            _cache[key] = odds
+            _cache_order.append(key)
+    yield odds
+
+
+def _propagate(att, defend, att_left, def_left):
+    # Push probability mass from (att, defend) towards the edges.  Every
+    # round removes one or two armies in total, so states are visited one
+    # anti-diagonal (a + d == s) at a time and only three are live at once.
+    if att <= 0 or defend <= 0:
+        if att > 0:
+            att_left[att] = 1.0
+        else:
+            def_left[max(defend, 0)] = 1.0
+        return
+    rows = [array("f", [0] * (att + 1)) for _ in range(3)]
+    rows[(att + defend) % 3][att] = 1.0
+    for s in range(att + defend, 1, -1):
+        cur = rows[s % 3]
+        for a in range(max(1, s - defend), min(att, s - 1) + 1):
+            p = cur[a]
+            if not p:
+                continue
+            cur[a] = 0
+            d = s - a
+            for al, dl, q in _ROUND[(a if a < 3 else 3, d if d < 2 else 2)]:
+                na = a - al
+                nd = d - dl
+                if nd == 0:
+                    att_left[na] += p * q
+                elif na == 0:
+                    def_left[nd] += p * q
+                else:
+                    rows[(na + nd) % 3][na] += p * q
+        yield
+
+
+def clear_cache():
+    _cache.clear()
+    del _cache_order[:]
+
+
+# ------------- Common range table ----------- #
+TABLE_SIZE = 30         # Armies per side covered by the packed table
+_win_table = None
+
+
+def _build_win_table():
+    # P(win) for every (a, d) up to TABLE_SIZE, bottom-up in float rows,
+    # stored as 16 bit fractions of 65535 (about 1.9 KB).
+    n = TABLE_SIZE + 1
+    table = array("H", [0] * (n * n))
+    rows = [array("f", [0] * n) for _ in range(3)]
+    for a in range(n):
+        row = rows[a % 3]
+        for d in range(n):
+            if d == 0:
+                p = 1.0 if a else 0.0
+            elif a == 0:
+                p = 0.0
+            else:
+                p = 0.0
+                for al, dl, q in _ROUND[(a if a < 3 else 3, d if d < 2 else 2)]:
+                    p += q * rows[(a - al) % 3][d - dl]
+            row[d] = p
+            table[a * n + d] = int(p * 65535 + 0.5)
+    return table
+
+
+def win_probability(att, defend):
+    """Chance that ``att`` armies eventually take ``defend``'s territory."""
+    global _win_table
+    if att <= TABLE_SIZE and defend <= TABLE_SIZE:
+        if _win_table is None:
+            _win_table = _build_win_table()
+        return _win_table[att * (TABLE_SIZE + 1) + defend] / 65535
+    return battle(att, defend).win
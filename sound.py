@@ -0,0 +1,148 @@
+# * ------------------------------------------------------------
+# The Diceinator - sound
+#
+# Each wav is decoded once into a RAM buffer of 8 bit mono samples,
+# averaged down to about 11 kHz, so the roll sound fits in about
+# 25 KB instead of streaming 400 KB from flash on every roll.  Sounds
+# play on one AudioOut voice without waiting, so a beep costs a tap
+# nothing and the dice animation keeps its own time.
+#
+# Decoding is a generator, one chunk per step, so it can run as a
+# background task after boot.  Playing a sound that is not decoded
+# yet finishes the job first.
+# * ------------------------------------------------------------
+
+import struct
+from array import array
+
+try:
+    import audioio
+    import audiocore
+except ImportError:
+    audioio = None      # No DAC, sounds are skipped
+
+TARGET_RATE = 11025     # Output rate the wavs are averaged down to
+CHUNK = 512             # Input samples read per decode step
+
+
+class Sound:
+    """A PCM wav, decoded into RAM on first use or by load_steps().
+        :param path: The wav file
+        :param rate: Rough sample rate to keep
+    """
+
+    def __init__(self, path, rate=TARGET_RATE):
+        self.path = path
+        self.rate = rate
+        self.samples = None     # array('B') once decoded
+        self.sample = None      # audiocore.RawSample over the samples
+        self._loader = None
+
+    @property
+    def loaded(self):
+        return self.sample is not None
+
+    def load(self):
+        """Decode the rest of the file now."""
+        for _ in self.load_steps():
+            pass
+
+    def load_steps(self):
+        """Decode one chunk per step (yield = next pass)."""
+        if self._loader is None:
+            self._loader = self._decode()
+        # Shared, so a task and a play() both finishing it is fine
+        for _ in self._loader:
+            yield
+
+    def _decode(self):
+        with open(self.path, "rb") as f:
+            channels, in_rate, bits, size = _read_header(f)
+            step = max(1, round(in_rate / self.rate))
+            group = step * channels     # Input samples per output sample
+            width = bits // 8
+            count = size // (width * group)
+            out = array("B", bytes(count))
+            # Whole output samples per read, so a group never spans two
+            buf = array("h" if width == 2 else "B", [0] * max(group, CHUNK - CHUNK % group))
+            shift = 8 if width == 2 else 0
+            offset = 128 if width == 2 else 0
+            o = 0
+            left = count * group
+            while left:
+                n = f.readinto(buf) // width
+                n = min(n - n % group, left)    # Drops a torn end of file
+                if not n:
+                    break
+                for i in range(0, n, group):
+                    total = 0
+                    for j in range(i, i + group):
+                        total += buf[j]
+                    out[o] = ((total // group) >> shift) + offset
+                    o += 1
+                left -= n
+                yield
+        self.samples = out
+        if audioio is not None:
+            self.sample = audiocore.RawSample(out, sample_rate=in_rate // step)
+        else:
+            self.sample = out
+        print('%s: %d samples at %d Hz' % (self.path, o, in_rate // step))
+
+
+def _read_header(f):
+    # Walk the RIFF chunks to "fmt " and "data"; returns
+    # (channels, sample rate, bits per sample, data bytes)
+    if f.read(12)[8:12] != b"WAVE":
+        raise ValueError("not a wav file")
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            raise ValueError("no data chunk")
+        name, size = struct.unpack("<4sI", chunk)
+        if name == b"fmt ":
+            fmt = struct.unpack("<HHIIHH", f.read(16))
+            f.seek(size - 16, 1)
+        elif name == b"data":
+            if fmt is None or fmt[0] != 1 or fmt[5] not in (8, 16):
+                raise ValueError("not 8 or 16 bit PCM")
+            return fmt[1], fmt[2], fmt[5], size
+        else:
+            f.seek(size + (size & 1), 1)
+
+
+class Voice:
+    """One sound at a time, played without waiting.
+        :param audio: The AudioOut to play on; PyPortal already owns the
+            one on board.AUDIO_OUT, so pass pyportal.audio
+        :param enable: Speaker enable DigitalInOut, switched on once
+    """
+
+    def __init__(self, audio, enable=None):
+        self.audio = audio if audioio is not None else None
+        self.current = None
+        self.plays = 0
+        if enable is not None:
+            enable.value = True
+
+    @property
+    def playing(self):
+        return self.audio is not None and self.audio.playing
+
+    def play(self, sound):
+        """Start ``sound``, cutting off whatever was playing."""
+        if self.audio is None:
+            return
+        if not sound.loaded:
+            sound.load()
+        if self.audio.playing:
+            self.audio.stop()
+        self.audio.play(sound.sample)
+        self.current = sound
+        self.plays += 1
+
+    def stop(self, sound=None):
+        """Stop playing, or only if ``sound`` is the one playing."""
+        if self.playing and (sound is None or sound is self.current):
+            self.audio.stop()
@@ -0,0 +1,79 @@
+# * ------------------------------------------------------------
+# The Diceinator - cooperative tasks
+#
+# A tiny generator-based scheduler so animations can run without
+# blocking the touch loop.  A task is a generator that yields the
+# number of seconds it wants to sleep (None means "next pass").
+# Cancelling a task closes its generator, so any ``finally:`` block
+# in it runs straight away and can put the screen in its end state.
+# * ------------------------------------------------------------
+
+import time
+
+
+class Task:
+    def __init__(self, gen, name, draws=True):
+        self.gen = gen
+        self.name = name
+        self.draws = draws      # Its steps may change the screen
+        self.wake = 0
+        self.done = False
+
+
+class Scheduler:
+    def __init__(self):
+        self.tasks = []
+        self.max_gap = 0        # Worst time between run() calls while busy
+        self._last_run = None
+
+    def add(self, gen, name=None, draws=True):
+        """Start ``gen`` on the next run() and return its Task.
+            :param draws: False for a task that never changes the screen
+        """
+        task = Task(gen, name, draws)
+        task.wake = time.monotonic()
+        self.tasks.append(task)
+        return task
+
+    def cancel(self, task):
+        """Close ``task``; a finished task or None is ignored."""
+        if task is not None and task in self.tasks:
+            self.tasks.remove(task)
+            task.done = True
+            task.gen.close()
+
+    def run(self, now=None):
+        """Step every task whose sleep has run out.
+            :return: True if a task that draws was stepped
+        """
+        drew = False
+        if now is None:
+            now = time.monotonic()
+        if self.tasks and self._last_run is not None:
+            self.max_gap = max(self.max_gap, now - self._last_run)
+        self._last_run = now if self.tasks else None
+        for task in list(self.tasks):
+            if task.wake > now:
+                continue
+            drew = drew or task.draws
+            try:
+                delay = next(task.gen)
+            except StopIteration:
+                self.tasks.remove(task)
+                task.done = True
+                continue
+            task.wake = now + (delay or 0)
+        return drew
+
+    def sleep_time(self, now=None):
+        """Seconds until the next task wants to run, or None if idle."""
+        if not self.tasks:
+            return None
+        if now is None:
+            now = time.monotonic()
+        return max(0, min(task.wake for task in self.tasks) - now)
+
+    def reset_latency(self):
+        worst = self.max_gap
+        self.max_gap = 0
+        return worst
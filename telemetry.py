@@ -0,0 +1,230 @@
+# * ------------------------------------------------------------
+# The Diceinator - roll telemetry
+#
+# Sends the rounds in the roll journal to a collector on the local
+# network, in batches, over the PyPortal's ESP32 WiFi.  It runs as a
+# background task: joining WiFi, opening the connection and waiting
+# for the collector's ack are each polled between passes of the loop,
+# never waited on in one call, and nothing is sent while the dice are
+# rolling.  One TCP connection is kept open and reused; after a
+# failure it is dropped and retried later, waiting twice as long each
+# time.
+#
+# Rounds are read straight out of the journal, so there is no second
+# queue: from its RAM ring, or from its file once the ring has come
+# round.  Without a file, anything not sent before the ring comes
+# round is counted as lost.
+#
+# Batch: header "<4sBBHII", then ``count`` journal records
+#   magic   b"DTEL"
+#   version 1
+#   flags   0
+#   count   uint16  records that follow
+#   device  uint32  low 4 bytes of the ESP32 MAC address
+#   seq     uint32  batch number, from 0 at boot
+# The collector answers "<4sI": b"DACK" and the batch number.
+# * ------------------------------------------------------------
+
+import struct
+import time
+from journal import RECORD_SIZE
+
+try:
+    from adafruit_esp32spi import adafruit_esp32spi
+    import adafruit_esp32spi.adafruit_esp32spi_socket as socket
+except ImportError:
+    adafruit_esp32spi = None    # No WiFi co-processor, telemetry stays off
+
+MAGIC = b"DTEL"
+ACK_MAGIC = b"DACK"
+VERSION = 1
+HEADER = "<4sBBHII"
+HEADER_SIZE = struct.calcsize(HEADER)
+ACK = "<4sI"
+ACK_SIZE = struct.calcsize(ACK)
+PORT = 5741
+
+JOIN_TIMEOUT = 20       # Seconds to wait for the access point
+CONNECT_TIMEOUT = 3     # Seconds to wait for the collector to accept
+ACK_TIMEOUT = 5         # Seconds to wait for the collector's answer
+BACKOFF_FIRST = 2       # Seconds before the first retry
+BACKOFF_MAX = 300
+
+
+class Telemetry:
+    """Batches the journal's rounds to a collector over WiFi.
+        :param esp: The ESP_SPIcontrol, e.g. the PyPortal's
+        :param journal: The roll Journal to send from
+        :param settings: The secrets dict: ssid, password, telemetry_host
+            and optionally telemetry_port
+        :param idle: Called before sending, False while the dice are rolling
+        :param batch: Rounds that make a batch due
+        :param max_age: Seconds a round may wait for a batch
+    """
+
+    def __init__(self, esp, journal, settings, idle=None, batch=32, max_age=60):
+        self.esp = esp
+        self.journal = journal
+        self.ssid = settings["ssid"]
+        self.password = settings["password"]
+        self.host = settings["telemetry_host"]
+        self.port = int(settings.get("telemetry_port", PORT))
+        self.idle = idle
+        self.batch = min(batch, journal.capacity)
+        self.max_age = max_age
+        self.device = struct.unpack_from("<I", bytes(esp.MAC_address))[0]
+        self.sent = 0           # Journal records sent, or lost
+        self.records = 0        # Records the collector has acked
+        self.seq = 0
+        self.lost = 0           # Overwritten in the ring before they were sent
+        self.batches = 0
+        self.bytes_sent = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_send = 0      # Seconds from connect to ack for the last batch
+        self.started = time.monotonic()
+        self._sock = None
+        self._backoff = BACKOFF_FIRST
+        self._oldest = None
+        self._buf = bytearray(HEADER_SIZE + RECORD_SIZE * self.batch)
+        self._first = 0         # First record of the batch in _buf
+        self._unacked = None    # Records in _buf not acked yet, sent again as they are
+
+    @property
+    def depth(self):
+        """Rounds waiting to be sent."""
+        self._check_lost()
+        return self.journal.count - self.sent
+
+    @property
+    def rate(self):
+        """Records sent per second since boot."""
+        t = time.monotonic() - self.started
+        return self.records / t if t > 0 else 0
+
+    def _check_lost(self):
+        # A batch waiting for its ack is safe in the send buffer
+        safe = self.sent if self._unacked is None else self._first + self._unacked
+        behind = self.journal.oldest - safe
+        if behind > 0:
+            self.lost += behind
+            self.sent = safe + behind
+
+    def _due(self, now):
+        if self._unacked is not None:
+            return True
+        depth = self.depth
+        if not depth:
+            self._oldest = None
+            return False
+        if self._oldest is None:
+            self._oldest = now
+        return depth >= self.batch or now - self._oldest >= self.max_age
+
+    def steps(self):
+        """The background task (yield = seconds to wait)."""
+        while True:
+            if not self._due(time.monotonic()) or (self.idle and not self.idle()):
+                yield 1
+                continue
+            ok = False
+            try:
+                for wait in self._send_batch():
+                    yield wait
+                ok = True
+            except (OSError, RuntimeError, ValueError) as e:
+                self.failures += 1
+                self.last_error = str(e)
+                self._close()
+            if ok:
+                self._backoff = BACKOFF_FIRST
+            else:
+                print('Telemetry failed (%s), retry in %d s' % (self.last_error, self._backoff))
+                yield self._backoff
+                self._backoff = min(BACKOFF_MAX, self._backoff * 2)
+
+    def _send_batch(self):
+        start = time.monotonic()
+        if self.esp.status != adafruit_esp32spi.WL_CONNECTED:
+            for wait in self._join():
+                yield wait
+        if self._sock is None:
+            socket.set_interface(self.esp)
+            sock = socket.socket()
+            sock.settimeout(ACK_TIMEOUT)
+            self._sock = sock
+            # Not sock.connect(): that polls the ESP32 for up to 3 s in one
+            # call.  Start the connection and poll it a step at a time.
+            self.esp.socket_open(sock._socknum, self.host, self.port, self.esp.TCP_MODE)
+            give_up = time.monotonic() + CONNECT_TIMEOUT
+            while not self.esp.socket_connected(sock._socknum):
+                if time.monotonic() > give_up:
+                    raise RuntimeError("can't connect to %s:%d" % (self.host, self.port))
+                yield 0.05
+        if self._unacked is None:
+            self._first, self._unacked = self._pack()
+        first = self._first
+        count = self._unacked
+        self._sock.send(self._buf[:HEADER_SIZE + count * RECORD_SIZE])
+        # Wait for the ack a step at a time
+        give_up = time.monotonic() + ACK_TIMEOUT
+        while self._sock.available() < ACK_SIZE:
+            if time.monotonic() > give_up:
+                raise RuntimeError("no ack")
+            yield 0.05
+        ack = self._sock.recv(ACK_SIZE)
+        if len(ack) != ACK_SIZE:
+            raise RuntimeError("short ack")
+        magic, seq = struct.unpack(ACK, ack)
+        if magic != ACK_MAGIC or seq != self.seq:
+            raise RuntimeError("bad ack")
+        # Records lost while waiting have moved sent on already
+        self.sent = max(self.sent, first + count)
+        self._unacked = None
+        self.records += count
+        self.seq += 1
+        self.batches += 1
+        self.bytes_sent += HEADER_SIZE + count * RECORD_SIZE
+        self.last_send = time.monotonic() - start
+        self._oldest = None
+
+    def _join(self):
+        ssid = self.ssid
+        password = self.password
+        if isinstance(ssid, str):
+            ssid = bytes(ssid, "utf-8")
+        if isinstance(password, str):
+            password = bytes(password, "utf-8")
+        self._close()
+        self.esp.wifi_set_passphrase(ssid, password)
+        give_up = time.monotonic() + JOIN_TIMEOUT
+        while self.esp.status != adafruit_esp32spi.WL_CONNECTED:
+            if time.monotonic() > give_up:
+                raise RuntimeError("can't join %s" % self.ssid)
+            yield 0.25
+
+    def _pack(self):
+        # Header and the oldest unsent records into the one send buffer
+        self._check_lost()
+        journal = self.journal
+        count = min(self.batch, journal.count - self.sent)
+        struct.pack_into(HEADER, self._buf, 0, MAGIC, VERSION, 0, count, self.device, self.seq)
+        journal.copy_records(self.sent, count, self._buf, HEADER_SIZE)
+        return self.sent, count
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except (OSError, RuntimeError):
+                pass
+            self._sock = None
+
+    def report(self):
+        print('Telemetry to %s:%d, %d batches, %d bytes, %.2f rounds/s' % (
+            self.host, self.port, self.batches, self.bytes_sent, self.rate))
+        print('Queue %d of %d, %d lost, %d failures%s' % (
+            self.depth, self.journal.capacity, self.lost, self.failures,
+            ", last: " + self.last_error if self.last_error else ""))
+        if self.batches:
+            print('Last batch sent in %.3f s' % self.last_send)
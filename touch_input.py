@@ -0,0 +1,138 @@
+# * ------------------------------------------------------------
+# The Diceinator - touch input
+#
+# Samples the touchscreen at a fixed rate, filters out jitter and
+# drop-outs, and turns the finger into PRESS / HOLD / RELEASE events
+# in a small fixed-size queue.  The loop sleeps between samples
+# instead of spinning on ts.touch_point until the finger lifts.
+# * ------------------------------------------------------------
+
+import time
+from array import array
+
+PRESS = 1
+HOLD = 2        # Repeats every hold_repeat seconds while held
+RELEASE = 3
+
+
+class TouchInput:
+    """Debounced touch events from an adafruit_touchscreen.Touchscreen.
+        :param ts: The touchscreen
+        :param period: Seconds between samples
+        :param press_samples: Touched samples in a row for a PRESS
+        :param release_samples: Untouched samples in a row for a RELEASE
+        :param jitter: Pixels a finger may wander while pressing down
+        :param hold_time: Seconds held before the first HOLD
+        :param hold_repeat: Seconds between HOLD repeats
+        :param queue_size: Events kept before new ones are dropped
+    """
+
+    def __init__(self, ts, period=0.02, press_samples=2, release_samples=2,
+                 jitter=8, hold_time=0.6, hold_repeat=0.15, queue_size=16):
+        self.ts = ts
+        self.period = period
+        self.press_samples = press_samples
+        self.release_samples = release_samples
+        self.jitter = jitter
+        self.hold_time = hold_time
+        self.hold_repeat = hold_repeat
+        self.down = False
+        self.dropped = 0
+        self.last_touch = 0     # time.monotonic() of the last touched sample
+        # Where the current event happened, set by get()
+        self.x = 0
+        self.y = 0
+        self._x = 0
+        self._y = 0
+        self._hits = 0
+        self._misses = 0
+        self._next_sample = 0
+        self._next_hold = 0
+        # Event ring buffer
+        self._kinds = bytearray(queue_size)
+        self._xs = array("H", [0] * queue_size)
+        self._ys = array("H", [0] * queue_size)
+        self._head = 0
+        self._count = 0
+
+    def poll(self, now=None):
+        """Take a sample if one is due.  Call this every pass of the loop."""
+        if now is None:
+            now = time.monotonic()
+        if now < self._next_sample:
+            return
+        # Stay on the sample grid, but don't try to catch up after a stall
+        self._next_sample += self.period
+        if self._next_sample <= now:
+            self._next_sample = now + self.period
+        p = self.ts.touch_point
+        if p:
+            self.last_touch = now
+            self._misses = 0
+            if self.down:
+                # Smooth the position while held
+                self._x = (self._x * 3 + p[0]) // 4
+                self._y = (self._y * 3 + p[1]) // 4
+                if now >= self._next_hold:
+                    self._next_hold = now + self.hold_repeat
+                    self._push(HOLD)
+                return
+            if self._hits and (abs(p[0] - self._x) > self.jitter or
+                               abs(p[1] - self._y) > self.jitter):
+                self._hits = 0      # Wandered too far, start again
+            if self._hits:
+                self._x = (self._x + p[0]) // 2
+                self._y = (self._y + p[1]) // 2
+            else:
+                self._x = p[0]
+                self._y = p[1]
+            self._hits += 1
+            if self._hits >= self.press_samples:
+                self.down = True
+                self._next_hold = now + self.hold_time
+                self._push(PRESS)
+        else:
+            self._hits = 0
+            if self.down:
+                self._misses += 1
+                if self._misses >= self.release_samples:
+                    self.down = False
+                    self._push(RELEASE)
+
+    def set_period(self, period, now=None):
+        """Change the sample rate; a faster one takes effect at once."""
+        if now is None:
+            now = time.monotonic()
+        self.period = period
+        if self._next_sample > now + period:
+            self._next_sample = now + period
+
+    def _push(self, kind):
+        size = len(self._kinds)
+        if self._count == size:
+            self.dropped += 1
+            return
+        i = (self._head + self._count) % size
+        self._kinds[i] = kind
+        self._xs[i] = max(0, self._x)
+        self._ys[i] = max(0, self._y)
+        self._count += 1
+
+    def get(self):
+        """Pop the oldest event: returns PRESS, HOLD, RELEASE or 0 for none.
+        Its position is left in self.x and self.y.
+        """
+        if not self._count:
+            return 0
+        i = self._head
+        self.x = self._xs[i]
+        self.y = self._ys[i]
+        self._head = (i + 1) % len(self._kinds)
+        self._count -= 1
+        return self._kinds[i]
+
+    def sleep_time(self, now=None):
+        """Seconds until the next sample is due."""
+        if now is None:
+            now = time.monotonic()
+        return max(0, self._next_sample - now)
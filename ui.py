@@ -0,0 +1,92 @@
+# * ------------------------------------------------------------
+# The Diceinator - declarative buttons
+#
+# Buttons are described once in a table of ButtonSpecs.  At startup
+# the table is turned into Button objects and a per-view hit index:
+# a coarse bytearray grid over the screen where each cell holds the
+# number of the button there, so a touch is one lookup and one
+# bounds check instead of a contains() call per button.
+# * ------------------------------------------------------------
+
+from collections import namedtuple
+from adafruit_button import Button
+
+ALL_VIEWS = 0       # Spec view for buttons shown on every view (the tabs)
+HIT_CELL = 8        # Hit grid cell size in pixels
+_SHARED = 255       # Grid value for a cell two buttons overlap
+
+# view: which view the button belongs to, or ALL_VIEWS
+# action, arg: the handler to call and what to pass it
+# style: extra Button keyword arguments (a dict), or None
+ButtonSpec = namedtuple("ButtonSpec", ("view", "name", "action", "arg",
+                                       "x", "y", "width", "height", "label",
+                                       "label_color", "fill_color", "style"))
+
+
+def make_button(spec, font):
+    """Build the Button for one spec."""
+    style = spec.style or {}
+    return Button(x=spec.x, y=spec.y,
+                  width=spec.width, height=spec.height,
+                  label=spec.label, label_font=font,
+                  label_color=spec.label_color,
+                  fill_color=spec.fill_color, outline_color=0x000000,
+                  **style)
+
+
+class HitIndex:
+    """Screen point -> button number, one grid per view.
+    A cell holds the button overlapping it, and lookup confirms the hit
+    against that one button's exact bounds.  The few cells on the edge
+    of two buttons fall back to checking the view's buttons in turn.
+        :param table: The ButtonSpecs
+        :param view_count: Highest view number in use
+    """
+
+    def __init__(self, table, view_count, width=320, height=240, cell=HIT_CELL):
+        self.table = table
+        self.cell = cell
+        self.cols = (width + cell - 1) // cell
+        self.rows = (height + cell - 1) // cell
+        # grids[view][row * cols + col] = button number + 1, 0 for nothing
+        self.grids = [None]
+        for view in range(1, view_count + 1):
+            grid = bytearray(self.cols * self.rows)
+            for i, spec in enumerate(table):
+                if spec.view == view or spec.view == ALL_VIEWS:
+                    self._paint(grid, i + 1, spec)
+            self.grids.append(grid)
+
+    def _paint(self, grid, value, spec):
+        cell = self.cell
+        col0 = max(0, spec.x // cell)
+        col1 = min(self.cols - 1, (spec.x + spec.width) // cell)
+        row0 = max(0, spec.y // cell)
+        row1 = min(self.rows - 1, (spec.y + spec.height) // cell)
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            for col in range(col0, col1 + 1):
+                grid[base + col] = value if not grid[base + col] else _SHARED
+
+    def lookup(self, view, x, y):
+        """Return the number of the button at (x, y) on ``view``, or -1."""
+        col = x // self.cell
+        row = y // self.cell
+        if col < 0 or row < 0 or col >= self.cols or row >= self.rows:
+            return -1
+        value = self.grids[view][row * self.cols + col]
+        if value == _SHARED:
+            # Topmost first, like the drawing order
+            for i in range(len(self.table) - 1, -1, -1):
+                spec = self.table[i]
+                if (spec.view == view or spec.view == ALL_VIEWS) and _contains(spec, x, y):
+                    return i
+            return -1
+        if value and _contains(self.table[value - 1], x, y):
+            return value - 1
+        return -1
+
+
+# Same test as Button.contains
+def _contains(spec, x, y):
+    return spec.x <= x <= spec.x + spec.width and spec.y <= y <= spec.y + spec.height
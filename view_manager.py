@@ -0,0 +1,70 @@
+# * ------------------------------------------------------------
+# The Diceinator - view manager
+#
+# All views stay in the main Group the whole time and are shown or
+# hidden by flipping their ``hidden`` flag, rather than removing and
+# re-appending whole groups.  The display runs with auto refresh off
+# and refresh() is called once per pass of the loop, so every change
+# made in a frame goes out together and only the dirty areas are sent.
+# A pass that changed nothing (see changed()) doesn't touch the display
+# at all, so an idle loop can sleep.
+# * ------------------------------------------------------------
+
+import time
+
+
+class ViewManager:
+    """Shows one view Group at a time and owns the display refresh.
+        :param display: board.DISPLAY
+        :param root: The Group shown on the display
+        :param views: View Groups indexed by view number (index 0 unused)
+        :param frame_rate: Frame grid the display lines each refresh up
+            with; a fine one keeps that wait short
+    """
+
+    def __init__(self, display, root, views, frame_rate=1000):
+        self.display = display
+        self.root = root
+        self.views = views
+        self.frame_rate = frame_rate
+        self.live = 0
+        self.frames = 0             # Refreshes done
+        self.retries = 0            # Frames the display skipped and were sent again
+        self.dirty = True           # Something may have changed since the last refresh
+        self.refresh_time = 0       # Seconds spent in them
+        for group in views[1:]:
+            group.hidden = True
+            root.append(group)
+
+    def show(self, view):
+        """Unhide ``view`` and hide the rest.  Takes effect on refresh()."""
+        for i in range(1, len(self.views)):
+            self.views[i].hidden = i != view
+        self.live = view
+        self.dirty = True
+
+    def changed(self):
+        """Note that this pass changed something on screen."""
+        self.dirty = True
+
+    def start(self):
+        """Put the root Group on the display and take over refreshing."""
+        self.display.show(self.root)
+        self.display.auto_refresh = False
+        self.refresh()
+
+    def refresh(self):
+        """Send this frame's changes to the screen, if changed() was called."""
+        if not self.dirty:
+            return
+        self.dirty = False
+        t = time.monotonic()
+        # The display skips the frame (returns False) when the loop took
+        # longer than a frame since the last call; a second call draws.
+        if not self.display.refresh(target_frames_per_second=self.frame_rate,
+                                    minimum_frames_per_second=0):
+            self.retries += 1
+            self.display.refresh(target_frames_per_second=self.frame_rate,
+                                 minimum_frames_per_second=0)
+        self.frames += 1
+        self.refresh_time += time.monotonic() - t